@@ -1,9 +1,19 @@
 __version__ = "0.2.0"
 
 from pysim.utils import *
+from pysim.cache import *
+from pysim.reductions import *
+from pysim.derivatives import *
 from pysim.parsing import *
 from pysim.environment import *
-from pysim.plotting import *
 from pysim.fields import *
+from pysim.store import *
+from pysim.index import *
 from pysim.simulation import *
-from pysim.dhybridr import *
\ No newline at end of file
+from pysim.dhybridr import *
+
+def __getattr__(name: str):
+    #plotting pulls in matplotlib so it is only imported the first time something from it is used
+    import pysim.plotting as plotting
+    if not name.startswith("_") and hasattr(plotting, name): return getattr(plotting, name)
+    raise AttributeError(f"module 'pysim' has no attribute '{name}'")
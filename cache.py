@@ -0,0 +1,114 @@
+#nonpysim imports
+import numpy as np
+from collections import OrderedDict
+from threading import RLock
+
+def footprint(value) -> int:
+    """
+    how much memory a cached value holds (making any arrays in it read only, since cached values are shared)
+    :param value: an array, or a dict of arrays and numbers (e.g. FrameStats)
+    :return: int: the size in bytes
+    """
+    if isinstance(value, dict): return sum(footprint(v) for v in value.values())
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value.nbytes
+    return np.asarray(value).nbytes
+
+class FrameCache:
+    """
+    a thread safe, memory budgeted cache for frames read from simulation outputs
+    ________
+    ~Inputs~
+    * max_bytes - int
+        the most memory (in bytes) the cache is allowed to hold before evicting frames
+    * policy - str
+        which frames to evict first, either 'lru' (least recently used) or 'lfu' (least frequently used)
+    ___________
+    ~Atributes~
+    * nbytes - int
+        the memory currently held by the cache
+    * hits, misses, evictions - int
+        running counters of cache lookups and evicted frames
+    """
+    def __init__(self, max_bytes: int = 2**30, policy: str = 'lru') -> None:
+        assert policy.lower() in ["lru", "lfu"], f"policy: {policy} not available, please choose either lru or lfu"
+        self.max_bytes = int(max_bytes)
+        self.policy = policy.lower()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames: OrderedDict = OrderedDict()
+        self._uses: dict = {}
+        self._sizes: dict = {}
+        self._lock = RLock()
+
+    def __len__(self) -> int: return len(self._frames)
+    def __contains__(self, key) -> bool: return key in self._frames
+    def __repr__(self) -> str:
+        return f"FrameCache({len(self)} frames, {self.nbytes/2**20:.1f}/{self.max_bytes/2**20:.1f} MiB, {self.policy})"
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._frames:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._uses[key] += 1
+            self._frames.move_to_end(key)
+            return self._frames[key]
+    def put(self, key, frame: np.ndarray|dict) -> np.ndarray|dict:
+        #frames are shared between everything that reads them so make sure nobody edits them in place
+        nbytes = footprint(frame)
+        #anything bigger than the entire budget would just evict everything and then itself
+        if nbytes > self.max_bytes: return frame
+        with self._lock:
+            if key in self._frames: self._discard(key)
+            self._frames[key] = frame
+            self._uses[key] = 1
+            self._sizes[key] = nbytes
+            self.nbytes += nbytes
+            #the new frame always has the fewest uses so it mustn't be the one evicted
+            while self.nbytes > self.max_bytes:
+                self._discard(self._victim(keep=key))
+                self.evictions += 1
+        return frame
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._uses.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            while self.nbytes > self.max_bytes:
+                self._discard(self._victim())
+                self.evictions += 1
+
+    @property
+    def stats(self) -> dict: return {
+        'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+        'frames': len(self), 'nbytes': self.nbytes, 'max_bytes': self.max_bytes
+    }
+
+    def _victim(self, keep=None):
+        #OrderedDict keeps the least recently used frame at the front
+        if self.policy=='lru': return next(k for k in self._frames if k!=keep)
+        #ties in use count go to the least recently used frame
+        return min((k for k in self._frames if k!=keep), key=self._uses.__getitem__)
+    def _discard(self, key) -> None:
+        del self._frames[key], self._uses[key]
+        self.nbytes -= self._sizes.pop(key)
+
+def resolve_cache(caching, parent=None) -> FrameCache|None:
+    """
+    work out which cache a field should use
+    :param caching: bool | FrameCache: False for no cache, True to share the parent's cache (or make a new one), or a cache to use
+    :param parent: the simulation object the field belongs to
+    :return: the FrameCache to use, or None if not caching
+    """
+    if isinstance(caching, FrameCache): return caching
+    if not caching: return None
+    return parent.cache if isinstance(getattr(parent, 'cache', None), FrameCache) else FrameCache()
@@ -0,0 +1,111 @@
+#nonpysim imports
+import numpy as np
+from functools import lru_cache
+
+def modified_wavenumbers(k: np.ndarray, h: float, backend: str = 'spectral') -> tuple[np.ndarray, np.ndarray]:
+    """
+    the wavenumbers a derivative scheme effectively sees on a periodic grid. Periodic finite differences are
+    diagonal in fourier space, so every backend shares the same transforms and only these multipliers differ
+    :param k: np.ndarray: the exact wavenumbers
+    :param h: float: the grid spacing
+    :param backend: str: 'spectral' (exact), 'compact' (4th order Pade/Lele compact differences), or 'fd2' (2nd order central differences)
+    :return: (first, second): the multipliers for the first derivative (times i) and the second derivative (times -1)
+    """
+    theta = k*h
+    match backend.lower():
+        case 'spectral': return k, k**2
+        case 'compact': return (
+            1.5*np.sin(theta) / (1 + 0.5*np.cos(theta)) / h,
+            2.4*(1 - np.cos(theta)) / (1 + 0.2*np.cos(theta)) / h**2
+        )
+        case 'fd2': return np.sin(theta) / h, (2 - 2*np.cos(theta)) / h**2
+        case _: raise ValueError(f"backend: {backend} not available, please choose spectral, compact, or fd2")
+
+class Derivatives:
+    """
+    derivatives of periodic frames (like our bdtype=per runs) taken in fourier space for one grid shape and spacing.
+    Every method works on batches, any leading axes are stacked frames, so one real fft in and one out covers
+    every frame (and component) in the batch
+    ________
+    ~Inputs~
+    * shape - tuple[int]
+        the (x, y) or (x, y, z) shape of a frame
+    * spacing - tuple[float]
+        the grid spacing along each axis
+    * backend - str
+        'spectral', 'compact', or 'fd2', see modified_wavenumbers
+    * workers - int
+        threads scipy.fft uses for each transform, -1 uses every core
+    ___________
+    ~Atributes~
+    * k - list[np.ndarray]
+        the first derivative multiplier along each axis, shaped to broadcast against the rfftn of a frame
+    * k2 - np.ndarray
+        minus the laplacian's multiplier
+    """
+    def __init__(self, shape: tuple, spacing: tuple, backend: str = 'spectral', workers: int = -1) -> None:
+        self.shape = tuple(shape)
+        self.spacing = tuple(spacing)
+        self.backend = backend
+        self.workers = workers
+        self.ndims = len(self.shape)
+        self.axes = tuple(range(-self.ndims, 0))
+        self.k, self.k2 = [], 0
+        for a, (n, h) in enumerate(zip(self.shape, self.spacing)):
+            last = a==self.ndims-1
+            #rfftn only keeps the non-negative half of the last axis
+            k = 2*np.pi*(np.fft.rfftfreq(n, h) if last else np.fft.fftfreq(n, h))
+            first, second = modified_wavenumbers(k, h, backend)
+            #odd derivatives of the nyquist mode have no real counterpart so it's dropped
+            if n%2==0: first[-1 if last else n//2] = 0
+            broadcast = [1]*self.ndims
+            broadcast[a] = len(k)
+            self.k.append(first.reshape(broadcast))
+            self.k2 = self.k2 + second.reshape(broadcast)
+
+    def __repr__(self) -> str: return f"Derivatives({self.shape}, {self.spacing}, {self.backend})"
+
+    def forward(self, frames: np.ndarray) -> np.ndarray:
+        from scipy import fft
+        return fft.rfftn(frames, axes=self.axes, workers=self.workers)
+    def backward(self, spectra: np.ndarray) -> np.ndarray:
+        from scipy import fft
+        return fft.irfftn(spectra, s=self.shape, axes=self.axes, workers=self.workers)
+
+    def derivative(self, frames: np.ndarray, axis: int) -> np.ndarray:
+        """the first derivative of (..., x, y) frames along one axis"""
+        spectra = self.forward(frames)
+        return self.backward(spectra * self._ik(axis, spectra.dtype))
+    def gradient(self, frames: np.ndarray) -> np.ndarray:
+        """the gradient of (..., x, y) frames as (..., axes, x, y)"""
+        spectra = self.forward(frames)
+        return self.backward(np.stack([spectra * self._ik(a, spectra.dtype) for a in range(self.ndims)], axis=-self.ndims-1))
+    def laplacian(self, frames: np.ndarray) -> np.ndarray:
+        """the laplacian of (..., x, y) frames"""
+        spectra = self.forward(frames)
+        return self.backward(spectra * -self.k2.astype(spectra.real.dtype))
+    def divergence(self, vectors: np.ndarray) -> np.ndarray:
+        """the divergence of (..., components, x, y) vectors, components along axes the grid doesn't have are constant"""
+        spectra = self.forward(vectors)
+        return self.backward(sum(
+            self._component(spectra, a) * self._ik(a, spectra.dtype) for a in range(min(self.ndims, vectors.shape[-self.ndims-1]))
+        ))
+    def curl(self, vectors: np.ndarray, components: tuple = (0, 1, 2)) -> np.ndarray:
+        """
+        the curl of (..., 3, x, y) vectors, derivatives along axes the grid doesn't have (z in 2D runs) are zero
+        :param vectors: np.ndarray: the x, y, and z components stacked before the grid axes
+        :param components: which components of the curl to compute, e.g. (2,) for just the z component
+        :return: np.ndarray: (..., len(components), x, y)
+        """
+        spectra = self.forward(vectors)
+        def d(axis, c): return self._component(spectra, c) * self._ik(axis, spectra.dtype) if axis < self.ndims else 0
+        curl = {0: lambda: d(1, 2) - d(2, 1), 1: lambda: d(2, 0) - d(0, 2), 2: lambda: d(0, 1) - d(1, 0)}
+        return self.backward(np.stack([np.broadcast_to(curl[c](), spectra.shape[:-self.ndims-1] + spectra.shape[-self.ndims:]) for c in components], axis=-self.ndims-1))
+
+    def _ik(self, axis: int, dtype) -> np.ndarray: return (1j*self.k[axis]).astype(dtype)
+    def _component(self, spectra: np.ndarray, c: int) -> np.ndarray: return spectra[(..., c) + (slice(None),)*self.ndims]
+
+@lru_cache(maxsize=16)
+def derivative_engine(shape: tuple, spacing: tuple, backend: str = 'spectral', workers: int = -1) -> Derivatives:
+    """the Derivatives for a grid, built once per shape, spacing, and backend and reused after that"""
+    return Derivatives(shape, spacing, backend=backend, workers=workers)
@@ -1,4 +1,7 @@
 from pysim.dhybridr.input import *
+from pysim.dhybridr.unformatted import *
+from pysim.dhybridr.init_cache import *
 from pysim.dhybridr.initializer import *
 from pysim.dhybridr.dhybridr import *
-from pysim.dhybridr.anvil_submit import *
\ No newline at end of file
+from pysim.dhybridr.anvil_submit import *
+from pysim.dhybridr.campaign import *
\ No newline at end of file
@@ -0,0 +1,378 @@
+#pysim imports
+from pysim.utils import read_ahead, verbose_bar
+from pysim.parsing import Folder
+from pysim.environment import dHybridRtemplate
+from pysim.dhybridr.input import dHybridRinput
+from pysim.dhybridr.initializer import dHybridRconfig, TurbInit
+from pysim.dhybridr.init_cache import InitCache
+from pysim.dhybridr.anvil_submit import AnvilSubmitScript
+#nonpysim imports
+import numpy as np
+from itertools import product
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from shutil import copytree
+from os import makedirs, replace, chmod, cpu_count, environ
+from os.path import exists, basename, abspath, dirname
+from uuid import uuid4
+import subprocess
+import json
+import re
+
+def expand_grid(grid: dict) -> list[dict]:
+    """
+    every combination of the values in a parameter grid, e.g. {'mach': [0.5, 1], 'dB': [1]} gives two runs
+    :param grid: dict: parameter name: list of values to sweep
+    :return: list of dicts of parameter name: value, the last parameter changes fastest
+    """
+    return [dict(zip(grid, values)) for values in product(*grid.values())]
+
+class _Run:
+    """what an initializer needs from a simulation, without setting up (or prompting about) a dHybridR"""
+    compressed = False
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.input = dHybridRinput(path + "/input/input")
+        self.outputDir = Folder(path + "/Output")
+
+def stage_run(path: str, params: dict, template: str, initializer) -> str:
+    """
+    set up one simulation of a campaign without building its init files: copy the template and write the parameters
+    into its input file (or config if they aren't input parameters)
+    :param path: str: where the simulation goes, anything already there from the template is kept
+    :param params: dict: the run's parameters, input parameters set in every species that has them if they aren't
+                   in a section of their own
+    :param template: str: the simulation template folder
+    :param initializer: the dHybridRinitializer (or anything called with the simulation that makes one)
+    :return: the cache_key of the run's init files
+    """
+    if not exists(path): copytree(template, path, ignore=lambda *_: ["__pycache__"])
+    #the executable gets its own copy so the template's permissions are left alone
+    chmod(path + "/dHybridR", 0o755)
+    inputs = dHybridRinput(path + "/input/input")
+    config = dHybridRconfig(Folder(path))
+    config.mode, config.params = getattr(initializer, "__name__", "campaign"), ["mode"]
+    for name, value in params.items():
+        if any(name in section.params for section in inputs.sections.values()): setattr(inputs, name, value)
+        elif len(species:=[sp for sp in inputs.species.values() if any(name in s.params for s in sp.sections.values())]) > 0:
+            for sp in species: setattr(sp, name, value)
+        else:
+            if name not in config.params: config.params.append(name)
+            setattr(config, name, ",".join(str(v) for v in value) if isinstance(value, (list, tuple)) else value)
+    inputs.save_changes()
+    config.write()
+    return initializer(_Run(path)).cache_key
+
+def build_run(path: str, initializer, cache: InitCache|bool = True) -> str:
+    """build (or link out of the cache) the init files of a run set up by stage_run, returns the path"""
+    initializer(_Run(path)).prepare_simulation(cache=cache)
+    return path
+
+def prepare_run(path: str, params: dict, template: str, initializer, cache: InitCache|bool = True) -> str:
+    """
+    set up one simulation of a campaign: stage_run then build_run
+    :param cache: InitCache | bool: passed to prepare_simulation so runs with the same fields share them
+    :return: the path
+    """
+    stage_run(path, params, template, initializer)
+    return build_run(path, initializer, cache=cache)
+
+class Executor:
+    """
+    how a campaign's runs are launched, each submission is one job array over a list of run folders
+    ________
+    ~Inputs~
+    * run_command - str
+        what each array task runs inside its run folder
+    * modules - tuple
+        modules loaded before running
+    * max_parallel - int | None
+        the most array tasks allowed to run at once, None for no limit
+    """
+    def __init__(self, run_command: str = "mpirun dHybridR > out", modules: tuple = (), max_parallel: int|None = None) -> None:
+        self.run_command = run_command
+        self.modules = modules
+        self.max_parallel = max_parallel
+    def __enter__(self): return self
+    def __exit__(self, *exc) -> None: self.close()
+
+    def close(self, wait: bool = True) -> None:
+        """let go of anything the executor holds in this process, runs already submitted to a scheduler carry on"""
+        return None
+    def header(self, name: str, ntasks: int, n: int) -> str: return "#!/bin/bash"
+    def script(self, name: str, runs_file: str, ntasks: int, n: int) -> str:
+        """the job array script, task i runs in the folder on line i+1 of runs_file and leaves its exit code there"""
+        return "\n".join([
+            self.header(name, ntasks, n),
+            *[f"module load {m}" for m in self.modules],
+            f'cd "$(sed -n "$((SLURM_ARRAY_TASK_ID+1))p" {runs_file})" || exit 1',
+            "mkdir -p .pysim",
+            "echo RUNNING > .pysim/state",
+            self.run_command,
+            "code=$?",
+            "echo $code > .pysim/exit_code",
+            "exit $code",
+            ""
+        ])
+    def submit(self, script: str, n: int) -> str: raise NotImplementedError
+    def status(self, jobs: dict) -> dict:
+        """
+        the state of array tasks, from what they left in their run folders
+        :param jobs: dict: job id: run folder
+        :return: dict: job id: 'PENDING', 'RUNNING', 'COMPLETED', or 'FAILED'
+        """
+        return {job: _folder_state(path) for job, path in jobs.items()}
+
+def _folder_state(path: str) -> str:
+    if exists(path + "/.pysim/exit_code"):
+        with open(path + "/.pysim/exit_code", 'r') as file: return "COMPLETED" if file.read().strip()=="0" else "FAILED"
+    return "RUNNING" if exists(path + "/.pysim/state") else "PENDING"
+
+class SlurmArrayExecutor(Executor):
+    """
+    submit runs as one Slurm job array with a single sbatch and follow them with sacct
+    ________
+    ~Inputs~
+    * queue, time_limit, email, allocation -
+        as in AnvilSubmitScript
+    * tasks_per_node - int
+        cores on a node, the number of nodes a run needs is worked out from its node_number
+    * sbatch, sacct - str
+        the commands to submit and query with, e.g. a stand in script for testing
+    * run_command, modules, max_parallel -
+        as in Executor
+    """
+    def __init__(
+            self,
+            queue: str = "wholenode",
+            time_limit: str = "24:00:00",
+            email: str|None = None,
+            allocation: str = "phy220089",
+            tasks_per_node: int = 128,
+            sbatch: str = "sbatch",
+            sacct: str = "sacct",
+            run_command: str = "mpirun dHybridR > out",
+            modules: tuple = ("intel", "hdf5"),
+            max_parallel: int|None = None
+        ) -> None:
+        Executor.__init__(self, run_command=run_command, modules=modules, max_parallel=max_parallel)
+        self.anvil = AnvilSubmitScript("", queue=queue, time_limit=time_limit, email=email, allocation=allocation)
+        self.tasks_per_node = tasks_per_node
+        self.sbatch = sbatch
+        self.sacct = sacct
+
+    def header(self, name: str, ntasks: int, n: int) -> str: return "\n".join([
+        self.anvil.header,
+        f"#SBATCH --job-name={name}",
+        f"#SBATCH --ntasks={ntasks}",
+        f"#SBATCH --nodes={-(-ntasks // self.tasks_per_node)}",
+        f"#SBATCH --array=0-{n-1}" + (f"%{self.max_parallel}" if self.max_parallel else ""),
+        f"#SBATCH --output={name}_%a.out",
+        f"#SBATCH --error={name}_%a.err"
+    ])
+    def submit(self, script: str, n: int) -> str:
+        #the array's output files go next to the script
+        submitted = subprocess.run([self.sbatch, "--parsable", script], capture_output=True, text=True, check=True, cwd=dirname(script))
+        #--parsable prints jobid or jobid;cluster
+        return submitted.stdout.strip().split(";")[0]
+    def status(self, jobs: dict) -> dict:
+        states = Executor.status(self, jobs)
+        arrays = sorted({job.split("_")[0] for job in jobs})
+        if len(arrays)==0: return states
+        try:
+            found = subprocess.run([self.sacct, "-n", "-P", "-X", "-o", "JobID,State", "-j", ",".join(arrays)], capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError): return states
+        for line in found.stdout.splitlines():
+            if "|" not in line: continue
+            job, state = line.split("|")[:2]
+            #e.g. CANCELLED by 1234
+            state = state.split(" ")[0]
+            for task in _array_tasks(job):
+                if task in states: states[task] = state
+        return states
+
+def _array_tasks(job: str) -> list[str]:
+    #sacct folds tasks that haven't started into one line, e.g. 1234_[5-199%10] or 1234_[1,3,7-9]
+    if (folded:=re.fullmatch(r"(\d+)_\[([\d,\-]+)(%\d+)?\]", job)) is None: return [job]
+    array, ranges = folded.group(1), folded.group(2)
+    tasks = []
+    for r in ranges.split(","):
+        low, high = (r.split("-") + [r])[:2]
+        tasks += [f"{array}_{i}" for i in range(int(low), int(high) + 1)]
+    return tasks
+
+class LocalExecutor(Executor):
+    """
+    a stand in for Slurm that runs the same job array script on this machine, e.g. to test a campaign end to end
+    ________
+    ~Inputs~
+    * workers - int
+        how many array tasks run at once
+    * run_command, modules -
+        as in Executor
+    """
+    def __init__(self, workers: int = 1, run_command: str = "mpirun dHybridR > out", modules: tuple = ()) -> None:
+        Executor.__init__(self, run_command=run_command, modules=modules, max_parallel=workers)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures: dict = {}
+
+    def submit(self, script: str, n: int) -> str:
+        #unique even when several arrays are submitted at once
+        array = uuid4().hex[:12]
+        for i in range(n):
+            env = {**environ, "SLURM_JOB_ID": f"{array}_{i}", "SLURM_ARRAY_JOB_ID": array, "SLURM_ARRAY_TASK_ID": str(i)}
+            self.futures[f"{array}_{i}"] = self.pool.submit(subprocess.run, ["bash", script], env=env, capture_output=True)
+        return array
+    def wait(self) -> None: wait(list(self.futures.values()))
+    def close(self, wait: bool = True) -> None:
+        """shut down the worker threads, waiting for the runs to finish (or cancelling the ones not started yet if not)"""
+        self.pool.shutdown(wait=wait, cancel_futures=not wait)
+
+class Campaign:
+    """
+    a parameter sweep of dHybridR simulations, set up without any prompts, launched as one job array and followed
+    until they're done. What's been done is kept in campaign.json so a campaign can be picked up again later
+    ________
+    ~Inputs~
+    * path - str
+        the folder the campaign's simulations are made in
+    * grid - dict | None
+        parameter name: list of values, every combination is a run. Input file parameters (ncells, niter, ...) are
+        written into each input file, species parameters (num_par, vth, ...) into every species that has them, and
+        anything else (mach, dB, kinit, seed, ...) into the config the initializer reads. Only needed the first time
+    * constants - dict
+        parameters that are the same in every run
+    * initializer -
+        the dHybridRinitializer built for each run (or anything called with the simulation that makes one)
+    * executor - Executor
+        how runs are submitted and followed, a SlurmArrayExecutor by default
+    * template - Folder
+        the simulation template runs are copied from
+    * seed - int | None
+        the seed of every run that doesn't sweep one, so runs that only differ in their input share init files
+    * cache - InitCache | bool
+        passed to prepare_simulation
+    * verbose - bool
+        whether to show progress
+    ___________
+    ~Atributes~
+    * runs - list[dict]
+        every run's name, path, parameters, state and job id
+    """
+    version = 1
+    def __init__(
+            self,
+            path: str,
+            grid: dict|None = None,
+            constants: dict|None = None,
+            initializer = TurbInit,
+            executor: Executor|None = None,
+            template: Folder = dHybridRtemplate,
+            seed: int|None = None,
+            cache: InitCache|bool = True,
+            verbose: bool = False
+        ) -> None:
+        self.path = abspath(path).rstrip("/")
+        self.name = basename(self.path)
+        self.initializer = initializer
+        self.executor = SlurmArrayExecutor() if executor is None else executor
+        self.template = template
+        self.cache = cache
+        self.verbose = verbose
+        self.state_file = self.path + "/campaign.json"
+        if exists(self.state_file):
+            with open(self.state_file, 'r') as file: saved = json.load(file)
+            if saved.get("version")!=self.version: raise ValueError(f"{self.state_file} was made by a different version of Campaign")
+            if grid is not None and json.loads(json.dumps(grid))!=saved["grid"]:
+                raise ValueError(f"there's already a campaign with a different grid in {self.path}")
+            self.grid, self.constants, self.seed, self.runs = saved["grid"], saved["constants"], saved["seed"], saved["runs"]
+            return None
+        if grid is None: raise FileNotFoundError(f"there's no campaign in {self.path}, give a grid to start one")
+        self.grid, self.constants = grid, constants or {}
+        self.seed = int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+        self.runs = [{
+            "name": (name:=f"{self.name}_{k:04d}"), "path": f"{self.path}/{name}",
+            "params": {"seed": self.seed, **self.constants, **params}, "state": "new", "job": None
+        } for k, params in enumerate(expand_grid(grid))]
+        self.save()
+
+    def __len__(self) -> int: return len(self.runs)
+    def __getitem__(self, i: int) -> dict: return self.runs[i]
+    def __enter__(self): return self
+    def __exit__(self, *exc) -> None: self.close()
+    def __repr__(self) -> str: return f"Campaign({self.path}, {len(self)} runs, {dict(self.states)})"
+    @property
+    def states(self) -> Counter: return Counter(r["state"] for r in self.runs)
+
+    def prepare(self, workers: int|None = None) -> list[str]:
+        """
+        set up every run that hasn't been yet (template, input, config, init files), several at once. Init files are
+        built for one run of each cache key first, so the other runs that share those fields link them from the cache
+        instead of building them again
+        :param workers: how many processes to prepare with, every core by default
+        :return: the paths of the runs that were prepared
+        """
+        todo = [r for r in self.runs if r["state"]=="new"]
+        workers = min(workers or cpu_count() or 1, len(todo))
+        if len(todo)==0: return []
+        makedirs(self.path, exist_ok=True)
+        keys = list(self._parallel([(stage_run, r["path"], r["params"], self.template.path, self.initializer) for r in todo], workers))
+        first = {}
+        for k, key in enumerate(keys): first.setdefault(key, k)
+        leaders = sorted(first.values())
+        rest = [k for k in range(len(todo)) if k not in (shared:=set(leaders))]
+        #whatever was prepared before something went wrong is remembered
+        try:
+            for batch in (leaders, rest):
+                tasks = [(build_run, todo[k]["path"], self.initializer, self.cache) for k in batch]
+                for k, _ in zip(batch, self._parallel(tasks, workers)): todo[k]["state"] = "prepared"
+        finally: self.save()
+        return [r["path"] for r in todo]
+    def submit(self) -> list[str]:
+        """
+        submit every prepared run, one job array for each number of tasks a run needs (usually just one)
+        :return: the array job ids
+        """
+        todo = [r for r in self.runs if r["state"]=="prepared"]
+        groups: dict = {}
+        for r in todo:
+            ntasks = int(np.prod(dHybridRinput(r["path"] + "/input/input").node_number))
+            groups.setdefault(ntasks, []).append(r)
+        arrays = []
+        for ntasks, runs in groups.items():
+            name = f"{self.name}_{len(arrays)}" if len(groups) > 1 else self.name
+            with open(runs_file:=f"{self.path}/{name}.runs", 'w') as file: file.write("\n".join(r["path"] for r in runs) + "\n")
+            with open(script:=f"{self.path}/{name}.sh", 'w') as file: file.write(self.executor.script(name, runs_file, ntasks, len(runs)))
+            arrays.append(array:=self.executor.submit(script, len(runs)))
+            for i, r in enumerate(runs): r["state"], r["job"] = "PENDING", f"{array}_{i}"
+        self.save()
+        return arrays
+    def launch(self, workers: int|None = None) -> list[str]:
+        """prepare and submit every run, returns the array job ids"""
+        self.prepare(workers)
+        return self.submit()
+    def status(self) -> Counter:
+        """
+        ask the executor what every submitted run is doing
+        :return: Counter: how many runs are in each state
+        """
+        submitted = {r["job"]: r for r in self.runs if r["job"] is not None}
+        for job, state in self.executor.status({job: r["path"] for job, r in submitted.items()}).items(): submitted[job]["state"] = state
+        self.save()
+        return self.states
+
+    def close(self, wait: bool = True) -> None:
+        """close the executor, e.g. a LocalExecutor's threads, see Executor.close"""
+        self.executor.close(wait=wait)
+
+    def _parallel(self, tasks: list, workers: int):
+        workers = min(workers, len(tasks))
+        return verbose_bar(read_ahead(tasks, depth=2*workers if workers > 1 else 0, workers=workers, processes=True), self.verbose, total=len(tasks))
+
+    def save(self) -> None:
+        makedirs(self.path, exist_ok=True)
+        #write then move so a crash never leaves a half written file behind
+        with open(tmp:=self.state_file + ".tmp", 'w') as file: json.dump({
+            "version": self.version, "grid": self.grid, "constants": self.constants, "seed": self.seed, "runs": self.runs
+        }, file, indent=1)
+        replace(tmp, self.state_file)
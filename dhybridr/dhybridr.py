@@ -1,8 +1,10 @@
 #pysim imports
-from pysim.utils import yesno 
-from pysim.parsing import Folder
+from pysim.utils import yesno, read_ahead
+from pysim.parsing import Folder, File
 from pysim.environment import dHybridRtemplate
-from pysim.fields import ScalarField, VectorField
+from pysim.fields import ScalarField, VectorField, split_store_path
+from pysim.store import compress_output
+from pysim.index import OutputIndex
 from pysim.simulation import GenericSimulation
 from pysim.dhybridr.input import dHybridRinput
 from pysim.dhybridr.initializer import dHybridRinitializer
@@ -10,17 +12,57 @@ from pysim.dhybridr.anvil_submit import AnvilSubmitScript
 #nonpysim imports
 import numpy as np 
 from h5py import File as h5File
-from os import system
+from os import system, makedirs, replace, cpu_count, stat
+from os.path import exists, basename
+from functools import cached_property
+from uuid import uuid4
 
 # simulation parsing
 def extract_energy(file_name: str) -> tuple:
-    with h5File(file_name, 'r') as file:
-        fE = np.mean(file["DATA"], axis=1)
-        [low, high] = file["AXIS"]["X2 AXIS"][:]
-        lne = np.linspace(low, high, fE.shape[0])
-        dlne = np.diff(lne)[0]
-        E = np.exp(lne)
-        return E, fE, dlne
+    #dumps packed into a consolidated store are already transposed to (x, E)
+    if (store:=split_store_path(file_name)) is not None:
+        store_file, key = store
+        key, name = key.rsplit("/", 1)
+        with h5File(store_file, 'r') as file:
+            group = file[key]
+            index = list(group["files"].asstr()[:]).index(name)
+            fE = np.mean(group["DATA"][index], axis=0)
+            [low, high] = group["AXIS"]["X2 AXIS"][:]
+    else:
+        with h5File(file_name, 'r') as file:
+            fE = np.mean(file["DATA"], axis=1)
+            [low, high] = file["AXIS"]["X2 AXIS"][:]
+    lne = np.linspace(low, high, fE.shape[0])
+    dlne = np.diff(lne)[0]
+    E = np.exp(lne)
+    return E, fE, dlne
+
+
+def extract_energies(file_names: list, workers: int = 1) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    extract_energy for many dumps, read in parallel and stacked into dense arrays
+    :param file_names: the etx1 dumps
+    :param workers: how many processes to read with, 1 reads here
+    :return: E, fE, dlne: the (t, E) energy grids and distributions (padded with nans if some dumps have fewer 
+             energy bins) and the (t,) log energy spacing
+    """
+    workers = min(workers, len(file_names))
+    energies = list(read_ahead(((extract_energy, f) for f in file_names), depth=2*workers if workers > 1 else 0, workers=workers, processes=True))
+    nE = max([len(E) for E, _, _ in energies], default=0)
+    grid, pdf = np.full((len(energies), nE), np.nan), np.full((len(energies), nE), np.nan)
+    for k, (E, fE, _) in enumerate(energies): grid[k, :len(E)], pdf[k, :len(fE)] = E, fE
+    return grid, pdf, np.array([dlne for *_, dlne in energies], dtype=float)
+
+def dump_signature(file_name: str) -> str:
+    """
+    what a dump is for a cache built from it: its name, size and mtime so rewriting it in place is noticed. Dumps
+    packed into a consolidated store are only ever appended, so their name is enough
+    """
+    if split_store_path(file_name) is not None: return basename(file_name)
+    info = stat(file_name)
+    return f"{basename(file_name)}:{info.st_size}:{info.st_mtime_ns}"
+
+def _widen(array: np.ndarray, n: int) -> np.ndarray: return np.pad(array, ((0, 0), (0, n - array.shape[1])), constant_values=np.nan)
 
 
 class dHybridR(GenericSimulation):
@@ -33,15 +75,25 @@ class dHybridR(GenericSimulation):
             caching: bool = False,
             verbose: bool = False,
             template: Folder = dHybridRtemplate,
-            compressed: bool = False
+            compressed: bool = False,
+            cache_size: int = 2**30,
+            cache_policy: str = 'lru',
+            read_ahead: int = 0,
+            workers: int = 1
         ) -> None:
         self.compressed = compressed
+        self.read_ahead = read_ahead
+        self.workers = workers
         #setup simulation
-        GenericSimulation.__init__(self, path, caching=caching, verbose=verbose, template=template)
+        GenericSimulation.__init__(
+            self, path, caching=caching, verbose=verbose, template=template, 
+            cache_size=cache_size, cache_policy=cache_policy
+        )
         #setup input, output, and restart folders
         self.parse_input()
         self.outputDir = Folder(self.path+"/Output")
-        if not self.outputDir.exists():
+        self.outputStore = File(self.path+"/Output.h5")
+        if not (self.outputStore if self.compressed else self.outputDir).exists():
             if yesno("There is no output, would you like to run this simulation?\n"): 
                 self.run()
         else: self.parse_output()
@@ -60,22 +112,87 @@ class dHybridR(GenericSimulation):
         initializer.prepare_simulation()
         submit_script.write()
         system(f"sh {submit_script.path}")
+    def compress(self, verbose: bool|None = None, **kwargs) -> str:
+        """
+        pack the per dump output into a consolidated store (Output.h5) which can be opened with compressed=True.
+        dumps that are already packed are skipped, so this can be called again as the simulation runs
+        :param kwargs: passed to pysim.store.pack_folder
+        :return: the path to the store
+        """
+        verbose = self.verbose if verbose is None else verbose
+        return compress_output(self.outputDir.path, self.outputStore.path, verbose=verbose, **kwargs)
     def parse_output(self) -> None:
-        kwargs = {'caching':self.caching, 'verbose':self.verbose, 'parent':self}
-        self.B       = VectorField(self.path + "/Output/Fields/Magnetic/Total/", name="magnetic", latex="B", **kwargs)
-        self.E       = VectorField(self.path + "/Output/Fields/Electric/Total/", name="electric", latex="E", **kwargs)
-        self.etx1    = ScalarField(self.path + "/Output/Phase/etx1/Sp01/", **kwargs)
-        self.pxx1    = ScalarField(self.path + "/Output/Phase/p1x1/Sp01/", **kwargs)
-        self.pyx1    = ScalarField(self.path + "/Output/Phase/p2x1/Sp01/", **kwargs)
-        self.pzx1    = ScalarField(self.path + "/Output/Phase/p3x1/Sp01/", **kwargs)
-        self.density = ScalarField(self.path + "/Output/Phase/x3x2x1/Sp01/", name="density", latex=r"$\rho$", **kwargs)
-        self.Pxx     = ScalarField(self.path + "/Output/Phase/PressureTen/Sp01/xx/", **kwargs)
-        self.Pyy     = ScalarField(self.path + "/Output/Phase/PressureTen/Sp01/yy/", **kwargs)
-        self.Pzz     = ScalarField(self.path + "/Output/Phase/PressureTen/Sp01/zz/", **kwargs)
-        self.u       = VectorField(self.path + "/Output/Phase/FluidVel/Sp01/", name="bulkflow", latex="u", **kwargs)
-        [
-            self.energy_grid,
-            self.energy_pdf,
-            self.dlne
-        ] = np.array([[*extract_energy(f)] for f in self.etx1.file_names], dtype=object).T
+        self.field_kwargs = {'caching':self.caching, 'verbose':self.verbose, 'parent':self, 'read_ahead':self.read_ahead, 'workers':self.workers}
+        #the index remembers what's in each output folder so fields don't have to glob or read dumps to set up
+        self.index = OutputIndex(self.cacheDir.path + "/index.json")
+        #compressed simulations read the same fields out of the consolidated store
+        self.output = self.outputStore.path if self.compressed else self.outputDir.path
+
+    def refresh(self) -> int:
+        """
+        pick up dumps written since the output was last looked at, e.g. to keep up with a running simulation.
+        Only fields which have already been set up are touched
+        :return: int: the most new frames any field got
+        """
+        new = [f.refresh() for f in self.__dict__.values() if isinstance(f, (ScalarField, VectorField))]
+        if max(new, default=0) > 0: self.__dict__.pop("energy", None)
+        return max(new, default=0)
 
+    #fields are only set up the first time they are used
+    @cached_property
+    def B(self) -> VectorField: return VectorField(self.output + "/Fields/Magnetic/Total/", name="magnetic", latex="B", **self.field_kwargs)
+    @cached_property
+    def E(self) -> VectorField: return VectorField(self.output + "/Fields/Electric/Total/", name="electric", latex="E", **self.field_kwargs)
+    @cached_property
+    def etx1(self) -> ScalarField: return ScalarField(self.output + "/Phase/etx1/Sp01/", **self.field_kwargs)
+    @cached_property
+    def pxx1(self) -> ScalarField: return ScalarField(self.output + "/Phase/p1x1/Sp01/", **self.field_kwargs)
+    @cached_property
+    def pyx1(self) -> ScalarField: return ScalarField(self.output + "/Phase/p2x1/Sp01/", **self.field_kwargs)
+    @cached_property
+    def pzx1(self) -> ScalarField: return ScalarField(self.output + "/Phase/p3x1/Sp01/", **self.field_kwargs)
+    @cached_property
+    def density(self) -> ScalarField: return ScalarField(self.output + "/Phase/x3x2x1/Sp01/", name="density", latex=r"$\rho$", **self.field_kwargs)
+    @cached_property
+    def Pxx(self) -> ScalarField: return ScalarField(self.output + "/Phase/PressureTen/Sp01/xx/", **self.field_kwargs)
+    @cached_property
+    def Pyy(self) -> ScalarField: return ScalarField(self.output + "/Phase/PressureTen/Sp01/yy/", **self.field_kwargs)
+    @cached_property
+    def Pzz(self) -> ScalarField: return ScalarField(self.output + "/Phase/PressureTen/Sp01/zz/", **self.field_kwargs)
+    @cached_property
+    def u(self) -> VectorField: return VectorField(self.output + "/Phase/FluidVel/Sp01/", name="bulkflow", latex="u", **self.field_kwargs)
+    @cached_property
+    def energy(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        the energy grid and energy distribution of every dump as dense (t, E) arrays and the (t,) log energy spacing.
+        They're only worked out the first time they're used, reading the dumps in parallel, and saved in the cacheDir
+        so later sessions (and refreshes of a running simulation) only read dumps that weren't there before
+        """
+        names = [dump_signature(f) for f in self.etx1.file_names]
+        grid, pdf, dlne = np.empty((0, 0)), np.empty((0, 0)), np.empty(0)
+        if exists(saved:=self.cacheDir.path + "/energy.npz"):
+            with np.load(saved) as energy:
+                #only the dumps that are still there (in the same order, unchanged) are any use
+                done = next((k for k, (a, b) in enumerate(zip(energy["files"], names)) if a!=b), min(len(energy["files"]), len(names)))
+                grid, pdf, dlne = energy["grid"][:done], energy["pdf"][:done], energy["dlne"][:done]
+        if len(dlne)==len(names): return grid, pdf, dlne
+        new_grid, new_pdf, new_dlne = extract_energies(self.etx1.file_names[len(dlne):], workers=cpu_count() or 1)
+        nE = max(grid.shape[1], new_grid.shape[1])
+        grid, pdf = np.concatenate([_widen(grid, nE), _widen(new_grid, nE)]), np.concatenate([_widen(pdf, nE), _widen(new_pdf, nE)])
+        dlne = np.concatenate([dlne, new_dlne])
+        makedirs(self.cacheDir.path, exist_ok=True)
+        #write then move so a crash never leaves a half written file behind, the temporary name is unique so
+        #processes loading the energies at once don't move each other's files
+        with open(tmp:=f"{saved}.{uuid4().hex[:8]}.tmp", 'wb') as file: np.savez(file, files=np.array(names), grid=grid, pdf=pdf, dlne=dlne)
+        replace(tmp, saved)
+        return grid, pdf, dlne
+    def energy_at(self, i: int) -> tuple: 
+        """the energy grid, energy distribution, and log energy spacing of dump i, only that dump is read if energy hasn't been loaded"""
+        if "energy" in self.__dict__: return tuple(e[i] for e in self.energy)
+        return extract_energy(self.etx1.file_names[i])
+    @property
+    def energy_grid(self) -> np.ndarray: return self.energy[0]
+    @property
+    def energy_pdf(self) -> np.ndarray: return self.energy[1]
+    @property
+    def dlne(self) -> np.ndarray: return self.energy[2]
@@ -0,0 +1,139 @@
+#pysim imports
+from pysim.environment import initCacheDir
+#nonpysim imports
+from os import link, replace, makedirs, stat
+from os.path import exists, basename
+from shutil import copyfile, rmtree
+from time import time
+from uuid import uuid4
+from fcntl import flock, LOCK_EX, LOCK_UN
+from contextlib import contextmanager
+import json
+
+def link_or_copy(source: str, destination: str) -> str:
+    """
+    hard link source to destination (replacing it), copying instead if they're on different file systems.
+    Init files are only ever replaced and never edited in place, so sharing them between simulations is safe
+    :return: the destination
+    """
+    #the temporary name is unique so runs being prepared at once can link the same file
+    try: link(source, tmp:=f"{destination}.{uuid4().hex[:8]}.tmp")
+    except OSError: copyfile(source, tmp)
+    replace(tmp, destination)
+    return destination
+
+class InitCache:
+    """
+    a content addressed store of generated init files shared between simulations, so ensembles with the same grid,
+    initializer parameters and seed link the same files instead of building them again
+    ________
+    ~Inputs~
+    * path - str
+        the folder the cache is kept in, each entry is a sub folder named by its key
+    * max_bytes - int
+        the most disk (in bytes) the cache is allowed to hold before evicting entries
+    * policy - str
+        which entries to evict first, either 'lru' (least recently used) or 'lfu' (least frequently used)
+    ___________
+    ~Atributes~
+    * entries - dict
+        for every key: the cached file names, their total size, when they were last used and how often, and the
+        parameters they were built from
+    """
+    version = 1
+    def __init__(self, path: str = initCacheDir.path, max_bytes: int = 2**36, policy: str = 'lru') -> None:
+        assert policy.lower() in ["lru", "lfu"], f"policy: {policy} not available, please choose either lru or lfu"
+        self.path = path.rstrip("/")
+        self.max_bytes = int(max_bytes)
+        self.policy = policy.lower()
+        self.manifest = self.path + "/manifest.json"
+        self.lock_file = self.path + "/manifest.lock"
+        self.entries: dict = {}
+        self.load()
+
+    def __len__(self) -> int: return len(self.entries)
+    def __contains__(self, key: str) -> bool: return key in self.entries and all(exists(self._file(key, f)) for f in self.entries[key]["files"])
+    def __repr__(self) -> str: return f"InitCache({self.path}, {len(self)} entries, {self.nbytes/2**30:.1f}/{self.max_bytes/2**30:.1f} GiB, {self.policy})"
+    @property
+    def nbytes(self) -> int: return sum(e["nbytes"] for e in self.entries.values())
+
+    def fetch(self, key: str, destinations: list[str]) -> bool:
+        """
+        link (or copy) the cached files of an entry to where a simulation needs them
+        :param key: str: the entry, see dHybridRinitializer.cache_key
+        :param destinations: list[str]: the paths to put the files at, matched to the cached files by name
+        :return: bool: whether the entry was there, nothing is touched if it wasn't
+        """
+        with self.locked():
+            if key not in self or {basename(d) for d in destinations} - set(self.entries[key]["files"]): return False
+            for d in destinations: link_or_copy(self._file(key, basename(d)), d)
+            self.entries[key]["used"], self.entries[key]["uses"] = time(), self.entries[key]["uses"] + 1
+        return True
+    def store(self, key: str, sources: list[str], params: dict|None = None) -> None:
+        """
+        add files to the cache (linked if they're on the same file system) and evict entries until it fits
+        :param key: str: the entry, see dHybridRinitializer.cache_key
+        :param sources: list[str]: the files to keep, by name
+        :param params: dict: what the files were built from, only kept so the manifest can be read by a person
+        """
+        #the files and their entry go in together so the manifest always accounts for every folder
+        with self.locked():
+            makedirs(folder:=f"{self.path}/{key}", exist_ok=True)
+            for s in sources: link_or_copy(s, f"{folder}/{basename(s)}")
+            self.entries[key] = {
+                "files": [basename(s) for s in sources],
+                "nbytes": sum(stat(s).st_size for s in sources),
+                "used": time(), "uses": 1, "params": params or {}
+            }
+            self._evict(keep=key)
+    def evict(self, keep: str|None = None) -> list[str]:
+        """
+        drop entries (least recently or least frequently used first) until the cache fits in max_bytes
+        :param keep: str: an entry that mustn't be dropped, e.g. the one just stored
+        :return: the keys that were dropped
+        """
+        with self.locked(): return self._evict(keep)
+    def discard(self, key: str) -> None:
+        with self.locked(): self._discard(key)
+    def clear(self) -> None:
+        with self.locked():
+            for key in list(self.entries): self._discard(key)
+
+    @contextmanager
+    def locked(self):
+        """
+        hold the cache's lock (across processes) while the manifest is read, changed, and written back, so
+        simulations prepared at once don't overwrite each other's entries. Not reentrant
+        """
+        makedirs(self.path, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            flock(lock, LOCK_EX)
+            try:
+                self.load()
+                yield self
+                self.save()
+            finally: flock(lock, LOCK_UN)
+    def load(self) -> None:
+        #other processes may have added or used entries since this one last looked
+        if not exists(self.manifest): return None
+        with open(self.manifest, 'r') as file: saved = json.load(file)
+        if saved.get("version")==self.version: self.entries = saved["entries"]
+    def save(self) -> None:
+        makedirs(self.path, exist_ok=True)
+        #write then move so a crash never leaves a half written manifest behind
+        with open(tmp:=f"{self.manifest}.{uuid4().hex[:8]}.tmp", 'w') as file: json.dump({"version": self.version, "entries": self.entries}, file)
+        replace(tmp, self.manifest)
+
+    def _file(self, key: str, name: str) -> str: return f"{self.path}/{key}/{name}"
+    def _evict(self, keep: str|None = None) -> list[str]:
+        dropped = []
+        while self.nbytes > self.max_bytes and len(victims:=[k for k in self.entries if k!=keep]) > 0:
+            #ties in use count go to the least recently used entry
+            key = min(victims, key=lambda k: (self.entries[k]["uses"], self.entries[k]["used"]) if self.policy=='lfu' else self.entries[k]["used"])
+            self._discard(key)
+            dropped.append(key)
+        return dropped
+    def _discard(self, key: str) -> None:
+        #simulations linked to the files keep them, only the cache's links go
+        self.entries.pop(key, None)
+        rmtree(f"{self.path}/{key}", ignore_errors=True)
@@ -2,12 +2,14 @@
 from pysim.parsing import File, Folder
 from pysim.fields import ScalarField, VectorField
 from pysim.dhybridr.input import dHybridRinput
+from pysim.dhybridr.unformatted import write_unformatted, write_unformatted_fields, check_init_field
+from pysim.dhybridr.init_cache import InitCache
 #nonpysim imports
-from scipy.io import FortranFile
 import numpy as np
+from hashlib import sha256
+import json
 from numpy import pi
-
-def field_dot(A: np.ndarray, B: np.ndarray) -> np.ndarray: return np.sum(A * B, axis=0)
+from functools import cached_property
 
 class dHybridRconfig(File):
     def __init__(self, parent):
@@ -44,6 +46,32 @@ class dHybridRconfig(File):
         with open(self.path, 'w') as file: file.write("\n".join(self.lines))
 
 class dHybridRSnapshot:
+    """
+    one moment of a simulation, a view of its parent at a single dump. Nothing is read when it's made, each field is
+    read (through the parent's cache) the first time it's used, so making a whole list of snapshots costs nothing
+    ________
+    ~Inputs~
+    * parent - dHybridR
+        the simulation
+    * i - int
+        the dump, anything past the last one is the last one
+    * caching - bool
+        whether the snapshot's fields cache what's computed from them
+    * verbose - bool
+        passed to the snapshot's fields
+    ___________
+    ~Atributes~
+    * B, u, E - VectorField
+        the magnetic field, bulk flow, and electric field at this dump
+    * density - ScalarField
+        the density at this dump
+    * energy_grid, energy_pdf, dlne
+        the energy distribution at this dump, see dHybridR.energy_at
+    * T - float
+        the temperature, the mean energy of the distribution
+    * tau, time - float
+        when this dump is
+    """
     def __init__(
         self, 
         parent,
@@ -51,71 +79,133 @@ class dHybridRSnapshot:
         caching: bool = False,
         verbose: bool = False
     ):
-        i = i if i<len(parent.B) else len(parent.B)-1
-        kwargs = {'caching':caching, 'verbose':verbose, 'parent':parent}
-        self.B = VectorField(parent.B.x[i], parent.B.y[i], parent.B.z[i], name=parent.B.name, latex=parent.B.latex, **kwargs)
-        self.u = VectorField(parent.u.x[i], parent.u.y[i], parent.u.z[i], name=parent.u.name, latex=parent.u.latex, **kwargs)
-        self.E = VectorField(parent.E.x[i], parent.E.y[i], parent.E.z[i], name=parent.E.name, latex=parent.E.latex, **kwargs)
-        self.density = ScalarField(parent.density[i], name=parent.density.name, latex=parent.density.latex, **kwargs)
-        self.energy_grid = parent.energy_grid[i]
-        self.energy_pdf = parent.energy_pdf[i]
-        self.dlne = parent.dlne[i]
-        self.T = sum(self.energy_grid*self.energy_pdf*self.dlne)
-        self.tau = parent.tau[i]
-        self.time = parent.time[i]
+        self.parent = parent
+        self._i = i
+        self.kwargs = {'caching':caching, 'verbose':verbose, 'parent':parent}
+    def __repr__(self) -> str: return f"dHybridRSnapshot({self.parent.name}, {self.i})"
+    #clamped the first time it's used so making a snapshot doesn't even list the parent's dumps
+    @cached_property
+    def i(self) -> int: return min(int(self._i), len(self.parent.B)-1)
+
+    #the frames come straight out of the parent's fields (and cache) so nothing is copied
+    @cached_property
+    def B(self) -> VectorField: return self._vector(self.parent.B)
+    @cached_property
+    def u(self) -> VectorField: return self._vector(self.parent.u)
+    @cached_property
+    def E(self) -> VectorField: return self._vector(self.parent.E)
+    @cached_property
+    def density(self) -> ScalarField: 
+        return ScalarField(self.parent.density[self.i], name=self.parent.density.name, latex=self.parent.density.latex, **self.kwargs)
+    #only this dump's distribution is read unless the parent already has all of them
+    @cached_property
+    def _energy(self) -> tuple: return self.parent.energy_at(self.i)
+    @property
+    def energy_grid(self) -> np.ndarray: return self._energy[0]
+    @property
+    def energy_pdf(self) -> np.ndarray: return self._energy[1]
+    @property
+    def dlne(self) -> float: return self._energy[2]
+    @cached_property
+    def T(self) -> float: return np.nansum(self.energy_grid*self.energy_pdf*self.dlne)
+    @property
+    def tau(self) -> float: return self.parent.tau[self.i]
+    @property
+    def time(self) -> float: return self.parent.time[self.i]
+
+    def _vector(self, field: VectorField) -> VectorField: return VectorField(
+        field.x[self.i], field.y[self.i], field.z[self.i], name=field.name, latex=field.latex, **self.kwargs
+    )
 
 class dHybridRinitializer:
+    #bump when what an initializer builds from the same parameters changes, so cached init files aren't reused
+    version = 1
     def __init__(
         self,
-        simulation
+        simulation,
+        seed: int|None = None
     ):
         self.simulation = simulation
+        #a seed is always picked so whatever is built can be built again
+        self.seed: int = int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+        self.rng = np.random.default_rng(self.seed)
         self.input = self.simulation.input
-        #parse grid size and shape from input
-        self.L: list[float, float] = self.input.boxsize
-        self.dx: float = self.L[0] / self.input.ncells[0]
-        self.dy: float = self.L[1] / self.input.ncells[1]
-        self.Nx: int = int(self.L[0] / self.dx)
-        self.Ny: int = int(self.L[1] / self.dy)
-        self.shape: tuple[int, int] = (self.Ny, self.Nx)
-
-    def build_B_field(self): 
-        self.B = np.array([np.zeros(self.input.ncells) for i in range(2)])
-    def build_u_field(self):
-        self.u = np.array([np.zeros(self.input.ncells) for i in range(2)])
-    def save_init_field(self, field: np.ndarray, path: str): 
-        FortranFile(path, 'w').write_record(field.T)
-    def prepare_simulation(self):
+        #parse grid size and shape from input, init fields are (3, *ncells) so Fortran reads them as (3, nx, ny[, nz])
+        self.L: list[float] = list(self.input.boxsize)
+        self.shape: tuple[int, ...] = tuple(int(n) for n in self.input.ncells)
+        self.ndim: int = len(self.shape)
+        if self.ndim not in [2, 3]: raise ValueError(f"dHybridR grids are 2d or 3d, not {self.ndim}d")
+        self.spacing: tuple[float, ...] = tuple(l / n for l, n in zip(self.L, self.shape))
+        self.dx, self.dy = self.spacing[:2]
+        self.Nx, self.Ny = self.shape[:2]
+        self.dz: float|None = self.spacing[2] if self.ndim==3 else None
+        self.Nz: int = self.shape[2] if self.ndim==3 else 1
+
+    def coordinate(self, axis: int) -> np.ndarray:
+        """the positions of the cells along one axis, shaped to broadcast against a field's (ncells) grid"""
+        return (np.arange(self.shape[axis]) * self.spacing[axis]).reshape([-1 if a==axis else 1 for a in range(self.ndim)])
+    def build_B_field(self): self.B = np.zeros((3, *self.shape), dtype=np.float32)
+    def build_u_field(self): self.u = np.zeros((3, *self.shape), dtype=np.float32)
+    def save_init_field(self, field: np.ndarray, path: str) -> str: return write_unformatted(path, field)
+    @property
+    def init_files(self) -> dict: return {self.simulation.path+"/input/Bfld_init.unf": "B", self.simulation.path+"/input/vfld_init.unf": "u"}
+    @property
+    def parameters(self) -> dict: return {}
+    @property
+    def cache_key(self) -> str:
+        """what the init files are built from (the initializer, its parameters, the grid, and the seed) hashed"""
+        return sha256(json.dumps({
+            "initializer": f"{type(self).__module__}.{type(self).__qualname__}", "version": self.version,
+            "parameters": self.parameters, "ncells": list(self.input.ncells), "boxsize": list(self.input.boxsize),
+            "seed": self.seed
+        }, sort_keys=True, default=str).encode()).hexdigest()
+    def prepare_simulation(self, cache: InitCache|bool = False):
+        """
+        build the B and u fields and write them as the simulation's init files
+        :param cache: InitCache | bool: link the files out of this cache (True for the default one) if they've already
+                      been built with the same initializer, parameters, grid and seed, and keep them there if not
+        """
+        #an empty cache is falsy so check what it is
+        cache = InitCache() if cache is True else cache if isinstance(cache, InitCache) else None
+        if cache is not None and cache.fetch(self.cache_key, list(self.init_files)): return None
+        #the same seed always builds the same fields
+        self.rng = np.random.default_rng(self.seed)
         self.build_B_field()
-        self.save_init_field(self.B, self.simulation.path+"/input/Bfld_init.unf")
         self.build_u_field()
-        self.save_init_field(self.u, self.simulation.path+"/input/vfld_init.unf")
+        #both fields stream out at once, each a slab at a time
+        write_unformatted_fields({path: getattr(self, name) for path, name in self.init_files.items()})
+        if cache is not None: cache.store(self.cache_key, list(self.init_files), params={"initializer": type(self).__name__, "seed": self.seed, **self.parameters})
+    def check_init_files(self) -> dict:
+        """
+        check the init files prepare_simulation wrote (or linked out of a cache) are (3, *ncells) float32 fields,
+        without loading the files
+        :return: dict: check_init_field of each file by field name
+        """
+        return {name: check_init_field(path, (3, *self.shape), np.float32) for path, name in self.init_files.items()}
 
 class TurbInit(dHybridRinitializer):
+    #fields are laid out (3, *ncells) the way dHybridR reads them and each axis has its own wavenumbers, so boxes
+    #that aren't square are divergence free too
+    version = 3
     def __init__(
         self,
-        simulation
+        simulation,
+        seed: int|None = None
     ):
         self.config = dHybridRconfig(simulation)
         self.mach = float(self.config.mach)
         self.dB = float(self.config.dB)
         self.amplitude: tuple[float, float] = (self.dB, self.mach)
-        self.kinit = (1, np.pi) if 'kinit' not in self.config.params else (float(x) for x in self.config.kinit.split(','))
-        dHybridRinitializer.__init__(self, simulation)
+        self.kinit = (1, np.pi) if 'kinit' not in self.config.params else tuple(float(x) for x in self.config.kinit.split(','))
+        #a seed in the config wins so the same config always builds the same fields
+        dHybridRinitializer.__init__(self, simulation, seed=int(self.config.seed) if 'seed' in self.config.params else seed)
         self.kmin: float = 2 * pi / max(self.L)
-        self.kmax: float = pi / min([self.dx, self.dy])
-
-        # Set initial k vector
-        self.k: np.ndarray = np.mgrid[
-                             -self.Ny // 2: self.Ny // 2,
-                             -self.Nx // 2: self.Nx // 2
-                             ][::-1] * self.kmin
-        self.kmag: np.ndarray = np.hypot(*self.k)
-        self.kmag[self.kmag == 0] = np.nan
+        self.kmax: float = pi / min(self.spacing)
 
         self.simulation.mach = self.mach 
         self.simulation.dB = self.dB 
         self.simulation.kinit = self.kinit
+        self.simulation.seed = self.seed
         if not self.simulation.compressed:
             l = self.input.niter if not self.simulation.outputDir.exists() else len(self.simulation.B)*self.input.ndump
             self.simulation.time = np.arange(0, l, self.input.ndump) * self.input.dt
@@ -133,77 +223,80 @@ class TurbInit(dHybridRinitializer):
                 dHybridRSnapshot(self.simulation, np.argmin(abs(self.simulation.tau - n))) for n in range(1, int(self.simulation.tau[-1]//1))
             ]
 
-    def fluctuate(self, field, amp, no_div=True):
+    @property
+    def parameters(self) -> dict: return {"dB": self.dB, "mach": self.mach, "kinit": list(self.kinit)}
+
+    @property
+    def dk(self) -> np.ndarray: return 2 * pi / np.array(self.L)
+
+    # the full (centered) k grids are a few times bigger than a field so they're only made if they're asked for
+    @cached_property
+    def k(self) -> np.ndarray: return np.mgrid[tuple(slice(-N // 2, N // 2) for N in self.shape)] * self.dk.reshape(-1, *[1]*self.ndim)
+    @cached_property
+    def kmag(self) -> np.ndarray:
+        kmag = np.sqrt(np.sum(self.k**2, axis=0))
+        kmag[kmag == 0] = np.nan
+        return kmag
+
+    def fluctuate(self, field, amp, no_div=True, out: np.ndarray|None = None, workers: int = -1):
         """
-        Given the initialization create a 2d array the same shape as the simulation which will smoothly fluctuate
-        over length scales kinit
-        :return y: np.ndarray[np.float32]: random fluctuations set by parameters passed to __init__
+        Given the initialization create an array the same shape as the simulation (2d or 3d) which will smoothly 
+        fluctuate over length scales kinit. Only the modes in the kinit annulus (shell in 3d) get random phases and 
+        they're built straight into the half spectrum a real fft needs (so it's real without fixing up the symmetry by
+        hand), one component at a time in single precision. The rms is known from the modes (Parseval), so the 
+        fluctuations are scaled before they're transformed and never need another pass, and at most one grid sized
+        component is ever made besides the field itself
+        :param field: the (3, *ncells) field being fluctuated, only its shape is used
+        :param amp: the rms of the fluctuations
+        :param no_div: whether or not to ensure that the divergence of the fluctuations is 0
+        :param out: add the fluctuations to this (3, *ncells) field in place instead of making a new one
+        :param workers: threads scipy.fft uses for each transform, -1 uses every core
+        :return y: np.ndarray[np.float32]: random fluctuations set by parameters passed to __init__ (out if given)
         """
-        init_mask: np.ndarray = np.where((self.kinit[0] * self.kmin < self.kmag) & (self.kmag < self.kinit[1] * self.kmin))
-        M: int = len(init_mask[0])  # number of cells with an amplitude
-        phases: np.ndarray = np.exp(2j * pi * np.random.random(field.shape))  # randomized complex phases
-        phases[2] *= 0  # don't wiggle the z component
-        # Setting the fourier transform
-        FT: np.ndarray = np.zeros(field.shape, dtype=complex)  # same shape as field
-        FT[0][init_mask] = amp * np.pi / 2 # set x and y amplitudes
-        FT[1][init_mask] = amp * np.pi
-        FT *= phases  # apply phases
-        # subtract off the parallel x/y components
-        if no_div:
-            FT[:2] -= field_dot(FT[:2], self.k / self.kmag) * self.k / self.kmag
-        FT[np.isnan(FT)] = 0
-        # apply the condition to make this real
-        _fx = np.roll(FT[1, ::-1, ::-1], 1, axis=(0, 1))
-        FT[1, :self.Ny // 2] = np.conj(_fx[:self.Ny // 2])
-
-        _fy = np.roll(FT[0, ::-1, ::-1], 1, axis=(0, 1))
-        FT[0, :self.Ny // 2] = np.conj(_fy[:self.Ny // 2])
-
-        # I think we have to fix the zero line
-        FT[1, self.Ny // 2, 1:self.Nx // 2] = FT[1, self.Ny // 2, self.Nx // 2 + 1:][::-1]
-        FT[1, self.Ny // 2, 1:self.Nx // 2] = np.conj(FT[1, self.Ny // 2, self.Nx // 2 + 1:][::-1])
-        FT[1, self.Ny // 2, :] = 0.j
-        FT[1, :, self.Nx // 2] = 0.j
-
-        FT[0, self.Ny // 2, 1:self.Nx // 2] = FT[0, self.Ny // 2, self.Nx // 2 + 1:][::-1]
-        FT[0, self.Ny // 2, 1:self.Nx // 2] = np.conj(FT[0, self.Ny // 2, self.Nx // 2 + 1:][::-1])
-        FT[0, self.Ny // 2, :] = 0.j
-        FT[0, :, self.Nx // 2] = 0.j
-
-        # take the inverse fourier transform
-        y: np.ndarray = np.array([*np.real(
-            np.fft.ifft2(
-                np.fft.ifftshift(
-                    FT[:2]
-                )
-            )
-        ), np.zeros(FT[0].shape)]) / M * self.Nx * self.Ny
-
-        rms = np.sqrt(np.nanmean(y[0]**2 + y[1]**2))
-        y *= (amp / rms)
-        return np.float32(y)
+        from scipy import fft
+        shape = np.shape(field)[1:]
+        # the mode numbers in the annulus, modes with any component 0 stay empty and only positive modes along the
+        # last axis are needed for a real field
+        n = int(np.ceil(self.kinit[1])) + 1
+        last = np.arange(1, min(n, (shape[-1] - 1)//2 + 1))
+        others = [np.arange(-min(n, (N - 1)//2), min(n, (N - 1)//2) + 1) for N in shape[:-1]]
+        last, *others = np.meshgrid(last, *others, indexing='ij')
+        modes = np.array([*others, last]).reshape(len(shape), -1)
+        modes = modes[:, np.all(modes!=0, axis=0)]
+        # mode n along an axis of length L has wavenumber 2 pi n / L
+        k = modes * self.dk[:, None]
+        kmag = np.sqrt(np.sum(k**2, axis=0))
+        init_mask = (self.kinit[0] * self.kmin < kmag) & (kmag < self.kinit[1] * self.kmin)
+        if not init_mask.any(): raise ValueError(f"there are no modes with kinit {self.kinit[0]} < k/kmin < {self.kinit[1]}")
+        modes, k, kmag = modes[:, init_mask], k[:, init_mask], kmag[init_mask]
+        # an amplitude for each component along the grid with randomized complex phases
+        FT = np.array([amp * np.pi] + [amp * np.pi / 2]*(len(shape) - 1))[:, None] * np.exp(2j * pi * self.rng.random((len(shape), len(kmag))))
+        # subtract off the parallel components
+        if no_div: FT -= np.sum(FT * k, axis=0) / kmag**2 * k
+        # every mode and its conjugate add 2|F|^2/N^2 to the mean square
+        rms = np.sqrt(2 * np.sum(np.abs(FT)**2)) / np.prod(shape)
+        FT *= amp / rms
+        y = np.zeros((3, *shape), dtype=np.float32) if out is None else out
+        spectrum = np.zeros((*shape[:-1], shape[-1]//2 + 1), dtype=np.complex64)
+        where = tuple(m % N for m, N in zip(modes[:-1], shape[:-1])) + (modes[-1],)
+        for c in range(len(shape)):
+            spectrum[where] = FT[c]
+            # take the inverse fourier transform
+            y[c] += fft.irfftn(spectrum, s=shape, workers=workers)
+        return y
     def construct_field(self, x, y, z, amp, no_div=True):
         """
-        Constructs a 3 x N x N array representing a constant x, y, and z component with additional fluctuations
+        Constructs a (3, *ncells) array representing a constant x, y, and z component with additional fluctuations
         :param x:
         :param y:
         :param z:
         :param no_div: whether or not to ensure that the divergence of the field is 0 when applying fluctuations
         :return field:
         """
-        base_field = np.array([
-            np.zeros(self.shape) + y,
-            np.zeros(self.shape) + x,
-            np.zeros(self.shape) + z
-        ], dtype=np.float32)
-
-        base_rms: float = np.sqrt(np.mean(base_field ** 2))
-        fluctuations: np.ndarray = self.fluctuate(base_field, amp, no_div=no_div)
-        field: np.ndarray = base_field + fluctuations
-        alt_rms: float = np.sqrt(np.mean(base_field ** 2))
-        if not any([base_rms == 0, alt_rms == 0]):
-            field *= base_rms / alt_rms
-        return field
+        field = np.empty((3, *self.shape), dtype=np.float32)
+        field[0], field[1], field[2] = x, y, z
+        # the fluctuations are added in place
+        return self.fluctuate(field, amp, no_div=no_div, out=field)
     def build_B_field(self): self.B = self.construct_field(0, 0, 1, self.amplitude[0])
     def build_u_field(self): self.u = self.construct_field(0, 0, 0, self.amplitude[1])
 
@@ -223,15 +316,13 @@ class FlareWaveInit(dHybridRinitializer):
         self.w0 = w0 
         self.psi0 = psi0
 
+    @property
+    def parameters(self) -> dict: return {"B0": self.B0, "Bg": self.Bg, "w0": self.w0, "psi0": self.psi0}
+
     def build_B_field(self, unknown_variable=69.12):
-        x = np.arange(0, self.Nx) * self.dx
-        y = np.arange(0, self.Ny) * self.dy
-        Bx = np.array([
-            self.B0 * (np.tanh((y - 0.25*self.L[1])/self.w0) - np.tanh((y - 0.75*self.L[1])/self.w0) - 1)
-        for i in range(len(x))]).T
-        By = np.array([
-            (unknown_variable / self.L[0]) * np.cos(2*np.pi*x / self.L[0]) * np.sin(2*np.pi*x / self.L[0])**10
-        for i in range(len(y))])
-        Bz = np.sqrt(self.B0**2 + self.Bg**2 - Bx**2)
-        self.B = np.array([Bx.T, By.T, Bz.T], dtype=np.float32)
-    
\ No newline at end of file
+        #each component is a 1d profile broadcast over the grid (the same in every z plane in 3d)
+        x, y = self.coordinate(0), self.coordinate(1)
+        Bx = self.B0 * (np.tanh((y - 0.25*self.L[1])/self.w0) - np.tanh((y - 0.75*self.L[1])/self.w0) - 1)
+        By = (unknown_variable / self.L[0]) * np.cos(2*np.pi*x / self.L[0]) * np.sin(2*np.pi*x / self.L[0])**10
+        self.B = np.empty((3, *self.shape), dtype=np.float32)
+        self.B[0], self.B[1], self.B[2] = Bx, By, np.sqrt(self.B0**2 + self.Bg**2 - Bx**2)
@@ -0,0 +1,121 @@
+#nonpysim imports
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from os import replace
+
+#gfortran splits records longer than this into subrecords, each with its own markers
+max_subrecord: int = 2**31 - 9
+
+def subrecords(nbytes: int) -> list[tuple[int, int]]:
+    """
+    the (leading, trailing) markers of each subrecord of a record, gfortran makes the leading marker negative when
+    another subrecord follows and the trailing marker negative when one came before
+    :param nbytes: the length of the record
+    :return: list of marker pairs, their absolute values are the lengths of the subrecords
+    """
+    lengths = [min(max_subrecord, nbytes - start) for start in range(0, nbytes, max_subrecord)] or [0]
+    return [
+        (-n if k < len(lengths)-1 else n, -n if k > 0 else n) for k, n in enumerate(lengths)
+    ]
+
+def write_unformatted(path: str, field: np.ndarray, chunk_bytes: int = 2**26) -> str:
+    """
+    write an array as one Fortran unformatted sequential record (what FortranFile(path).write_record(field.T)
+    writes) streaming it out a slab at a time, so only one slab is ever transposed rather than the whole array
+    :param path: str: where to write
+    :param field: np.ndarray: a (3, *ncells) field, i.e. (3, nx, ny) or (3, nx, ny, nz), written in Fortran order so
+                  dHybridR reads it into a(3, nx, ny[, nz]) with the same indices
+    :param chunk_bytes: roughly how much to transpose and write at once
+    :return: the path
+    """
+    markers = iter(subrecords(field.nbytes))
+    left = 0
+    #slabs along the last axis are contiguous in Fortran order
+    step = max(1, chunk_bytes // max(1, field.nbytes // max(1, field.shape[-1])))
+    #write next to the file and then move it so nothing ever sees half an init file
+    with open(tmp:=path + ".tmp", 'wb') as file:
+        def write(data: memoryview) -> None:
+            nonlocal left, trailing
+            while len(data) > 0:
+                if left==0:
+                    leading, trailing = next(markers)
+                    left = abs(leading)
+                    file.write(np.int32(leading).tobytes())
+                file.write(data[:left])
+                written = min(left, len(data))
+                data, left = data[written:], left - written
+                if left==0: file.write(np.int32(trailing).tobytes())
+        trailing = 0
+        #an empty record is still a pair of markers
+        if field.nbytes==0: file.write(np.zeros(2, np.int32).tobytes())
+        for start in range(0, field.shape[-1], step):
+            write(memoryview(np.ascontiguousarray(field[..., start:start+step].T)).cast('B'))
+    replace(tmp, path)
+    return path
+
+def write_unformatted_fields(fields: dict, chunk_bytes: int = 2**26) -> list[str]:
+    """
+    write several init files at once (e.g. B and u), each streamed out by write_unformatted in its own thread
+    :param fields: dict of path: field
+    :param chunk_bytes: roughly how much of each field to transpose and write at once
+    :return: the paths
+    """
+    with ThreadPoolExecutor(max_workers=len(fields) or 1) as pool:
+        return list(pool.map(lambda item: write_unformatted(*item, chunk_bytes=chunk_bytes), fields.items()))
+
+def record_segments(path: str) -> list[tuple[int, int]]:
+    """
+    find where the data of the first record in a Fortran unformatted file is by walking its markers, nothing else is read
+    :param path: str: the file
+    :return: list of (offset, nbytes) of each subrecord's data
+    """
+    segments, offset = [], 0
+    with open(path, 'rb') as file:
+        while True:
+            file.seek(offset)
+            header = file.read(4)
+            if len(header) < 4: raise ValueError(f"{path} ends in the middle of a record")
+            leading = int(np.frombuffer(header, np.int32)[0])
+            file.seek(offset + 4 + abs(leading))
+            footer = file.read(4)
+            if len(footer) < 4 or abs(int(np.frombuffer(footer, np.int32)[0]))!=abs(leading):
+                raise ValueError(f"{path} has mismatched record markers at byte {offset}")
+            segments.append((offset + 4, abs(leading)))
+            offset += abs(leading) + 8
+            if leading >= 0: return segments
+
+def read_unformatted(path: str, shape: tuple, dtype=np.float32) -> np.ndarray:
+    """
+    memory map a field written by write_unformatted (or FortranFile.write_record(field.T)) without reading it
+    :param path: str: the file
+    :param shape: tuple: the shape of the field, (3, *ncells)
+    :param dtype: the type of each value
+    :return: np.ndarray: a read only (shape) view of the file, records split into subrecords (over 2GiB) aren't
+             contiguous on disk so those are read into memory
+    """
+    segments = record_segments(path)
+    if (nbytes:=sum(n for _, n in segments))!=np.prod(shape)*np.dtype(dtype).itemsize:
+        raise ValueError(f"{path} holds {nbytes} bytes but a {shape} {np.dtype(dtype)} field needs {np.prod(shape)*np.dtype(dtype).itemsize}")
+    if len(segments)==1: return np.memmap(path, dtype=dtype, mode='r', offset=segments[0][0], shape=tuple(shape)[::-1]).T
+    raw = np.concatenate([np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(n,)) for offset, n in segments])
+    return raw.view(dtype).reshape(tuple(shape)[::-1]).T
+
+def check_init_field(path: str, shape: tuple, dtype=np.float32, chunk: int = 16) -> dict:
+    """
+    check an init file without loading it: the record markers have to add up to the field, every value has to be
+    finite, and the mean and rms of each component are worked out a few slabs at a time
+    :param path: str: the file
+    :param shape: tuple: the shape of the field, (3, *ncells)
+    :param dtype: the type of each value
+    :param chunk: how many slabs (along the last axis) to look at at once
+    :return: dict: the 'mean' and 'rms' of each component (along the first axis) and whether everything is 'finite'
+    """
+    field = read_unformatted(path, shape, dtype)
+    total, squares, finite = 0., 0., True
+    for start in range(0, shape[-1], chunk):
+        slab = np.asarray(field[..., start:start+chunk], dtype=np.float64)
+        finite &= bool(np.isfinite(slab).all())
+        axes = tuple(range(1, slab.ndim))
+        total, squares = total + slab.sum(axis=axes), squares + np.square(slab).sum(axis=axes)
+    n = np.prod(shape[1:])
+    return {'mean': total / n, 'rms': np.sqrt(squares / n), 'finite': finite}
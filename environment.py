@@ -1,8 +1,11 @@
 from pysim.parsing import File, Folder 
+from os.path import expanduser
 #need to rethink this better 
 pysimDir = Folder("/".join(__file__.split('/')[:-1]))
 simulationDir = Folder("/anvil/scratch/x-kgootkin/sims/")
 dHybridRtemplate = Folder(pysimDir.path + "/templates/dHybridR/")
 figDir = Folder("/home/x-kgootkin/figures/")
 frameDir = Folder("/home/x-kgootkin/frames/")
-videoDir = Folder("/home/x-kgootkin/videos/")
\ No newline at end of file
+videoDir = Folder("/home/x-kgootkin/videos/")
+#generated init files shared between simulations
+initCacheDir = Folder(expanduser("~/.cache/pysim/init/"))
\ No newline at end of file
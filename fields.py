@@ -1,16 +1,30 @@
 #pysim imports
 import pysim.parsing as parsing
 from pysim.parsing import Folder, File
-from pysim.utils import verbose_bar
-from pysim.plotting import show, show_video
+from pysim.utils import verbose_bar, read_ahead, kspec1d, kspec2d, block_reduce
+from pysim.cache import FrameCache, resolve_cache
+from pysim.store import dump_iteration
+from pysim.index import OutputIndex
+from pysim.reductions import reduce_frames, FrameStats
+from pysim.derivatives import derivative_engine
 #nonpysim imports
 from glob import glob
 import numpy as np
 from h5py import File as h5File
-from functools import cached_property
+from functools import cached_property, partial
+from os import makedirs
 from os.path import isdir, isfile
+from copy import copy
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
 import builtins
-from matplotlib.cm import plasma as default_cmap
+import mmap
+import numbers
+import re
+#numexpr fuses whole expressions into one multithreaded pass when it's installed
+try: import numexpr
+except ImportError: numexpr = None
 
 def curlz(X, Y, order: int = 2) -> np.ndarray:
     """
@@ -31,6 +45,314 @@ def calc_psi(Bx, By, dx, dy):
     psi[:,1:] = (psi[:,0] - np.cumsum(By[:,1:], axis=1).T*dx).T
     return psi
 
+# region (hyperslab) utilities
+def hyperslab(region: tuple, shape: tuple) -> tuple[tuple, tuple]:
+    """
+    split an (x, y) region into the part h5py can select on disk and the part numpy has to finish in memory
+    :param region: tuple: ints, slices, or lists for each spatial axis
+    :param shape: tuple: the (x, y) shape of the full frame
+    :return: selection, remainder: what to read from disk and what to apply to the result
+    """
+    region = tuple(region) + (slice(None),)*(len(shape)-len(region))
+    selection, remainder = [], []
+    for idx, n in zip(region, shape):
+        if isinstance(idx, (int, np.integer)):
+            if not -n <= idx < n: raise IndexError(f"index {idx} is out of bounds for axis with size {n}")
+            #integers drop the axis so there is nothing left to do in memory
+            selection.append(int(idx) % n)
+        elif isinstance(idx, slice):
+            start, stop, step = idx.indices(n)
+            if step > 0: 
+                selection.append(slice(start, max(start, stop), step))
+                remainder.append(slice(None))
+            else:
+                #h5py can't step backwards, so read the block forwards and flip it in memory
+                selection.append(slice(stop+1, max(stop+1, start+1)))
+                remainder.append(slice(None, None, step))
+        else:
+            #fancy indexing is done in memory
+            selection.append(slice(None))
+            remainder.append(idx)
+    return tuple(selection), tuple(remainder)
+
+def compose_regions(outer: tuple, inner: tuple, shape: tuple) -> tuple:
+    """
+    combine a region taken from a view with the region that view was taken from
+    :param outer: tuple: the region defining the view
+    :param inner: tuple: a region relative to the view
+    :param shape: tuple: the full shape of the frame
+    :return: the equivalent region relative to the full frame
+    """
+    if len(outer)==0: return tuple(inner)
+    outer = tuple(outer) + (slice(None),)*(len(shape)-len(outer))
+    inner = list(inner)
+    composed = []
+    for idx, n in zip(outer, shape):
+        #integers already used up their axis
+        if isinstance(idx, (int, np.integer)) or len(inner)==0:
+            composed.append(idx)
+            continue
+        if not isinstance(idx, slice):
+            #lists keep their axis, indexing into one picks out of it
+            picked = np.asarray(idx)[inner.pop(0)]
+            composed.append(int(picked) if picked.ndim==0 else picked.tolist())
+            continue
+        axis, sub = range(*idx.indices(n)), inner.pop(0)
+        if isinstance(sub, (int, np.integer)): composed.append(axis[sub])
+        elif isinstance(sub, slice):
+            axis = axis[sub]
+            composed.append(slice(axis.start, axis.stop if axis.stop >= 0 else None, axis.step))
+        else: composed.append([axis[j] for j in sub])
+    if len(inner)>0: raise IndexError(f"too many indices, region has {len(shape)} dimensions")
+    return tuple(composed)
+
+def region_shape(region: tuple, shape: tuple) -> tuple:
+    """the shape of a region of a frame, without reading or allocating anything"""
+    region = tuple(region) + (slice(None),)*(len(shape)-len(region))
+    return tuple(
+        len(range(*idx.indices(n))) if isinstance(idx, slice) else len(idx)
+    for idx, n in zip(region, shape) if not isinstance(idx, (int, np.integer)))
+
+def take_region(array: np.ndarray, region: tuple, lead: int = 0) -> np.ndarray:
+    """
+    cut a region out of frames in memory, every axis is indexed on its own (like h5py reads them) so lists on two
+    axes pick out a block rather than pairs of points the way numpy would
+    :param array: np.ndarray: the frames
+    :param region: tuple: ints, slices, or lists for each spatial axis
+    :param lead: how many axes (e.g. time, components) come before the spatial ones
+    :return: the region
+    """
+    if sum(not isinstance(idx, (slice, int, np.integer)) for idx in region) < 2: return array[(slice(None),)*lead + tuple(region)]
+    axis = lead
+    for idx in region:
+        if isinstance(idx, (int, np.integer)): array = np.take(array, idx, axis=axis)
+        else:
+            array = array[(slice(None),)*axis + (idx,)]
+            axis += 1
+    return array
+
+def region_key(region: tuple) -> tuple:
+    """make a region hashable so it can be used as a cache key"""
+    return tuple(
+        (s.start, s.stop, s.step) if isinstance(s, slice) else 
+        int(s) if isinstance(s, (int, np.integer)) else 
+        tuple(np.ravel(s).tolist())
+    for s in region)
+
+def read_h5_frame(file: str, region: tuple = ()) -> np.ndarray:
+    """
+    read a (region of a) dHybridR output frame, only pulling the requested hyperslab off of disk
+    :param file: str: the h5 file to read
+    :param region: tuple: the (x, y) region to read, defaults to the whole frame
+    :return: output: np.ndarray: the frame in (x, y) order
+    """
+    with h5File(file, 'r') as f:
+        data = f["DATA"]
+        #GODDMANIT I HATE THAT IT DOES Y,X and not X,Y
+        selection, remainder = hyperslab(region, data.shape[::-1])
+        output = np.array(data[selection[::-1]]).T
+        return take_region(output, remainder) if len(remainder)>0 else output
+
+def split_store_path(path: str) -> tuple[str, str]|None:
+    """
+    split a path that runs through a consolidated output store into the store file and the key inside it
+    e.g. "sim/Output.h5/Fields/Magnetic/Total/x" -> ("sim/Output.h5", "Fields/Magnetic/Total/x")
+    :param path: str: the path to split
+    :return: (store, key), or None if the path doesn't go through a store
+    """
+    parts = path.replace("\\", "/").split("/")
+    for j, part in enumerate(parts[:-1]):
+        if part.endswith(".h5") and isfile(store:="/".join(parts[:j+1])): 
+            return store, "/".join(p for p in parts[j+1:] if len(p)>0)
+    return None
+
+def read_store_frame(store: str, key: str, index: dict, file: str, region: tuple = ()) -> np.ndarray:
+    """
+    read a (region of a) frame from a consolidated output store
+    :param store: str: the store file
+    :param key: str: the group holding the field
+    :param index: dict: maps the names in file_names to their position in the store
+    :param file: str: the name of the frame to read
+    :param region: tuple: the (x, y) region to read, defaults to the whole frame
+    :return: output: np.ndarray: the frame in (x, y) order
+    """
+    with h5File(store, 'r') as f:
+        #stores are already in (t, x, y) order
+        data = f[key]["DATA"]
+        selection, remainder = hyperslab(region, data.shape[1:])
+        output = np.array(data[(index[file], *selection)])
+        return take_region(output, remainder) if len(remainder)>0 else output
+
+def time_indices(item, n: int) -> list|range:
+    """
+    turn a time selection into the frame indices it covers
+    :param item: None | int | slice | list: the time selection, None means every frame
+    :param n: the number of frames available
+    :return: the indices selected
+    """
+    if item is None: return range(n)
+    if isinstance(item, (int, np.integer)): return [int(item)]
+    if isinstance(item, slice): return range(*item.indices(n))
+    return list(item)
+
+def sweep(*fields, item=None, depth: int = 0, processes: bool = False):
+    """
+    step through the frames of several fields together, reading up to depth frames of every field ahead 
+    of the one currently being used so that disk and cpu are busy at the same time
+    :param fields: ScalarFields to read from
+    :param item: None | int | slice | list: which frames to step through, defaults to all of them
+    :param depth: how many frames to read ahead, 0 reads each frame when it is needed
+    :param processes: read in worker processes instead of threads
+    :return: generator of tuples with one frame from each field
+    """
+    indices = time_indices(item, min(len(f) for f in fields))
+    #expressions evaluate through their fields' caches so they always stay in this process
+    processes = processes and not any(isinstance(f, FieldExpression) for f in fields)
+    #which frames were found in a cache, a task is always taken before its frame comes back so this never runs dry
+    hits = deque()
+    def tasks():
+        for i in indices:
+            for f in fields:
+                hits.append((task:=f._task(i, processes=processes))[0] is None)
+                yield task
+    frames = read_ahead(tasks(), depth=depth*len(fields), processes=processes)
+    def settle(f, i: int, frame: np.ndarray, hit: bool) -> np.ndarray: return f._store(i, f.region, frame) if processes and not hit else frame
+    for i in indices: yield tuple(settle(f, i, next(frames), hits.popleft()) for f in fields)
+
+def joint_reduce(fields: list, *reducers, item=None, depth: int = 0, processes: bool = False) -> dict:
+    """
+    run reducers over several fields at once in a single streaming pass, every reducer is given a tuple with one
+    frame from each field, e.g. joint_reduce([B.curlz_field(), s.density], Histogram2D(100), ConditionalStats(50))
+    :param fields: ScalarFields (or expressions like B.magnitude_field()) to step through together
+    :param reducers: Reducers that take tuples of frames, see pysim.reductions
+    :param item: None | int | slice | list: which frames to reduce over, defaults to all of them
+    :param depth: how many frames to read ahead
+    :param processes: read ahead in worker processes instead of threads
+    :return: dict of each reducer's name and result
+    """
+    return reduce_frames(sweep(*fields, item=item, depth=depth, processes=processes), *reducers)
+
+# batched reads
+_batch_output: np.ndarray|None = None
+def _read_into(k: int, reader, file: str, region: tuple) -> None: 
+    _batch_output[k] = reader(file, region)
+
+def shared_empty(shape: tuple, dtype) -> np.ndarray:
+    """make an uninitialized array in anonymous shared memory that forked workers can write straight into"""
+    nbytes = max(1, int(np.prod(shape))*np.dtype(dtype).itemsize)
+    return np.frombuffer(mmap.mmap(-1, nbytes), dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+def read_frames_into(out: np.ndarray, tasks: list, workers: int) -> np.ndarray:
+    """
+    read many frames concurrently, each one written directly into its slot of a preallocated array
+    :param out: np.ndarray: the (n, ...) array to fill, must come from shared_empty if forking is available
+    :param tasks: list of (k, reader, file, region) tuples, frame k of out gets reader(file, region)
+    :param workers: the number of workers to read with
+    :return: out
+    """
+    global _batch_output
+    #h5py holds a global lock so threads can't read in parallel, forked processes can and inherit out for free
+    if "fork" in multiprocessing.get_all_start_methods():
+        _batch_output = out
+        try:
+            with multiprocessing.get_context("fork").Pool(workers) as pool: 
+                pool.starmap(_read_into, tasks, chunksize=max(1, len(tasks)//(4*workers)))
+        finally: _batch_output = None
+    else:
+        def read_into(k, reader, file, region): out[k] = reader(file, region)
+        with ThreadPoolExecutor(workers) as pool: list(pool.map(lambda task: read_into(*task), tasks))
+    return out
+
+# derivatives
+def grid_spacing(parent, ndims: int) -> tuple:
+    """the grid spacing along each axis of a simulation's frames, 1 along any axis it doesn't know about"""
+    return tuple(float(getattr(parent, d, 1.)) for d in ["dx", "dy", "dz"][:ndims])
+
+def derive(fields: list, func, item=None, backend: str = 'spectral', batch: int = 8) -> np.ndarray:
+    """
+    apply a derivative operator to a time series, a batch of frames at a time, with fourier multipliers
+    cached for the grid so every batch costs one forward and one inverse fft
+    :param fields: list of ScalarFields, their frames are stacked as (batch, len(fields), x, y)
+    :param func: function of (Derivatives, frames) giving back (batch, ...) results
+    :param item: None | int | slice | list: which frames to differentiate, defaults to all of them
+    :param backend: str: 'spectral', 'compact', or 'fd2', see pysim.derivatives
+    :param batch: how many frames to transform at once
+    :return: np.ndarray: the results, (t, ...) or just (...) if item is an int
+    """
+    first = fields[0]
+    indices = time_indices(item, min(len(f) for f in fields))
+    engine = derivative_engine(tuple(first.full_shape), grid_spacing(first.parent, len(first.full_shape)), backend)
+    #derivatives need the whole periodic frame so views are cut out afterwards
+    region = first.region
+    out = None
+    for start in range(0, len(indices), batch):
+        chunk = indices[start:start+batch]
+        result = func(engine, np.stack([f.read_batch(chunk, region=()) for f in fields], axis=1))
+        #whatever comes before the grid axes (the batch, components) is kept
+        result = take_region(result, region, lead=result.ndim - len(first.full_shape))
+        if out is None: out = np.empty((len(indices), *result.shape[1:]), dtype=result.dtype)
+        out[start:start+len(chunk)] = result
+    return out[0] if isinstance(item, (int, np.integer)) else out
+
+def _curlz_frame(engine, fx: np.ndarray, fy: np.ndarray) -> np.ndarray: return engine.curl(np.stack([fx, fy]), components=(2,))[0]
+
+# lazy expressions
+#the elementwise operations expressions are built from: (numpy ufunc, numexpr template)
+expression_ops: dict = {
+    '+': (np.add, "({0} + {1})"),
+    '-': (np.subtract, "({0} - {1})"),
+    '*': (np.multiply, "({0} * {1})"),
+    '/': (np.true_divide, "({0} / {1})"),
+    '**': (np.power, "({0} ** {1})"),
+    'neg': (np.negative, "(-{0})"),
+    'abs': (np.absolute, "abs({0})"),
+    'sqrt': (np.sqrt, "sqrt({0})"),
+    'exp': (np.exp, "exp({0})"),
+    'log': (np.log, "log({0})"),
+    'sin': (np.sin, "sin({0})"),
+    'cos': (np.cos, "cos({0})"),
+    'tan': (np.tan, "tan({0})"),
+    'tanh': (np.tanh, "tanh({0})"),
+    'arctan2': (np.arctan2, "arctan2({0}, {1})"),
+}
+
+def apply_op(op, *values, out: np.ndarray|None = None):
+    """apply an expression operation (a key of expression_ops or a function) to arrays and constants"""
+    if callable(op): return op(*values)
+    return expression_ops[op][0](*values) if out is None else expression_ops[op][0](*values, out=out)
+
+#FrameStats of fields and expressions that aren't caching, keyed by what they read so rebuilding the same expression
+#reuses them. Fields that are caching keep theirs in their simulation's FrameCache instead, under its budget
+frame_stats_cache = FrameCache(2**26)
+
+def field_expression(op, *operands, name: str|None = None, latex: str|None = None):
+    """
+    combine fields and constants with an elementwise operation, lazily if any of them change in time
+    :param op: str | callable: a key of expression_ops or a function which maps frames to a frame of the same shape
+    :param operands: ScalarFields, numbers, or (x, y) arrays
+    :param name: what to call the result
+    :param latex: the latex label of the result
+    :return: a FieldExpression, a ScalarField if nothing changes in time, or NotImplemented so that
+             VectorFields get to combine component by component
+    """
+    if not all(isinstance(o, (ScalarField, np.ndarray, numbers.Number)) for o in operands): return NotImplemented
+    #single fields don't change in time so they're just constant maps
+    operands = [o.array if isinstance(o, ScalarField) and o.single else o for o in operands]
+    if not any(isinstance(o, ScalarField) for o in operands): return ScalarField(apply_op(op, *operands), name=name, latex=latex)
+    return FieldExpression(op, *operands, name=name, latex=latex)
+
+def _label(op, operands: tuple, attr: str) -> str:
+    symbol = op if isinstance(op, str) else getattr(op, "__name__", "func")
+    labels = [
+        (getattr(o, attr) or getattr(o, "name") or "field").strip("$") if isinstance(o, (ScalarField, VectorField)) else
+        "array" if isinstance(o, np.ndarray) else f"{o:g}"
+    for o in operands]
+    if symbol in ['+', '-', '*', '/', '**'] and len(labels)==2:
+        if attr=="latex" and symbol=='**': return f"{{{labels[0]}}}^{{{labels[1]}}}"
+        return f"({labels[0]}{symbol}{labels[1]})"
+    if symbol=='neg': return f"-{labels[0]}"
+    return f"{symbol}({', '.join(labels)})"
+
 class ScalarField:
     """
     a special class of arrays used to efficiently interact with the fields output by simulations
@@ -48,16 +370,31 @@ class ScalarField:
         the number of dimensions in the output arrays
 
     ===FILE MODE===
+    * iterations - numpy.ndarray
+        the iteration number of each dump
     * path - str
-        path containing field files 
+        path containing field files, or the path of the field inside a consolidated output store 
+        (e.g. sim/Output.h5/Fields/Magnetic/Total/x, see pysim.store)
     * file_names - list[str]
         the files containing fields
+    * region - tuple
+        the (x, y) region this field is a view of, empty for the whole frame. Index with field[t, x0:x1, y0:y1]
+        to read a region of frame t or use field.view(x0:x1, y0:y1) to make a lazy view; only the selected 
+        hyperslab is read from disk
+    * full_shape - tuple[int]
+        the shape of the full frames on disk
     * caching - bool
         whether or not to store file outputs for later use, more memory intensive but fewer file accesses
-    * cache - dict
-        a dictionary to store file outputs for later use
+    * cache - FrameCache | None
+        a memory budgeted cache to store file outputs for later use, shared with the parent simulation if it has one
     * reader - function
         the function used to read files
+    * read_ahead - int
+        how many frames to read in the background while iterating, 0 turns read ahead off
+    * workers - int
+        how many worker processes to use when reading slices or lists of frames
+    * dtype - numpy.dtype
+        the data type of the frames
 
     ===ARRAY MODE===
     * array - numpy.ndarray
@@ -67,18 +404,23 @@ class ScalarField:
         self, 
         source: str|Folder|File|list|np.ndarray, 
         parent = None,
-        caching: bool = False,
+        caching: bool|FrameCache = False,
         verbose: bool = False,
         name: str = None, 
-        latex: str = None
+        latex: str = None,
+        read_ahead: int = 0,
+        workers: int = 1
     ) -> None:
         self.name = name 
         self.latex = latex
         self.verbose = verbose
         self.parent = parent
+        self.region: tuple = ()
+        self.read_ahead = read_ahead
+        self.workers = workers
         #setup cache
-        self.caching = caching
-        self.cache: dict = {}
+        self.cache: FrameCache|None = resolve_cache(caching, parent)
+        self.caching = self.cache is not None
         #find the correct constructor
         match type(source):
             #if its a folder
@@ -86,6 +428,10 @@ class ScalarField:
                 self.single = False
                 example_file = File(source.children[0])
                 if example_file.extension=="h5": self._from_folder_of_h5(source.path)
+            #if the parent keeps an index of its output there's no need to look in the folder
+            case builtins.str if isinstance(getattr(parent, 'index', None), OutputIndex) and isdir(source):
+                self.single = False
+                self._from_index(source, parent.index)
             case builtins.str if isdir(source): 
                 self.single = False
                 files = glob(source+"/*")
@@ -100,6 +446,10 @@ class ScalarField:
                 extension = source.split(".")[-1] 
                 if extension=="h5": self._from_h5(source)
                 else: self._from_csv(source)
+            #or a field inside of a consolidated output store
+            case builtins.str if (store:=split_store_path(source)) is not None:
+                self.single = False
+                self._from_store(*store)
             #or if its already been read
             case np.ndarray: 
                 self.single = True
@@ -110,6 +460,7 @@ class ScalarField:
     def __len__(self) -> int: return 1 if self.single else len(self.file_names)
     def __iter__(self):
         assert not self.single, "Cannot iterate through single scalar field"
+        if self.read_ahead > 0: return self.prefetch()
         self.index = 0
         return self
     def __next__(self):
@@ -120,42 +471,282 @@ class ScalarField:
         else: raise StopIteration
     def __getitem__(self, item: int|slice|tuple|list) -> np.ndarray:
         if self.single: return self.array[item]
-        match type(item):
-            case builtins.int: 
-                return self.cache[item] if self.caching and item in self.cache.keys() else self.reader(self.file_names[item], item)
-            case builtins.slice:
-                item_iters = [
-                    i for i in range(
-                        item.start if not item.start is None else 0, 
-                        item.stop if not item.stop is None else len(self), 
-                        item.step if not item.step is None else 1
-                    )
-                ]
-                return np.array([
-                    self.cache[i] if self.caching and i in self.cache.keys() else self.reader(self.file_names[i], i) for i in item_iters
-                ])
-            case builtins.tuple|builtins.list: return np.array([
-                self.cache[i] if self.caching and i in self.cache.keys() else self.reader(self.file_names[i], i) for i in item
-            ])
+        #a tuple is a time index followed by a region, a la numpy
+        time, region = (item[0], compose_regions(self.region, item[1:], self.full_shape)) if type(item)==tuple else (item, self.region)
+        if isinstance(time, np.integer): time = int(time)
+        match type(time):
+            case builtins.int: return self._read(time, region)
+            case builtins.slice|builtins.list: return self.read_batch(time, region)
+
+    def _read(self, i: int, region: tuple = ()) -> np.ndarray:
+        if (frame:=self._cached(i, region)) is not None: return frame
+        return self._store(i, region, self.reader(self.file_names[i], region))
+    def _cached(self, i: int, region: tuple = ()) -> np.ndarray|None:
+        if not self.caching: return None
+        #frames are keyed by file so that every field sharing the cache can find them
+        file = self.file_names[i]
+        if len(region)==0: return self.cache.get(file)
+        #if the whole frame is already in memory there's no need to go back to disk
+        if file in self.cache and (frame:=self.cache.get(file)) is not None: return take_region(frame, region)
+        return self.cache.get((file, region_key(region)))
+    def _store(self, i: int, region: tuple, frame: np.ndarray) -> np.ndarray:
+        if not self.caching: return frame
+        file = self.file_names[i]
+        return self.cache.put(file if len(region)==0 else (file, region_key(region)), frame)
+    def _task(self, i: int, processes: bool = False) -> tuple:
+        if not processes: return (self._read, i, self.region)
+        #worker processes can't see the cache so frames already in it are handed straight back (see read_ahead),
+        #the rest get the bare reader and are stored afterwards
+        if (frame:=self._cached(i, self.region)) is not None: return (None, frame)
+        return (self.reader, self.file_names[i], self.region)
+
+    def read_batch(self, item, region: tuple|None = None, workers: int|None = None) -> np.ndarray:
+        """
+        read many frames at once, concurrently if workers > 1, straight into one preallocated array
+        :param item: int | slice | list: which frames to read
+        :param region: the (x, y) region to read, defaults to this field's region
+        :param workers: how many worker processes to read with, defaults to workers
+        :return: np.ndarray: the frames stacked as (n, x, y)
+        """
+        indices = time_indices(item, len(self))
+        region = self.region if region is None else region
+        workers = self.workers if workers is None else workers
+        shape = (len(indices), *region_shape(region, self.full_shape))
+        out = shared_empty(shape, self.dtype) if workers > 1 else np.empty(shape, dtype=self.dtype)
+        #frames already in the cache get copied straight in, only the rest are read
+        missing = []
+        for k, i in enumerate(indices):
+            if (frame:=self._cached(i, region)) is None: missing.append(k)
+            else: out[k] = frame
+        if workers < 2 or len(missing) < 2:
+            for k in missing: out[k] = self._store(indices[k], region, self.reader(self.file_names[indices[k]], region))
+            return out
+        read_frames_into(out, [(k, self.reader, self.file_names[indices[k]], region) for k in missing], min(workers, len(missing)))
+        #the workers all write into one shared buffer that gets handed back, so the cache keeps its own copies
+        if self.caching:
+            for k in missing: self._store(indices[k], region, out[k].copy())
+        return out
+
+    def prefetch(self, item=None, depth: int|None = None, processes: bool = False):
+        """
+        iterate through frames while the next depth frames are read in the background
+        :param item: None | int | slice | list: which frames to step through, defaults to all of them
+        :param depth: how many frames to read ahead, defaults to read_ahead
+        :param processes: read in worker processes instead of threads
+        :return: generator of frames
+        """
+        depth = self.read_ahead if depth is None else depth
+        for (frame,) in sweep(self, item=item, depth=depth, processes=processes): yield frame
+
+    def frame_stats(self, item=None, sample: int = 2**16, depth: int|None = None, batch: int|None = None) -> dict:
+        """
+        the statistics a color normalization needs (min, max, mean, std, smallest positive value, and a sample
+        to read quantiles from) in one streaming pass, see pysim.reductions.FrameStats. They're cached, so
+        another movie of the same field (or the same expression rebuilt) doesn't read anything
+        :param item: None | int | slice | list: which frames to use, defaults to all of them
+        :param sample: int: how many values to keep for quantiles, the error in a quantile shrinks like 1/sqrt(sample)
+        :param depth: how many frames to read ahead, defaults to read_ahead
+        :param batch: read this many frames at a time with read_batch instead of reading ahead
+        :return: dict: the result of a FrameStats
+        """
+        signature = self._signature()
+        #fields without a source on disk can only remember their own stats, expressions keep theirs wherever the
+        #fields they read keep their frames
+        cache = (
+            self.__dict__.setdefault("_frame_stats", FrameCache(2**26)) if signature is None else
+            next((f.cache for f in [self, *getattr(self, "leaves", [])] if f.caching), frame_stats_cache)
+        )
+        #the number of frames is part of the key so a run that's still going gets rescanned
+        key = ("frame_stats", signature, len(self), repr(item), sample)
+        if (stats:=cache.get(key)) is not None: return stats
+        if self.single: return cache.put(key, reduce_frames([self.array], FrameStats(sample))["frame_stats"])
+        return cache.put(key, self.reduce(FrameStats(sample), item=item, depth=depth, batch=batch)["frame_stats"])
+    def _signature(self) -> tuple|None: return None if self.single else ("field", self.path, repr(self.region))
+
+    def reduce(self, *reducers, item=None, depth: int|None = None, processes: bool = False, batch: int|None = None) -> dict:
+        """
+        compute per frame values (e.g. 'mean', 'rms', Percentile(99)) and accumulations over time (e.g. 'time_mean',
+        'time_std') in a single streaming pass, holding at most one frame (or one batch) in memory
+        :param reducers: names from pysim.reductions.named_reducers, functions to apply to every frame, or Reducers
+        :param item: None | int | slice | list: which frames to reduce over, defaults to all of them
+        :param depth: how many frames to read ahead, defaults to read_ahead
+        :param processes: read ahead in worker processes instead of threads
+        :param batch: read this many frames at a time with read_batch (using workers) instead of reading ahead
+        :return: dict of each reducer's name and result
+        """
+        if batch is None: return reduce_frames(self.prefetch(item=item, depth=depth, processes=processes), *reducers)
+        indices = list(time_indices(item, len(self)))
+        return reduce_frames((
+            frame for start in range(0, len(indices), batch) for frame in self.read_batch(indices[start:start+batch])
+        ), *reducers)
+
+    def refresh(self) -> int:
+        """
+        pick up dumps written since this field was set up, e.g. while the simulation is still running. Frames
+        already read (and cached) stay valid since dumps are only ever added
+        :return: int: how many new frames there are
+        """
+        if self.single: return 0
+        before = len(self)
+        if hasattr(self, "store"):
+            key = self.path[len(self.store)+1:]
+            with h5File(self.store, 'r') as f:
+                self.file_names = [f"{self.path}/{name}" for name in f[key]["files"].asstr()[:]]
+                self.iterations = f[key]["iterations"][:]
+            self.reader = partial(read_store_frame, self.store, key, {name: k for k, name in enumerate(self.file_names)})
+        #the index only rescans the folder if its mtime has changed
+        elif isinstance(getattr(self.parent, 'index', None), OutputIndex):
+            entry = self.parent.index.folder(self.path)
+            self.file_names, self.iterations = entry["file_names"], entry["iterations"]
+        else:
+            self.file_names = sorted(glob(self.path + "/*.h5"))
+            self.iterations = np.array([dump_iteration(f) for f in self.file_names], dtype=np.int64)
+        return len(self) - before
+
+    def view(self, *region):
+        """
+        make a lazy view of a region of this field, nothing is read until the view is indexed
+        :param region: ints, slices or lists for the x and y axes
+        :return: a ScalarField which only reads the given region
+        """
+        if self.single: return ScalarField(take_region(self.array, region), parent=self.parent, name=self.name, latex=self.latex)
+        view = copy(self)
+        view.region = compose_regions(self.region, region, self.full_shape)
+        view.shape = region_shape(view.region, self.full_shape)
+        view.ndims = len(view.shape)
+        return view
+
+    #arithmetic on fields builds lazy FieldExpressions, numpy has to defer to them rather than iterate the field
+    __array_ufunc__ = None
+    def __add__(self, other): return field_expression('+', self, other)
+    def __radd__(self, other): return field_expression('+', other, self)
+    def __sub__(self, other): return field_expression('-', self, other)
+    def __rsub__(self, other): return field_expression('-', other, self)
+    def __mul__(self, other): return field_expression('*', self, other)
+    def __rmul__(self, other): return field_expression('*', other, self)
+    def __truediv__(self, other): return field_expression('/', self, other)
+    def __rtruediv__(self, other): return field_expression('/', other, self)
+    def __pow__(self, other): return field_expression('**', self, other)
+    def __rpow__(self, other): return field_expression('**', other, self)
+    def __neg__(self): return field_expression('neg', self)
+    def __abs__(self): return field_expression('abs', self)
+    def apply(self, func, *others, name: str|None = None, latex: str|None = None):
+        """
+        lazily apply an elementwise function to every frame, e.g. field.apply(np.sqrt) or B.x.apply(np.arctan2, B.y)
+        :param func: callable | str: the function, numpy ufuncs in expression_ops (or their names) stay fusable
+        :param others: any other fields or constants func takes
+        :param name: what to call the result
+        :param latex: the latex label of the result
+        :return: FieldExpression
+        """
+        op = next((key for key, (ufunc, _) in expression_ops.items() if ufunc is func), func)
+        return field_expression(op, self, *others, name=name, latex=latex)
+
+    def save(self, folder: str, item=None, prefix: str|None = None):
+        """
+        write frames to a folder of per dump h5 files in the same format dHybridR uses, streaming one frame at a time
+        so derived fields (e.g. expressions) can be computed once and read back like any other output
+        :param folder: str: the folder to write to, created if it doesn't exist
+        :param item: None | int | slice | list: which frames to write, defaults to all of them
+        :param prefix: str: the start of each file name, defaults to the field's name
+        :return: ScalarField: the saved field
+        """
+        assert not self.single, "Cannot save a single scalar field as a time series"
+        makedirs(folder, exist_ok=True)
+        prefix = re.sub(r"\W+", "_", prefix or self.name or "field").strip("_")
+        indices = time_indices(item, len(self))
+        iterations = getattr(self, "iterations", np.arange(len(self)))
+        for i, frame in verbose_bar(zip(indices, self.prefetch(item=indices)), self.verbose, total=len(indices), desc=f"saving {prefix}"):
+            with h5File(f"{folder}/{prefix}_{str(iterations[i]).zfill(8)}.h5", 'w') as f:
+                #GODDMANIT I HATE THAT IT DOES Y,X and not X,Y
+                f.create_dataset("DATA", data=frame.T)
+                #keep the axes of the dump this frame came from if it still covers the whole grid
+                if len(self.region)==0 and (source:=self._source_file(i)) is not None:
+                    with h5File(source, 'r') as s:
+                        if "AXIS" in s: s.copy(s["AXIS"], f, name="AXIS")
+                        for k, v in s.attrs.items(): f.attrs[k] = v
+        return ScalarField(folder, parent=self.parent, name=self.name, latex=self.latex, read_ahead=self.read_ahead, workers=self.workers)
+    def _source_file(self, i: int) -> str|None:
+        file = self.file_names[i] if hasattr(self, "file_names") else None
+        return file if file is not None and isfile(file) else None
+
+    def spectrum(self, item=None, bins: int = 100, direction=None, batch: int = 16) -> tuple:
+        """
+        the fourier spectrum of every frame, batch frames at a time, see pysim.utils.kspec1d and kspec2d
+        :param item: None | int | slice | list: which frames to use, defaults to all of them
+        :param bins: the number of bins (along each axis for anisotropic spectra)
+        :param direction: None for isotropic |k| spectra, or the mean field direction for (k_par, k_perp) spectra,
+                          either a vector or a VectorField whose mean over the frames is used
+        :param batch: how many frames to transform at once
+        :return: (k, ks, kerr) or (kpar, kperp, ks, kerr) with ks and kerr stacked over time unless item is an int
+        """
+        indices = time_indices(item, len(self))
+        if isinstance(direction, VectorField): 
+            direction = [np.mean(c.reduce('mean', item=indices)['mean']) for c in direction.components]
+        spectrum = partial(kspec1d, bins=bins) if direction is None else partial(kspec2d, direction=direction, bins=bins)
+        results = [spectrum(self.read_batch(indices[start:start+batch])) for start in range(0, len(indices), batch)]
+        ks, kerr = np.concatenate([r[-2] for r in results]), np.concatenate([r[-1] for r in results])
+        if isinstance(item, (int, np.integer)): ks, kerr = ks[0], kerr[0]
+        return (*results[0][:-2], ks, kerr)
+    def grad(self, item=None, backend: str = 'spectral', batch: int = 8) -> np.ndarray:
+        """
+        the gradient, taken on the whole periodic frame
+        :param item: None | int | slice | list: which frames to use, defaults to all of them
+        :param backend: str: 'spectral', 'compact', or 'fd2', see pysim.derivatives
+        :param batch: how many frames to transform at once
+        :return: np.ndarray: (t, axes, x, y), or (axes, x, y) for an int
+        """
+        return derive([self], lambda engine, frames: engine.gradient(frames[:, 0]), item=item, backend=backend, batch=batch)
+    def laplacian(self, item=None, backend: str = 'spectral', batch: int = 8) -> np.ndarray:
+        """
+        the laplacian, taken on the whole periodic frame
+        :param item: None | int | slice | list: which frames to use, defaults to all of them
+        :param backend: str: 'spectral', 'compact', or 'fd2', see pysim.derivatives
+        :param batch: how many frames to transform at once
+        :return: np.ndarray: (t, x, y), or (x, y) for an int
+        """
+        return derive([self], lambda engine, frames: engine.laplacian(frames[:, 0]), item=item, backend=backend, batch=batch)
 
     def _from_folder_of_h5(self, path:str) -> None: 
         self.path = path.path if isinstance(path, Folder) else path
         self.file_names: list = sorted(glob(path + "/*.h5"))
-        self.reader: function = self._read_h5_file
-        self.shape = self[0].shape
+        self.iterations: np.ndarray = np.array([dump_iteration(f) for f in self.file_names], dtype=np.int64)
+        self.reader: function = read_h5_frame
+        example = self[0]
+        self.shape = example.shape
+        self.full_shape = self.shape
+        self.dtype = example.dtype
+        self.ndims = len(self.shape)
+    def _from_index(self, path: str, index: OutputIndex) -> None:
+        self.path = path
+        entry = index.folder(path)
+        self.file_names: list = entry["file_names"]
+        self.iterations: np.ndarray = entry["iterations"]
+        self.reader: function = read_h5_frame
+        self.shape = entry["shape"]
+        self.full_shape = self.shape
+        self.dtype = entry["dtype"]
+        self.ndims = len(self.shape)
+    def _from_store(self, store: str, key: str) -> None:
+        self.path = f"{store}/{key}"
+        self.store = store
+        with h5File(store, 'r') as f:
+            group = f[key]
+            #keep the original dump names so anything parsing them still works
+            self.file_names: list = [f"{self.path}/{name}" for name in group["files"].asstr()[:]]
+            self.iterations: np.ndarray = group["iterations"][:]
+            self.full_shape = group["DATA"].shape[1:]
+            self.dtype = group["DATA"].dtype
+        self.reader: function = partial(read_store_frame, store, key, {name: k for k, name in enumerate(self.file_names)})
+        self.shape = self.full_shape
         self.ndims = len(self.shape)
     def _from_h5(self, file:str) -> None:
         self.file = file.path if isinstance(file,File) else file
         self.array = self._read_h5_file(file, 0)
         self.shape = self.array.shape 
+        self.dtype = self.array.dtype
         self.ndims = len(self.shape)
-    def _read_h5_file(self, file:str, item) -> np.ndarray:
-        with h5File(file, 'r') as f:
-            output = np.array(f["DATA"][:])
-            #GODDMANIT I HATE THAT IT DOES Y,X and not X,Y
-            output = output.transpose((1,0))
-            if self.caching: self.cache[item] = output
-            return output
+    def _read_h5_file(self, file:str, item, region: tuple = ()) -> np.ndarray: return read_h5_frame(file, region)
     
     def _from_csv(self) -> None:
         self.single = True
@@ -165,26 +756,209 @@ class ScalarField:
         self.single = True
         self.array = array
         self.shape = array.shape
+        self.dtype = array.dtype
         self.ndims = len(self.shape)
 
-    def show(self, item:int, **kwargs) -> None: show(self[item],**kwargs)
+    #previews have a budget of their own so they never push full frames out of the main cache
+    preview_bytes: int = 2**28
+    @cached_property
+    def previews(self) -> FrameCache: return FrameCache(self.preview_bytes)
+    def preview(self, item: int, level: int = 1, method: str = 'mean') -> np.ndarray:
+        """
+        frame item shrunk by 2**level, see pysim.utils.block_reduce. Each level is made from the one below it and kept
+        in previews, so redrawing, zooming out, or making a preview movie only reads and reduces each frame once
+        :param item: int: the frame
+        :param level: int: how many times to halve the resolution, 0 is the frame itself
+        :param method: str: how blocks are combined, 'mean', 'max', 'min', or 'minmax'
+        :return: np.ndarray: the shrunk frame
+        """
+        if self.single: return block_reduce(self.array, 2**level, method)
+        if level==0: return self[item]
+        key = (item, repr(self.region), level, method)
+        if (frame:=self.previews.get(key)) is not None: return frame
+        return self.previews.put(key, block_reduce(self.preview(item, level-1, method), 2, method))
+    def pyramid(self, item: int) -> "FramePyramid": return FramePyramid(self, item)
+
+    #plotting pulls in matplotlib so it is only imported when something is plotted
+    def show(self, item:int, **kwargs) -> None: 
+        from pysim.plotting import show
+        #show picks the level of detail so the full frame is only read if it's needed
+        show(self[item] if self.single else self.pyramid(item), **kwargs)
     
-    def movie(self, norm='none', cmap=default_cmap, alter_func=None,**kwrg) -> None:
+    def movie(self, norm='none', cmap=None, alter_func=None,**kwrg) -> None:
+        from pysim.plotting import show_video
         @show_video(name=self.name, latex=self.latex, norm=norm, cmap=cmap)
-        def reveal_thyself(s,alter_func=alter_func, **kwargs): 
-            return np.array([self[i] for i in range(len(self))]) if alter_func is None else np.array([alter_func(self[i]) for i in range(len(self))])
+        #frames are handed over lazily and only read as they are rendered
+        def reveal_thyself(s,alter_func=alter_func, **kwargs): return self if alter_func is None else self.apply(alter_func)
         reveal_thyself(self if self.parent is None else self.parent, alter_func=alter_func,**kwrg)
 
+class FramePyramid:
+    """
+    one frame of a field at every power of 2 resolution, nothing is read until a level is asked for
+    (see ScalarField.preview), show draws these at the coarsest level that still fills the axes
+    """
+    def __init__(self, field: ScalarField, item: int) -> None:
+        self.field = field
+        self.item = item
+        self.shape = field.shape
+    def __repr__(self) -> str: return f"FramePyramid({self.field.name}, {self.item})"
+    def level(self, level: int, method: str = 'mean') -> np.ndarray: return self.field.preview(self.item, level, method)
+
+def _inlined(operand) -> bool:
+    #expressions are evaluated as part of whatever expression uses them, unless they're a view of a region
+    return isinstance(operand, FieldExpression) and len(operand.region)==0
+
+class FieldExpression(ScalarField):
+    """
+    a lazy elementwise combination of fields, made by doing arithmetic on ScalarFields and VectorFields
+    e.g. B.x**2 + B.y**2, u.magnitude_field(), or density*u.magnitude_field()**2. Nothing is read until it is indexed or iterated, then
+    each frame is evaluated in one fused pass (a single numexpr kernel if numexpr is installed, otherwise numpy
+    reusing its temporaries in place) reading every field it depends on once
+    ________
+    ~Inputs~
+    * op - str | callable
+        the operation, a key of expression_ops or a function which maps frames to a frame of the same shape
+    * operands - ScalarField | FieldExpression | number | numpy.ndarray
+        what the operation acts on, arrays are constant (x, y) maps
+    ___________
+    ~Atributes~
+    * leaves - list[ScalarField]
+        the fields this expression reads from
+    * constants - list
+        the numbers and arrays in this expression
+    * kernel - str | None
+        the numexpr version of this expression, None if numexpr isn't installed or it uses a python function
+    """
+    def __init__(self, op, *operands, name: str|None = None, latex: str|None = None) -> None:
+        assert callable(op) or op in expression_ops, f"op: {op} not available, please choose from {list(expression_ops)} or pass a function"
+        self.op = op
+        self.operands = operands
+        self.leaves: list = list({id(f): f for o in operands for f in (o.leaves if _inlined(o) else [o] if isinstance(o, ScalarField) else [])}.values())
+        self.constants: list = [c for o in operands for c in (o.constants if _inlined(o) else [] if isinstance(o, ScalarField) else [o])]
+        assert len(self.leaves)>0, "expressions need at least one field, use field_expression to combine constants"
+        self.name = _label(op, operands, "name") if name is None else name
+        self.latex = f"${_label(op, operands, 'latex')}$" if latex is None else latex
+        self.verbose = self.leaves[0].verbose
+        self.parent = self.leaves[0].parent
+        self.single = False
+        self.region: tuple = ()
+        self.read_ahead = max(f.read_ahead for f in self.leaves)
+        self.workers = 1
+        #the fields being read do the caching
+        self.cache: FrameCache|None = None
+        self.caching = False
+        if hasattr(self.leaves[0], "iterations"): self.iterations = self.leaves[0].iterations
+        self.full_shape = np.broadcast_shapes(*[f.shape for f in self.leaves], *[np.shape(c) for c in self.constants])
+        self.shape = self.full_shape
+        self.ndims = len(self.shape)
+        self.kernel = self._kernel()
+    def __len__(self) -> int: return min(len(f) for f in self.leaves)
+
+    @cached_property
+    def dtype(self) -> np.dtype:
+        #evaluating a single point gives the type of the result without reading anything
+        ones = {id(f): np.ones((1,)*f.ndims, dtype=f.dtype) for f in self.leaves}
+        try:
+            with np.errstate(all='ignore'): return self._compute(ones, (slice(0, 1),)*self.ndims).dtype
+        except Exception: return self.evaluate(0).dtype
+
+    def evaluate(self, i: int, region: tuple = (), out: np.ndarray|None = None) -> np.ndarray:
+        """
+        evaluate one frame of the expression
+        :param i: int: the frame to evaluate
+        :param region: tuple: the (x, y) region to evaluate, only that region of each field is read
+        :param out: np.ndarray: where to write the result, it must already have the right shape and dtype
+        :return: the frame
+        """
+        frames = {id(f): f[i] if len(region)==0 else f[(i, *region)] for f in self.leaves}
+        return self._compute(frames, region, out=out)
+    def _read(self, i: int, region: tuple = ()) -> np.ndarray: return self.evaluate(i, region)
+    def _source_file(self, i: int) -> str|None: return self.leaves[0]._source_file(i)
+    def refresh(self) -> int:
+        before = len(self)
+        for f in self.leaves: f.refresh()
+        if hasattr(self.leaves[0], "iterations"): self.iterations = self.leaves[0].iterations
+        return len(self) - before
+
+    def read_batch(self, item, region: tuple|None = None, workers: int|None = None) -> np.ndarray:
+        """
+        evaluate many frames at once, each written straight into its slot of one preallocated array
+        :param item: int | slice | list: which frames to evaluate
+        :param region: the (x, y) region to evaluate, defaults to this expression's region
+        :param workers: unused, the fields being read have their own workers
+        :return: np.ndarray: the frames stacked as (n, x, y)
+        """
+        indices = time_indices(item, len(self))
+        region = self.region if region is None else region
+        out = np.empty((len(indices), *region_shape(region, self.full_shape)), dtype=self.dtype)
+        for k, i in enumerate(indices): self.evaluate(i, region, out=out[k])
+        return out
+
+    def _compute(self, frames: dict, region: tuple, out: np.ndarray|None = None) -> np.ndarray:
+        if self.kernel is not None: return numexpr.evaluate(self.kernel, local_dict=self._inputs(frames, region), out=out)
+        value, _ = self._evaluate(self, frames, region, out=out)
+        if out is None or value is out: return value
+        out[...] = value
+        return out
+    def _evaluate(self, node, frames: dict, region: tuple, out: np.ndarray|None = None) -> tuple[np.ndarray, bool]:
+        #gives back the value and whether it's a temporary that's safe to write over
+        if id(node) in frames: return frames[id(node)], False
+        #views are only inlined when they're the expression being evaluated
+        if not (_inlined(node) or node is self): return self._constant(node, region), False
+        values = [self._evaluate(o, frames, region) for o in node.operands]
+        arrays = [v for v, _ in values]
+        #python functions might hand back one of their inputs so their results are never written over
+        if callable(node.op): return node.op(*arrays), False
+        if out is None:
+            #write into a temporary from further down the expression instead of allocating another frame
+            shape, dtype = np.broadcast_shapes(*[np.shape(a) for a in arrays]), np.result_type(*arrays)
+            out = next((
+                a for a, temporary in values
+                if temporary and a.shape==shape and a.dtype==dtype and np.issubdtype(dtype, np.inexact)
+            ), None)
+        return apply_op(node.op, *arrays, out=out), True
+    def _constant(self, constant, region: tuple):
+        if isinstance(constant, np.ndarray): return take_region(np.broadcast_to(constant, self.full_shape), region) if len(region)>0 else constant
+        return constant
+
+    def _signature(self) -> tuple|None:
+        operands = [o._signature() if isinstance(o, ScalarField) else ("constant", o) if isinstance(o, numbers.Number) else None for o in self.operands]
+        if any(o is None for o in operands): return None
+        return ("expression", self.op, *operands, repr(self.region))
+
+    def _kernel(self) -> str|None:
+        if numexpr is None: return None
+        names = {id(f): f"f{k}" for k, f in enumerate(self.leaves)}
+        names.update({id(c): f"c{k}" for k, c in enumerate(self.constants)})
+        def build(node) -> str|None:
+            if id(node) in names and not isinstance(node, numbers.Integral): return names[id(node)]
+            #integer powers are only expanded into multiplications when numexpr can see them
+            if isinstance(node, numbers.Integral): return f"{int(node)}"
+            if callable(node.op): return None
+            terms = [build(o) for o in node.operands]
+            return None if None in terms else expression_ops[node.op][1].format(*terms)
+        return build(self)
+    def _inputs(self, frames: dict, region: tuple) -> dict:
+        inputs = {f"f{k}": frames[id(f)] for k, f in enumerate(self.leaves)}
+        #numexpr treats python floats as doubles, so constants are given the type numpy would use
+        result = np.result_type(*[f.dtype for f in self.leaves])
+        for k, c in enumerate(self.constants):
+            if not isinstance(c, numbers.Integral):
+                inputs[f"c{k}"] = self._constant(c, region) if isinstance(c, np.ndarray) else np.asarray(c, dtype=np.result_type(result, c))
+        return inputs
+
 class VectorField:
     def __init__(
             self, 
             *components, 
-            caching: bool =False, 
+            caching: bool|FrameCache = False, 
             verbose: bool =False,
             name: str = None, 
             latex: str = None,
             parent = None,
-            parallel: str = 'z'
+            parallel: str = 'z',
+            read_ahead: int = 0,
+            workers: int = 1
         ) -> None:
         latex = "".join([c for c in latex if c not in r"$\{}"])
         self.name = name
@@ -192,8 +966,12 @@ class VectorField:
         self.parent = parent
         if parent: self.dx, self.dy = parent.dx, parent.dy
         self.verbose = verbose 
-        self.caching = caching
-        child_kwargs = {'parent':parent, 'verbose':verbose, 'caching':caching}
+        self.read_ahead = read_ahead
+        self.workers = workers
+        #all components share one cache
+        self.cache: FrameCache|None = resolve_cache(caching, parent)
+        self.caching = self.cache is not None
+        child_kwargs = {'parent':parent, 'verbose':verbose, 'caching':self.cache if self.caching else False, 'read_ahead':read_ahead, 'workers':workers}
         if len(components)==1 and type(path:=components[0])==str:
             components = (
                 ScalarField(path+"/x", name=name+"_x_component", latex=f"${latex}_x$", **child_kwargs), 
@@ -205,106 +983,243 @@ class VectorField:
         component_names = "xyz"
         self.components = []
         for name,val in zip(component_names, components): 
-            comp = ScalarField(val, caching=self.caching) if type(val)==str else val
+            comp = ScalarField(val, caching=self.cache if self.caching else False) if type(val)==str else val
             self.components.append(comp)
             setattr(self, name, comp)
         self.set_parallel(parallel)
 
     def __len__(self) -> int: return min([len(self.x), len(self.y), len(self.z)])
+    @property
+    def shape(self) -> tuple: return self.x.shape
+    def __iter__(self): return self.prefetch()
     def __abs__(self) -> np.ndarray:
         return np.array([
-            np.sqrt(sum([
-                c[i]**2 for c in self.components
-            ])) for i in verbose_bar(range(len(self)), self.verbose, desc="taking magnitude...")
+            frame for frame in verbose_bar(self.magnitude_field().prefetch(), self.verbose, total=len(self), desc="taking magnitude...")
         ])
-    def __getitem__(self, item: int|slice) -> np.ndarray:
+    def magnitude_field(self) -> FieldExpression:
+        """
+        the magnitude sqrt(x**2 + y**2 + z**2) as a lazy field, abs(self) gives the same thing as an array of every frame
+        :return: FieldExpression
+        """
+        squares = [c**2 for c in self.components]
+        return field_expression(
+            'sqrt', sum(squares[1:], start=squares[0]), 
+            name=None if self.name is None else self.name+"_magnitude", latex=f"$|{self.latex}|$"
+        )
+    #arithmetic happens component by component and gives back a VectorField of lazy FieldExpressions
+    __array_ufunc__ = None
+    def __add__(self, other): return self._componentwise('+', other)
+    def __radd__(self, other): return self._componentwise('+', other, reverse=True)
+    def __sub__(self, other): return self._componentwise('-', other)
+    def __rsub__(self, other): return self._componentwise('-', other, reverse=True)
+    def __mul__(self, other): return self._componentwise('*', other)
+    def __rmul__(self, other): return self._componentwise('*', other, reverse=True)
+    def __truediv__(self, other): return self._componentwise('/', other)
+    def __rtruediv__(self, other): return self._componentwise('/', other, reverse=True)
+    def __neg__(self): return self._componentwise('neg')
+    def _componentwise(self, op: str, *other, reverse: bool = False):
+        if len(other)==0: others = [()]*self.ndims
+        elif isinstance(other[0], VectorField): others = [(c,) for c in other[0].components]
+        elif isinstance(other[0], (ScalarField, np.ndarray, numbers.Number)): others = [other]*self.ndims
+        else: return NotImplemented
+        operands = (*other, self) if reverse else (self, *other)
+        return VectorField(
+            *[field_expression(op, *o, c) if reverse else field_expression(op, c, *o) for c, o in zip(self.components, others)],
+            verbose=self.verbose, name=_label(op, operands, "name"), latex=_label(op, operands, "latex"),
+            parent=self.parent, parallel=self.parallel_direction, read_ahead=self.read_ahead, workers=self.workers
+        )
+    def __getitem__(self, item: int|slice|tuple) -> np.ndarray:
         match type(item):
             case builtins.int: return np.array([c[item] for c in self.components])
-            case builtins.slice:
-                item_iters = [
-                    i for i in range(
-                        item.start if not item.start is None else 0, 
-                        item.stop if not item.stop is None else len(self), 
-                        item.step if not item.step is None else 1
-                    )
-                ]
-                return np.array([
-                    [
-                        c[i] for c in self.components
-                    ] for i in item_iters
-                ])
+            case builtins.tuple:
+                frames = np.array([c[item] for c in self.components])
+                #keep time as the first axis like slicing does
+                return frames if isinstance(item[0], (int, np.integer)) else np.moveaxis(frames, 0, 1)
+            case builtins.slice|builtins.list:
+                frames = np.empty((len(time_indices(item, len(self))), len(self.components), *self.shape), dtype=self.x.dtype)
+                for j, c in enumerate(self.components): frames[:, j] = c.read_batch(item)
+                return frames
     
-    def dot(self, other) -> np.ndarray: 
-        if isinstance(other, VectorField):
-            assert self.ndims==3, "only 3D vector fields can be dotted at this time"
-            assert other.ndims==3, "Can only dot into a 3D vector field at this time"
-            if self.verbose: print("constructing A...")
-            A = np.array([
-                [
-                    [
-                        [self.x[k][i,j], self.y[k][i,j], self.z[k][i,j]]
-                    for i in range(self.shape[0])]
-                for j in range(self.shape[1])] 
-            for k in verbose_bar(range(len(self)), self.verbose, desc="constructing A...")])
-            B = np.array([
-                [
-                    [
-                        [other.x[k][i,j], other.y[k][i,j], other.z[k][i,j]]
-                    for i in range(other.shape[0])]
-                for j in range(other.shape[1])] 
-            for k in verbose_bar(range(len(other)), self.verbose, desc="constructing B...")])
-            return np.sum(A * B, axis=2)
-    def cross(self, other, k:int) -> np.ndarray:
-        if type(other)==VectorField: 
-            assert self.ndims==3, "only 3D vector fields can be crossed at this time"
-            assert other.ndims==3, "Can only cross into a 3D vector field at this time"
-            return np.array([
-                self.y[k]*other.z[k] - self.z[k]*other.y[k], 
-                self.z[k]*other.x[k] - self.x[k]*other.z[k],
-                self.x[k]*other.y[k] - self.y[k]*other.x[k]
-            ])
+    def prefetch(self, item=None, depth: int|None = None, processes: bool = False):
+        """
+        iterate through frames while the next depth frames of every component are read in the background
+        :param item: None | int | slice | list: which frames to step through, defaults to all of them
+        :param depth: how many frames to read ahead, defaults to read_ahead
+        :param processes: read in worker processes instead of threads
+        :return: generator of (components, x, y) frames
+        """
+        depth = self.read_ahead if depth is None else depth
+        for frames in sweep(*self.components, item=item, depth=depth, processes=processes): yield np.array(frames)
+    
+    def reduce(self, *reducers, of='mag', item=None, depth: int|None = None, processes: bool = False) -> dict:
+        """
+        compute per frame values and accumulations over time of some scalar made from this field in a single
+        streaming pass, see ScalarField.reduce
+        :param reducers: names from pysim.reductions.named_reducers, functions to apply to every frame, or Reducers
+        :param of: str | callable | None: what to reduce, 'mag', 'x', 'y', 'z', 'par', 'perp', a function taking the 
+                   (components, x, y) frame, or None to give the reducers the (components, x, y) frames
+        :param item: None | int | slice | list: which frames to reduce over, defaults to all of them
+        :param depth: how many frames to read ahead, defaults to read_ahead
+        :param processes: read ahead in worker processes instead of threads
+        :return: dict of each reducer's name and result
+        """
+        par = "xyz".index(self.parallel_direction)
+        match of:
+            case None: scalar = lambda frame: frame
+            case 'mag'|'magnitude'|'abs': scalar = lambda frame: np.sqrt(np.sum(np.square(frame), axis=0))
+            case 'x'|'y'|'z': scalar = lambda frame: frame["xyz".index(of)]
+            case 'par'|'parallel': scalar = lambda frame: frame[par]
+            case 'perp'|'perpendicular': scalar = lambda frame: np.sqrt(np.sum(np.square(np.delete(frame, par, axis=0)), axis=0))
+            case func if callable(func): scalar = func
+            case _: raise ValueError(f"can't reduce {of}, choose from mag, x, y, z, par, perp, a function, or None")
+        return reduce_frames((scalar(frame) for frame in self.prefetch(item=item, depth=depth, processes=processes)), *reducers)
+    
+    def dot(self, other, item=None, save: str|None = None):
+        """
+        the dot product with another vector field (or a constant vector), evaluated a whole frame at a time
+        :param other: VectorField | sequence: the other field, or one value (or (x, y) map) per component
+        :param item: None | int | slice | list: which frames to compute, None gives back a lazy FieldExpression
+        :param save: str: a folder to write the result to as a new field (see ScalarField.save)
+        :return: FieldExpression | np.ndarray | ScalarField (if saved)
+        """
+        products = [a*b for a, b in zip(self.components, self._other_components(other))]
+        result = sum(products[1:], start=products[0])
+        result.name, result.latex = f"{self.name}_dot_{getattr(other, 'name', 'vector')}", f"${self.latex}\\cdot {getattr(other, 'latex', 'v')}$"
+        return self._finish(result, item, save)
+    def cross(self, other, item=None, save: str|None = None):
+        """
+        the cross product with another vector field (or a constant vector), evaluated a whole frame at a time
+        :param other: VectorField | sequence: the other field, or one value (or (x, y) map) per component
+        :param item: None | int | slice | list: which frames to compute, None gives back a lazy VectorField
+        :param save: str: a folder to write the result to as a new field, with x, y, and z subfolders
+        :return: VectorField | np.ndarray: (components, x, y) for an int or (t, components, x, y) otherwise
+        """
+        assert self.ndims==3, "only 3D vector fields can be crossed at this time"
+        (ax, ay, az), (bx, by, bz) = self.components, self._other_components(other)
+        result = VectorField(
+            ay*bz - az*by, az*bx - ax*bz, ax*by - ay*bx,
+            verbose=self.verbose, name=f"{self.name}_cross_{getattr(other, 'name', 'vector')}",
+            latex=f"{self.latex} x {getattr(other, 'latex', 'v')}", parent=self.parent, parallel=self.parallel_direction,
+            read_ahead=self.read_ahead, workers=self.workers
+        )
+        return self._finish(result, item, save)
+    def project(self, other, item=None, save: str|None = None):
+        """
+        the component of this field along another vector field (or a constant direction), (self . other)/|other|
+        e.g. u.project(B) gives the flow along the local magnetic field
+        :param other: VectorField | sequence: the field or direction to project onto
+        :param item: None | int | slice | list: which frames to compute, None gives back a lazy FieldExpression
+        :param save: str: a folder to write the result to as a new field (see ScalarField.save)
+        :return: FieldExpression | np.ndarray | ScalarField (if saved)
+        """
+        if isinstance(other, VectorField): result = self.dot(other) / other.magnitude_field()
+        else: 
+            direction = np.array(other, dtype=float)
+            result = self.dot(direction / np.linalg.norm(direction, axis=0))
+        result.name, result.latex = f"{self.name}_along_{getattr(other, 'name', 'vector')}", None
+        return self._finish(result, item, save)
+    def _other_components(self, other) -> list:
+        others = other.components if isinstance(other, VectorField) else list(other)
+        assert len(others)==self.ndims, f"can't combine a {self.ndims} component field with {len(others)} components"
+        return others
+    def _finish(self, result, item, save: str|None):
+        if save is not None: return result.save(save, item=item)
+        return result if item is None else result[item]
 
-    def curlz(self, item: int|slice, order: int = 2):
-        match type(item):
-            case builtins.int: return curlz(self.x[item], self.y[item], order=order)
-            case builtins.slice:
-                item_iters = [
-                    i for i in range(
-                        item.start if not item.start is None else 0, 
-                        item.stop if not item.stop is None else len(self), 
-                        item.step if not item.step is None else 1
-                    )
-                ]
-                return np.array([curlz(self.x[i], self.y[i], order=order) for i in item_iters])
-
-    def calc_Jz(self, item=None, verbose=True):
-        if not item: self.Jz = np.array([np.nanstd(j) for j in verbose_bar(self.curlz(slice(0,len(self))), verbose)])
-        elif type(item) in [int, slice]: self.Jz = np.nanstd(self.curlz(item), axis=(1,2))
-        else: raise TypeError(f"calc_Jz only takes ints, slices, or None for item, not {type(item)}-type objects")
+    def save(self, folder: str, item=None):
+        """
+        write every component to a folder of per dump h5 files (folder/x, folder/y, ...) streaming one frame at a time
+        :param folder: str: the folder to write to, created if it doesn't exist
+        :param item: None | int | slice | list: which frames to write, defaults to all of them
+        :return: VectorField: the saved field
+        """
+        components = [
+            c.save(f"{folder}/{d}", item=item, prefix=f"{self.name or 'field'}{d}") for d, c in zip("xyz", self.components)
+        ]
+        return VectorField(
+            *components, verbose=self.verbose, name=self.name, latex=self.latex, parent=self.parent,
+            parallel=self.parallel_direction, read_ahead=self.read_ahead, workers=self.workers
+        )
+
+    def curl(self, item=None, backend: str = 'spectral', batch: int = 8) -> np.ndarray:
+        """
+        every component of the curl (e.g. B.curl() is the current density J), z derivatives are zero on 2D grids
+        :param item: None | int | slice | list: which frames to use, defaults to all of them
+        :param backend: str: 'spectral', 'compact', or 'fd2', see pysim.derivatives
+        :param batch: how many frames to transform at once
+        :return: np.ndarray: (t, 3, x, y), or (3, x, y) for an int
+        """
+        assert self.ndims==3, "only 3D vector fields have a full curl"
+        return derive(self.components, lambda engine, frames: engine.curl(frames), item=item, backend=backend, batch=batch)
+    def curlz(self, item=None, backend: str = 'spectral', batch: int = 8) -> np.ndarray:
+        """the z component of the curl, see curl. Only the x and y components are read"""
+        return derive(self.components[:2], lambda engine, frames: engine.curl(frames, components=(2,))[:, 0], item=item, backend=backend, batch=batch)
+    def curlz_field(self, backend: str = 'spectral') -> FieldExpression:
+        """
+        the z component of the curl as a lazy field, each frame is computed when it's read so it can be streamed,
+        binned, or combined like any other field. It always needs the whole frame so don't take views of it
+        :param backend: str: 'spectral', 'compact', or 'fd2', see pysim.derivatives
+        :return: FieldExpression
+        """
+        engine = derivative_engine(tuple(self.x.full_shape), grid_spacing(self.parent, len(self.x.full_shape)), backend)
+        return self.x.apply(
+            partial(_curlz_frame, engine), self.y,
+            name=None if self.name is None else self.name+"_curlz", latex=f"$(\\nabla\\times {self.latex})_z$"
+        )
+    def div(self, item=None, backend: str = 'spectral', batch: int = 8) -> np.ndarray:
+        """
+        the divergence, e.g. B.div() should be ~0, components along axes the grid doesn't have are not read
+        :param item: None | int | slice | list: which frames to use, defaults to all of them
+        :param backend: str: 'spectral', 'compact', or 'fd2', see pysim.derivatives
+        :param batch: how many frames to transform at once
+        :return: np.ndarray: (t, x, y), or (x, y) for an int
+        """
+        return derive(self.components[:len(self.x.full_shape)], lambda engine, frames: engine.divergence(frames), item=item, backend=backend, batch=batch)
+
+    def calc_Jz(self, item=None, verbose=True, backend: str = 'spectral', batch: int = 8):
+        indices = time_indices(item, len(self))
+        #only one batch of Jz is ever in memory
+        self.Jz = np.concatenate([
+            np.nanstd(self.curlz(indices[start:start+batch], backend=backend, batch=batch), axis=(1,2))
+        for start in verbose_bar(range(0, len(indices), batch), verbose, desc="calculating Jz")])
+        if isinstance(item, (int, np.integer)): self.Jz = self.Jz[0]
 
     def calc_perp(self, item=None) -> np.ndarray: 
         if not item:
             self.perp = np.array([
-                np.hypot(self.perpendicular[0][j], self.perpendicular[1][j]) 
-                for j in verbose_bar(range(len(self)), self.verbose, desc="perpendicularizing")
+                np.hypot(a, b) 
+                for a, b in verbose_bar(sweep(*self.perpendicular, depth=self.read_ahead), self.verbose, total=len(self), desc="perpendicularizing")
             ])
         elif type(item)==int: 
             self.perp = np.hypot(self.perpendicular[0][item], self.perpendicular[1][item])
         elif type(item)==slice: 
-            item_iters = [
-                i for i in range(
-                    item.start if item.start else 0,
-                    item.stop if item.stop else len(self),
-                    item.step if item.step else 1
-                )
-            ]
-            self.perp = np.array([np.hypot(self.perpendicular[0][j], self.perpendicular[1][j]) for j in item_iters])
+            self.perp = np.array([np.hypot(a, b) for a, b in sweep(*self.perpendicular, item=item, depth=self.read_ahead)])
         else: raise TypeError(f"calc_perp only takes ints, slices, or None for item, not {type(item)}-type objects")
+    def refresh(self) -> int:
+        """pick up dumps written since this field was set up, see ScalarField.refresh"""
+        before = len(self)
+        for c in self.components: c.refresh()
+        #anything computed over every frame is out of date
+        self.__dict__.pop("psi", None)
+        return len(self) - before
     @cached_property
     def psi(self) -> np.ndarray: return np.array([
-        calc_psi(Bx, By, self.dx, self.dy) for Bx, By in zip(self.x, self.y)
+        calc_psi(Bx, By, self.dx, self.dy) for Bx, By in sweep(self.x, self.y, depth=self.read_ahead)
     ])       
+    def view(self, *region):
+        """
+        make a lazy view of a region of every component, nothing is read until the view is indexed
+        :param region: ints, slices or lists for the x and y axes
+        :return: a VectorField whose components only read the given region
+        """
+        return VectorField(
+            *[c.view(*region) for c in self.components], 
+            caching=self.cache if self.caching else False, verbose=self.verbose, 
+            name=self.name, latex=self.latex, parent=self.parent, parallel=self.parallel_direction,
+            read_ahead=self.read_ahead, workers=self.workers
+        )
     def set_parallel(self, component:str) -> None:
+        self.parallel_direction = component.lower()
         match component.lower():
             case 'x':
                 self.parallel = self.x 
@@ -315,15 +1230,16 @@ class VectorField:
             case 'z':
                 self.parallel = self.z 
                 self.perpendicular = self.x, self.y 
-    def movie(self, mode='mag', norm='none', cmap=default_cmap, **kwrg) -> None:
+    def movie(self, mode='mag', norm='none', cmap=None, **kwrg) -> None:
+        from pysim.plotting import show_video
         match mode.lower():
             case 'mag'|'magnitude'|'abs':
                 @show_video(name=self.name+"_magnitude", latex=f"$|{self.name}|$", norm=norm, cmap=cmap)
-                def reveal_thyself(s, **kwargs): return abs(self)
+                def reveal_thyself(s, **kwargs): return self.magnitude_field()
             case 'perp'|'perpendicular':
                 @show_video(name=self.name+"_perp", latex=f"${self.name}_\perp$", norm=norm, cmap=cmap)
-                def reveal_thyself(s, **kwargs): return self.perp                
+                def reveal_thyself(s, **kwargs): return (self.perpendicular[0]**2 + self.perpendicular[1]**2).apply(np.sqrt)
             case 'par'|'parallel':
                 @show_video(name=self.name+"_par", latex=f"${self.name}_\parallel$", norm=norm, cmap=cmap)
-                def reveal_thyself(s, **kwargs): return np.array([self.parallel[i] for i in range(len(self))])
+                def reveal_thyself(s, **kwargs): return self.parallel
         reveal_thyself(self if self.parent is None else self.parent, **kwrg)
\ No newline at end of file
@@ -0,0 +1,95 @@
+#pysim imports
+from pysim.store import dump_iteration
+#nonpysim imports
+import numpy as np
+from h5py import File as h5File
+from os import scandir, stat, replace, makedirs
+from os.path import exists, dirname
+from uuid import uuid4
+import json
+
+class OutputIndex:
+    """
+    a sidecar index of a simulation's output folders so they can be opened without globbing or reading any dumps
+    ________
+    ~Inputs~
+    * path - str
+        the json file the index is kept in, created on the first save
+    * autosave - bool
+        whether to save the index every time a folder is (re)scanned
+    ___________
+    ~Atributes~
+    * entries - dict
+        for every folder: the dump files, their iteration numbers and mtimes, the (x, y) shape and dtype of the
+        frames, and the mtime of the folder when it was last scanned
+    * dirty - bool
+        whether there are changes which haven't been saved yet
+    """
+    version = 1
+    def __init__(self, path: str, autosave: bool = True) -> None:
+        self.path = path
+        self.autosave = autosave
+        self.entries: dict = {}
+        self.dirty = False
+        if exists(path):
+            #an index that can't be read is only a cache, every folder just gets rescanned
+            try:
+                with open(path, 'r') as file: saved = json.load(file)
+            except (OSError, ValueError): saved = {}
+            if isinstance(saved, dict) and saved.get("version")==self.version: self.entries = saved["folders"]
+
+    def __contains__(self, folder: str) -> bool: return self._key(folder) in self.entries
+    def __repr__(self) -> str: return f"OutputIndex({self.path}, {len(self.entries)} folders)"
+
+    def folder(self, folder: str) -> dict:
+        """
+        look up a folder, rescanning it only if something has been added or removed since it was last indexed
+        :param folder: str: the folder of per dump h5 files
+        :return: entry: dict: with file_names, iterations, mtimes, shape, dtype, and mtime
+        """
+        key = self._key(folder)
+        #a folder's mtime changes whenever a file is added, removed, or renamed in it
+        mtime = stat(key).st_mtime_ns
+        entry = self.entries.get(key)
+        if entry is not None and entry["mtime"]==mtime: return self._expand(key, entry)
+        with scandir(key) as found: dumps = sorted([(d.name, d.stat().st_mtime_ns) for d in found if d.name.endswith(".h5")])
+        if entry is None or len(entry["files"])==0:
+            if len(dumps)==0: raise FileNotFoundError(f"no h5 files found in {key}")
+            #only the metadata of the first dump is needed, none of its data is read
+            with h5File(f"{key}/{dumps[0][0]}", 'r') as f:
+                #GODDMANIT I HATE THAT IT DOES Y,X and not X,Y
+                shape, dtype = list(f["DATA"].shape[::-1]), f["DATA"].dtype.str
+        else: shape, dtype = entry["shape"], entry["dtype"]
+        entry = {
+            "files": [name for name, _ in dumps],
+            "iterations": [dump_iteration(name) for name, _ in dumps],
+            "mtimes": [m for _, m in dumps],
+            "shape": shape,
+            "dtype": dtype,
+            "mtime": mtime
+        }
+        self.entries[key] = entry
+        self.dirty = True
+        if self.autosave: self.save()
+        return self._expand(key, entry)
+
+    def save(self) -> None:
+        if not self.dirty: return None
+        makedirs(dirname(self.path) or ".", exist_ok=True)
+        #write then move so a crash never leaves a half written index behind, the temporary name is unique so
+        #processes opening the same simulation at once don't move each other's files
+        with open(tmp:=f"{self.path}.{uuid4().hex[:8]}.tmp", 'w') as file: json.dump({"version": self.version, "folders": self.entries}, file)
+        replace(tmp, self.path)
+        self.dirty = False
+
+    def _key(self, folder: str) -> str: return "/".join(
+        [p for i, p in enumerate(folder.replace("\\", "/").split("/")) if len(p)>0 or i==0]
+    )
+    def _expand(self, key: str, entry: dict) -> dict: return {
+        "file_names": [f"{key}/{name}" for name in entry["files"]],
+        "iterations": np.array(entry["iterations"], dtype=np.int64),
+        "mtimes": entry["mtimes"],
+        "shape": tuple(entry["shape"]),
+        "dtype": np.dtype(entry["dtype"]),
+        "mtime": entry["mtime"]
+    }
@@ -1,5 +1,6 @@
 #pysim imports
-from pysim.utils import nan_clip
+from pysim.utils import nan_clip, verbose_bar, read_ahead, block_reduce, lod_level
+from pysim.reductions import FrameStats, reduce_frames, sample_quantile
 from pysim.parsing import File, Folder
 from pysim.environment import frameDir, videoDir
 #nonpysim imports
@@ -7,11 +8,11 @@ import numpy as np
 import matplotlib.pyplot as plt 
 from matplotlib.colors import LogNorm, SymLogNorm, TwoSlopeNorm, Normalize
 from mpl_toolkits.axes_grid1 import make_axes_locatable
-import moviepy.video.io.ImageSequenceClip
-from moviepy.editor import VideoClip, VideoFileClip
-from moviepy.video.io.bindings import mplfig_to_npimage
-from functools import wraps
+from functools import wraps, partial
+import multiprocessing
+import json
 import os
+from uuid import uuid4
 
 from matplotlib.colors import LinearSegmentedColormap
 pink = "#E34F68"
@@ -29,33 +30,45 @@ default_cmap = plt.cm.plasma
 # Ploting utils
 def auto_norm(
     norm: str, 
-    frames: np.ndarray, 
+    frames, 
     linear_threshold: float|None = None, 
     center: float|None = None, 
     saturate: float|None = None
 ):
-    frames = frames[(-np.inf < frames)&(frames < np.inf)]
+    #everything comes from one streaming pass (cached for fields), the frames are never copied or sorted
+    stats = frame_stats(frames)
     # set min/max IF saturate is None                          or IF saturate is a tuple                                          ELSE assume its a float
-    low = np.nanmin(frames) if saturate is None else np.nanquantile(frames, 1-saturate[0]) if isinstance(saturate, tuple) else np.nanquantile(frames, 1-saturate)
-    high = np.nanmax(frames) if saturate is None else np.nanquantile(frames, 0+saturate[1]) if isinstance(saturate, tuple) else np.nanquantile(frames, 0+saturate)
+    low = stats['min'] if saturate is None else sample_quantile(stats, 1-saturate[0]) if isinstance(saturate, tuple) else sample_quantile(stats, 1-saturate)
+    high = stats['max'] if saturate is None else sample_quantile(stats, 0+saturate[1]) if isinstance(saturate, tuple) else sample_quantile(stats, 0+saturate)
     match norm.lower():
         case "lognorm":
             if low < 0: raise ValueError(f"minimum is {low}, LogNorm only takes positive values")
-            if low==0: low=np.nanmin(frames[frames!=0])
+            if low==0: low=stats['positive_min']
             return LogNorm(vmin=low, vmax=high)
         case "symlognorm":
-            sig = np.nanstd(frames)
-            mu = np.nanmean(frames)
+            sig = stats['std']
+            mu = stats['mean']
             if np.abs(mu)-sig > 0: raise TypeError("SymLogNorm is only designed for stuff close to zero!")
             return SymLogNorm(sig if linear_threshold is None else linear_threshold, vmin=low, vmax=high)
         case n if n in ["centerednorm", "twoslope", "twoslopenorm"]:
-            sig = np.nanstd(frames)
-            mu = np.nanmean(frames)
+            sig = stats['std']
+            mu = stats['mean']
             # for the center use center if give otherwise use 0 if mean is small, else use mean
             vcenter = center if not center is None else 0 if np.abs(mu)-sig > 0 else mu
             return TwoSlopeNorm(vmin=low, vcenter=vcenter, vmax=high)
         case _: return Normalize(vmin=low, vmax=high)
 
+def frame_stats(frames) -> dict:
+    """
+    the FrameStats of some frames, the cached ones if they come from a field
+    :param frames: a FrameStats result, anything with a frame_stats method (e.g. a ScalarField), or an array of (x, y) frames
+    :return: dict: the FrameStats result
+    """
+    if isinstance(frames, dict): return frames
+    if hasattr(frames, "frame_stats"): return frames.frame_stats()
+    frames = np.asarray(frames)
+    return reduce_frames(frames if frames.ndim > 2 else [frames], FrameStats())['frame_stats']
+
 def tile(arr: np.ndarray) -> np.ndarray:
     return np.r_[np.c_[arr, arr, arr], np.c_[arr, arr, arr], np.c_[arr, arr, arr]]
 
@@ -88,32 +101,62 @@ def show(
         #presentation parameters
         save: str = "",
         dpi: int = 100,
-        #everything else goes into pcolormesh
+        #level of detail: how blocks of cells are combined when there are more than pixels, None always draws every cell
+        lod: str|None = 'mean',
+        #everything else goes into imshow (or pcolormesh for uneven grids)
         **kwargs
 ):
     # prep data
     assert (ndims:=len(field.shape))==2, f"show was given an image with {ndims} dimensions, please provide a 2d array"
-    image = tile(field) if tile_image else field
+    nx, ny = field.shape
     # check axes
-    if x is None: x, y = np.mgrid[:image.shape[0], :image.shape[1]]
-    else: assert (len(x), line(y)) == image.shape, f"Given x of shape {len(x)} and y of shape {len(y)} but image is of shape {image.shape}"
+    if x is None: x, y = np.arange(nx), np.arange(ny)
+    else: assert (len(x), len(y)) == (nx, ny), f"Given x of shape {len(x)} and y of shape {len(y)} but image is of shape {field.shape}"
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    dx, dy = (x[-1] - x[0])/max(nx-1, 1) or 1., (y[-1] - y[0])/max(ny-1, 1) or 1.
     # prep figure
     close_fig = True if fig is None else False
     show = show if fig is None else False
     if fig is None: (fig, ax) = plt.subplots(figsize=figsize)
-    # plot data
-    img = ax.pcolormesh(x, y, image, cmap=cmap, **kwargs)
+    # level of detail: only as many cells as there are pixels to show them on (a tiled image shows 3 along each axis)
+    if lod is None: level = 0
+    else:
+        box = ax.get_window_extent()
+        scale = max(fig.dpi, dpi if len(save)>0 else 0) / fig.dpi
+        visible = [
+            abs(lim[1] - lim[0])/d if None not in lim else n*(3 if tile_image else 1) 
+            for lim, d, n in [(xlim, dx, nx), (ylim, dy, ny)]
+        ]
+        level = lod_level(visible, (box.width*scale, box.height*scale))
+    # fields hand over a FramePyramid so only the level that's drawn is read (and it's cached for next time)
+    if hasattr(field, "level"): image = field.level(level, lod or 'mean')
+    else: image = block_reduce(np.asarray(field), 2**level, lod or 'mean')
+    mx, my = image.shape
+    # plot data, periodic tiles are the same image drawn at shifted extents so nothing is copied
+    tiles = [(a, b) for a in range(3) for b in range(3)] if tile_image else [(0, 0)]
+    if np.allclose(np.diff(x), dx) and np.allclose(np.diff(y), dy):
+        extent = np.array([x[0] - dx/2, x[0] - dx/2 + mx*2**level*dx, y[0] - dy/2, y[0] - dy/2 + my*2**level*dy])
+        for a, b in tiles: img = ax.imshow(
+            image.T, origin='lower', cmap=cmap, interpolation='nearest', 
+            extent=tuple(extent + [a*nx*dx, a*nx*dx, b*ny*dy, b*ny*dy]), **kwargs
+        )
+    else:
+        #uneven grids need a mesh, drawn at the centers of each block
+        xc, yc = [c[:m*2**level].reshape(m, 2**level).mean(axis=1) for c, m in [(x, mx), (y, my)]]
+        for a, b in tiles: img = ax.pcolormesh(xc + a*nx*dx, yc + b*ny*dy, image.T, cmap=cmap, shading='nearest', **kwargs)
     # colorbar
     if colorbar: 
         divider = make_axes_locatable(ax)
+        colorbar_style = dict(colorbar_style)
         colorbar_location = colorbar_style.pop("location") if "location" in colorbar_style.keys() else "right"
         cax = divider.append_axes(colorbar_location, **colorbar_style)
         fig.colorbar(img, cax=cax, ax=ax, ticks=cticks, label=units)
     # contour
     if not contour is None: ax.contour(contour, **contour_style)
-    # set limits
-    ax.set_xlim(xlim)
-    ax.set_ylim(ylim)
+    # set limits, by default everything drawn (every tile)
+    tiled = 3 if tile_image else 1
+    ax.set_xlim(*[d if l is None else l for l, d in zip(xlim, (x[0] - dx/2, x[0] - dx/2 + tiled*nx*dx))])
+    ax.set_ylim(*[d if l is None else l for l, d in zip(ylim, (y[0] - dy/2, y[0] - dy/2 + tiled*ny*dy))])
     # set title
     ax.set_title(title)
     # set aspect
@@ -126,6 +169,109 @@ def show(
     if close_fig: plt.close(fig)
     else: return fig, ax, img
 
+class DiagnosticRenderer:
+    """
+    draws the diagnostic image of a simulation (density, Bz, the energy distribution, and tracked scalars over time)
+    for one dump after another. The figure, artists, colorbars and layout are only built once, every dump just
+    swaps the image and line data, moves the time marker, and redraws
+    ________
+    ~Inputs~
+    * s - Simulation
+        the simulation to pull data from
+    * tracks - list[np.ndarray]
+        scalars plotted against time under the images, e.g. the rms of Jz, a marker follows the last one
+    * times - np.ndarray
+        the time of each dump, defaults to s.tau
+    * figsize - tuple[float, float]
+        the size of the figure in inches
+    * dpi - int
+        pixels per inch of the rendered frames
+    * blit - bool
+        only redraw what changes on top of a saved background, turn it off if the figure itself is wanted 
+        (e.g. for savefig) since the changing artists are left out of normal draws
+    ___________
+    ~Atributes~
+    * fig - matplotlib.figure.Figure
+        the figure, made without pyplot so nothing needs closing and it's safe to use in worker processes
+    * axes - dict
+        the axes of the mosaic, p (density), b (Bz), e (energy), and j (tracks)
+    * marker - PathCollection
+        the marker on the last track at the current dump
+    """
+    mosaic: str = """
+    ppbb
+    ppbb
+    eeee
+    jjjj
+    """
+    def __init__(self, s, tracks: list = [], times: np.ndarray|None = None, figsize: tuple = (5, 5), dpi: int = 100, blit: bool = True) -> None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        self.s = s
+        self.tracks = [np.asarray(t) for t in tracks]
+        self.times = s.tau if times is None else times
+        self.fig = Figure(figsize=figsize, dpi=dpi, layout="constrained")
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.axes = self.fig.subplot_mosaic(self.mosaic)
+        # Fields
+        self.density = self._image('p', s.density.shape, LogNorm(vmax=100, vmin=.1), r"$\rho$")
+        self.Bz = self._image('b', s.B.z.shape, Normalize(vmax=5, vmin=0), r"$\vec{B}_z$")
+        # Energy Spectrum
+        self.eline, = self.axes['e'].loglog([1], [1], color='black')
+        self.axes['e'].set_xlim(1e-1, 1e4)
+        self.axes['e'].set_xlabel(r"$E$ [$V_A^2$]")
+        self.axes['e'].set_ylim(1e-3, 1e2)
+        self.axes['e'].set_ylabel(r"$Ef_E$ [$V_A^2$]")
+        # Jz and other tracks
+        for j in self.tracks: self.axes['j'].plot(self.times[:len(j)], j, color="black")
+        self.now = self.axes['j'].axvline(self.times[0], color='black', ls='-.')
+        self.marker = self.axes['j'].scatter([np.nan], [np.nan], color='red', zorder=3)
+        self.axes['j'].set_xlabel(r"$\tau$")
+        if len(self.tracks)==1: self.axes['j'].set_ylabel(r"$J_z$")
+        self.title = self.fig.suptitle(rf"$\tau$ = {self.times[0]:.2f}", fontsize=14)
+        #work the layout out once then freeze it, otherwise every draw solves it again
+        self.canvas.draw()
+        self.fig.set_layout_engine("none")
+        #everything else (axes, ticks, labels, colorbars) is drawn once into a background that each frame starts from
+        self.blit = blit
+        self.dynamic = [
+            self.density, self.Bz, *self.axes['p'].spines.values(), *self.axes['b'].spines.values(), 
+            self.eline, self.now, self.marker, self.title
+        ]
+        if blit:
+            for artist in self.dynamic: artist.set_animated(True)
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def update(self, i: int) -> None:
+        """point every artist at dump i"""
+        self.density.set_data(self.s.density[i].T)
+        self.Bz.set_data(self.s.B.z[i].T)
+        # only dump i of the energy distribution is read
+        E, fE, _ = self.s.energy_at(i)
+        self.eline.set_data(E, E * fE)
+        self.now.set_xdata([self.times[i]]*2)
+        if len(self.tracks) > 0: self.marker.set_offsets([[self.times[i], self.tracks[-1][i]]])
+        self.title.set_text(rf"$\tau$ = {self.times[i]:.2f}")
+    def render(self, i: int) -> np.ndarray:
+        """draw dump i and return the figure as an rgb image"""
+        self.update(i)
+        if self.blit:
+            self.canvas.restore_region(self.background)
+            for artist in self.dynamic: self.fig.draw_artist(artist)
+        else: self.canvas.draw()
+        image = np.asarray(self.canvas.buffer_rgba())[..., :3]
+        #h264 needs an even number of pixels along each side
+        return np.ascontiguousarray(image[:image.shape[0]//2*2, :image.shape[1]//2*2])
+
+    def _image(self, key: str, shape: tuple, norm, title: str):
+        ax = self.axes[key]
+        img = ax.imshow(np.ones(shape[::-1]), origin='lower', norm=norm, cmap=default_cmap, interpolation='nearest', extent=(0, shape[0], 0, shape[1]))
+        cax = make_axes_locatable(ax).append_axes("right", size="7%", pad=0.05)
+        self.fig.colorbar(img, cax=cax)
+        ax.set_title(title, fontsize=14)
+        return img
+
 def diagnose_frame(
         s,
         i: int,
@@ -133,52 +279,172 @@ def diagnose_frame(
         outdir: str = "./frames/diag/",
         track_params: list = [],
         full_path = False,
-        return_plots: bool = False
+        return_plots: bool = False,
+        times: np.ndarray|None = None,
+        return_figure: bool = False
 ):
     """
-    make a diagnostic image for a simulation at some index i
+    make a diagnostic image for a simulation at some index i, use DiagnosticRenderer (or render_diagnostics) for
+    many dumps so the figure is only built once
     :param s: The Simulation object to pull data from
     :param i: The index at which to pull data
     :param outdir:
+    :param times: the time of each dump the tracks are plotted against, defaults to s.tau
+    :param return_figure: give back the figure instead of saving it
     :return:
     """
-    mosaic: str = """
-    ppbb
-    ppbb
-    eeee
-    jjjj
-    """
-    # Fields
-    fig, axes = plt.subplot_mosaic(mosaic, figsize=(5, 5), constrained_layout=True)
-    show(s.density[i], fig=fig, ax=axes['p'], norm=LogNorm(vmax=100, vmin=.1))
-    axes['p'].set_title(r"$\rho$", fontsize=14)
-    show(s.B.z[i], fig=fig, ax=axes['b'], vmax=5, vmin=0)
-    axes['b'].set_title(r"$\vec{B}_z$", fontsize=14)
-    # Energy Spectrum
-    m = s.mach
-    x = s.energy_grid[i]
-    y = s.energy_grid[i] * s.energy_pdf[i]
-    eline, = axes['e'].loglog(x, y, color='black')
-    axes['e'].set_xlim(1e-1, 1e4)
-    axes['e'].set_xlabel(r"$E$ [$V_A^2$]")
-    axes['e'].set_ylim(1e-3, 1e2)
-    axes['e'].set_ylabel(r"$Ef_E$ [$V_A^2$]")
-    # Jz and other tracks
-    for j in track_params: axes['j'].plot(s.tau, j, color="black")
-    axes['j'].axvline(s.tau[i], color='black', ls='-.')
-    jtrack = axes['j'].scatter(s.tau[i], j[i], color='red')
-    axes['j'].set_xlabel(r"$\tau$")
-    if len(track_params)==1: axes['j'].set_ylabel(r"$J_z$")
-    fig.suptitle(rf"$\tau$ = {s.tau[i]:.2f}", fontsize=14)
+    renderer = DiagnosticRenderer(s, tracks=track_params, times=times, blit=False)
+    renderer.update(i)
+    if return_figure: return renderer.fig
     # Save figure
     if isinstance(full_path, str): 
-        plt.savefig(full_path)
-        return None if not return_plots else jtrack
+        renderer.fig.savefig(full_path)
+        return None if not return_plots else renderer.marker
     if not file_name.endswith(".png"): file_name += ".png"
-    plt.savefig(outdir + f"/{s.name}/" + file_name)
+    renderer.fig.savefig(outdir + f"/{s.name}/" + file_name)
 
 # Videos
+class FrameRenderer:
+    """
+    draws frames onto a figure which is only built once, each frame just swaps the image data and redraws
+    ________
+    ~Inputs~
+    * shape - tuple[int]
+        the (x, y) shape of the frames
+    * cmap - colormap
+        the colormap to use
+    * norm - matplotlib.colors.Normalize
+        the normalization, it should be fixed (e.g. from auto_norm) so every frame has the same color scale
+    * title - str
+        the title of the figure
+    * figsize - tuple[float, float]
+        the size of the figure in inches
+    * dpi - int
+        pixels per inch of the rendered frames
+    * extent - tuple[float]
+        the (left, right, bottom, top) the frames cover, defaults to one unit per cell, e.g. to label previews
+        in the cells of the full frames
+    """
+    def __init__(self, shape: tuple, cmap=default_cmap, norm=None, title: str|None = None, figsize: tuple = (5, 5), dpi: int = 100, extent: tuple|None = None) -> None:
+        #no pyplot so nothing global is touched, which keeps this safe to use in worker processes
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        #imshow draws the grid as one raster, far faster than pcolormesh drawing a quad per cell
+        self.img = self.ax.imshow(
+            np.zeros(shape[::-1]), origin='lower', cmap=cmap, norm=Normalize() if norm is None else norm,
+            interpolation='nearest', extent=(0, shape[0], 0, shape[1]) if extent is None else extent
+        )
+        cax = make_axes_locatable(self.ax).append_axes("right", size="7%", pad=0.05)
+        self.fig.colorbar(self.img, cax=cax)
+        self.ax.set_title(title)
+    def render(self, frame: np.ndarray) -> np.ndarray:
+        """draw an (x, y) frame and return the figure as an rgb image"""
+        self.img.set_data(np.asarray(frame).T)
+        self.canvas.draw()
+        image = np.asarray(self.canvas.buffer_rgba())[..., :3]
+        #h264 needs an even number of pixels along each side
+        return np.ascontiguousarray(image[:image.shape[0]//2*2, :image.shape[1]//2*2])
+
+class Previews:
+    """
+    frames at a lower resolution, each one is only shrunk when it's read (fields keep them, see ScalarField.preview)
+    ________
+    ~Inputs~
+    * frames - ScalarField | np.ndarray
+        the full resolution frames
+    * level - int
+        how many times to halve the resolution
+    * method - str
+        how blocks of cells are combined, see pysim.utils.block_reduce
+    """
+    def __init__(self, frames, level: int, method: str = 'mean') -> None:
+        self.frames = frames
+        self.level = level
+        self.method = method
+    def __len__(self) -> int: return len(self.frames)
+    def __getitem__(self, i: int) -> np.ndarray:
+        if hasattr(self.frames, "preview"): return self.frames.preview(i, self.level, self.method)
+        return block_reduce(np.asarray(self.frames[i]), 2**self.level, self.method)
+
+#what the render workers draw from, forked workers inherit it so frames never have to be pickled
+_movie: dict = {}
+def _render_frame(i: int) -> np.ndarray:
+    #each worker builds its own figure the first time it's given a frame
+    if "renderer" not in _movie: _movie["renderer"] = _movie["make"]()
+    return _movie["renderer"].render(i if _movie["frames"] is None else _movie["frames"][i])
+
+def write_movie(make_renderer, indices, file: str, frames=None, fps: int = 10, workers: int|None = None, verbose: bool = False) -> str:
+    """
+    draw frames in a pool of worker processes and pipe them straight to the encoder in order, so only a few
+    frames are ever in memory. Each worker builds its renderer (and figure) once and reuses it for every frame
+    :param make_renderer: makes something with a render method which gives back an rgb image, e.g. partial(FrameRenderer, shape)
+    :param indices: which frames to render, in order
+    :param file: str: where to save the movie
+    :param frames: what render is given frames from, None hands it the indices
+    :param fps: frames per second
+    :param workers: how many processes to render with, defaults to every core, 1 renders here
+    :param verbose: show a progress bar and the sustained frame rate
+    :return: the path to the movie
+    """
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+    from time import perf_counter
+    global _movie
+    workers = os.cpu_count() if workers is None else workers
+    processes = workers > 1 and "fork" in multiprocessing.get_all_start_methods()
+    _movie = {"make": make_renderer, "frames": frames}
+    writer, start = None, perf_counter()
+    try:
+        #two frames per worker in flight keeps every core busy while bounding memory
+        images = read_ahead(((_render_frame, i) for i in indices), depth=2*workers if processes else 0, workers=workers, processes=processes, context="fork")
+        for image in verbose_bar(images, verbose, total=len(indices), desc=f"rendering {file}"):
+            if writer is None: writer = FFMPEG_VideoWriter(file, image.shape[1::-1], fps)
+            writer.write_frame(image)
+    finally:
+        if writer is not None: writer.close()
+        _movie = {}
+    if verbose: print(f"{len(indices)} frames in {(t:=perf_counter()-start):.1f}s, {len(indices)/t:.1f} frames/s with {workers} workers")
+    return file
+
+def render_movie(frames, file: str, fps: int = 10, compress: int = 1, workers: int|None = None, verbose: bool = False, **figure) -> str:
+    """
+    render frames into a movie, each frame is read and drawn in a pool of worker processes, see write_movie
+    :param frames: anything with a length and integer indexing, e.g. a ScalarField, a FieldExpression, or an array
+    :param file: str: where to save the movie
+    :param fps: frames per second
+    :param compress: only use every compress-th frame
+    :param workers: how many processes to render with, defaults to every core, 1 renders here
+    :param figure: passed to FrameRenderer, e.g. cmap, norm, title, figsize, dpi
+    :return: the path to the movie
+    """
+    figure.setdefault("shape", np.shape(frames[0]))
+    return write_movie(partial(FrameRenderer, **figure), range(0, len(frames), compress), file, frames=frames, fps=fps, workers=workers, verbose=verbose)
+
+def render_diagnostics(
+    s, file: str, indices=None, tracks: list = [], times: np.ndarray|None = None, 
+    fps: int = 12, workers: int|None = None, verbose: bool = False, **figure
+) -> str:
+    """
+    render the diagnostic image of many dumps into a movie, see DiagnosticRenderer and write_movie
+    :param s: the simulation
+    :param file: str: where to save the movie
+    :param indices: which dumps to draw, defaults to all of them
+    :param tracks: scalars plotted against time under the images, one value per dump
+    :param times: the time of each dump, defaults to s.tau
+    :param fps: frames per second
+    :param workers: how many processes to render with, defaults to every core, 1 renders here
+    :param figure: passed to DiagnosticRenderer, e.g. figsize and dpi
+    :return: the path to the movie
+    """
+    indices = range(min(len(s.density), len(s.B))) if indices is None else indices
+    return write_movie(partial(DiagnosticRenderer, s, tracks=tracks, times=times, **figure), indices, file, fps=fps, workers=workers, verbose=verbose)
+
+# moviepy is slow to import so it is only pulled in when a video is made
 def video_plot(xs, ys, file, fps=10, compress=1, grid=True, scale='linear', **kwargs):
+    from moviepy.video.VideoClip import VideoClip
+    from moviepy.video.io.bindings import mplfig_to_npimage
     fig, ax = plt.subplots(dpi=100)
     xplot, yplot = nan_clip(xs[0], ys[0])
     yplot[yplot == 0] = 1e-9
@@ -214,24 +480,160 @@ def make_video(name: str, frames: str = 'frames', fps: int = 12, outdir='.', ver
     :param fps: frames per second
     :param outdir: which directory to put the video in
     """
+    from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
     image_folder = frames
     image_files = [os.path.join(image_folder, img)
                    for img in os.listdir(image_folder)
                    if img.endswith(".png")]
     image_files = list(np.array(image_files)[np.argsort(image_files)])
-    clip = moviepy.video.io.ImageSequenceClip.ImageSequenceClip(image_files, fps=fps)
+    clip = ImageSequenceClip(image_files, fps=fps)
     clip.write_videofile(f'{outdir}/{name}.mp4', verbose=verbose)
 
-def monitor_video(s, outdir="./monitor/"):
-    ensure_path(monitor_frames:=f"/home/x-kgootkin/turbulence/frames/monitor/{s.name}/")
-    already_there = glob(monitor_frames+"*")
-    jz = s.Jz()
-    print(f"Monitor Activation: {dtime.now()}")
-    for i in progress_bar(range(len(jz))):
-        full_path = f"{monitor_frames}monitor_{str(i).zfill(6)}.png"
-        if os.path.exists(full_path): continue
-        diagnose_frame(s, i, '', full_path=full_path, track_params=[jz])
-    make_video(f"{s.name}_monitor", monitor_frames, outdir=outdir)
+def rms_current(s, indices: list, batch: int = 8) -> np.ndarray:
+    """the rms of Jz (the z component of the curl of B) in each of the given dumps, only one batch of Jz is ever in memory"""
+    return np.array([
+        rms for start in range(0, len(indices), batch)
+        for rms in np.sqrt(np.mean(np.square(s.B.curlz(item=list(indices[start:start+batch]), batch=batch)), axis=(-2, -1)))
+    ])
+
+class Monitor:
+    """
+    keeps a diagnostic video (see diagnose_frame) of a running simulation up to date. Every update only reads, tracks,
+    and renders the dumps written since the last one and appends them onto the end of the video, so keeping up with a
+    long run costs work proportional to the new output
+    ________
+    ~Inputs~
+    * s - Simulation
+        the simulation to monitor
+    * outdir - str
+        the folder the video goes in
+    * tracks - dict
+        the scalars plotted under the frames, names and functions taking the simulation and a list of dump indices
+        and giving back one value per dump, defaults to the rms of Jz
+    * fps - int
+        frames per second of the video
+    * workers - int
+        how many processes to render new frames with, defaults to every core
+    * reset - bool
+        start the video over, deleting whatever is at its path. Without it a video this monitor has no record of
+        writing (e.g. a finished movie, or one from another version) is never touched and a FileExistsError is raised
+    ___________
+    ~Atributes~
+    * video - str
+        the path to the video
+    * state_file - str
+        where what has already been done is kept (in the simulation's cacheDir) so a new Monitor picks up where the
+        last one stopped
+    * state - dict
+        the iterations already in the video and the values of every track for them
+    """
+    version = 1
+    def __init__(
+            self, s, outdir: str = "./monitor/", tracks: dict|None = None, fps: int = 12, workers: int|None = None, reset: bool = False
+        ) -> None:
+        self.s = s
+        self.workers = workers
+        self.tracks = {"Jz": rms_current} if tracks is None else tracks
+        self.fps = fps
+        os.makedirs(outdir, exist_ok=True)
+        self.video = f"{outdir}/{s.name}_monitor.mp4"
+        self.state_file = s.cacheDir.path + "/monitor.json"
+        self.state = self._load(reset=reset)
+    def __len__(self) -> int: return len(self.state["iterations"])
+    def __repr__(self) -> str: return f"Monitor({self.s.name}, {len(self)} frames)"
+
+    def update(self, verbose: bool = False) -> int:
+        """
+        add any new dumps to the tracks and the video
+        :param verbose: show a progress bar while rendering
+        :return: int: how many frames were added
+        """
+        self.s.refresh()
+        iterations = self.s.B.x.iterations
+        #every field has to have caught up to the dump before it can be drawn
+        n = min(len(self.s.B), len(self.s.density), len(self.s.etx1))
+        #a run restarted from scratch no longer matches what's in the video
+        if list(iterations[:len(self)]) != self.state["iterations"]: self.state = self._load(reset=True)
+        new = list(range(len(self), n))
+        if len(new)==0: return 0
+        for name, track in self.tracks.items(): self.state["tracks"][name] += [float(v) for v in track(self.s, new)]
+        self.state["iterations"] += [int(i) for i in iterations[new[0]:n]]
+        tracks = [np.array(self.state["tracks"][name]) for name in self.tracks]
+        times = self.times(np.array(self.state["iterations"]))
+        segment = self.video[:-len(".mp4")] + "_new.mp4"
+        render_diagnostics(self.s, segment, new, tracks=tracks, times=times, fps=self.fps, workers=self.workers, verbose=verbose)
+        self._append(segment)
+        #only saved once the video has the frames, a crash before this just redoes them
+        self._save()
+        return len(new)
+
+    def watch(self, interval: float = 60., timeout: float|None = None, verbose: bool = True) -> None:
+        """
+        keep updating as the simulation runs, only the output folders' mtimes are checked between new dumps
+        :param interval: seconds to wait between checks
+        :param timeout: stop once there have been no new dumps for this many seconds, None keeps going until interrupted
+        :param verbose: say whenever frames are added
+        """
+        from time import sleep, monotonic
+        last = monotonic()
+        try:
+            while timeout is None or monotonic() - last < timeout:
+                if (added:=self.update()) > 0:
+                    last = monotonic()
+                    if verbose: print(f"{self.s.name}: added {added} frames, {len(self)} total")
+                sleep(interval)
+        except KeyboardInterrupt: pass
+
+    def times(self, iterations: np.ndarray) -> np.ndarray:
+        """the time of each iteration, in crossing times (tau) if the simulation knows its mach number"""
+        time = iterations * self.s.dt
+        return time * self.s.mach / max(self.s.input.boxsize) if hasattr(self.s, "mach") else time
+
+    def _append(self, segment: str) -> None:
+        if not os.path.exists(self.video): return os.replace(segment, self.video)
+        #the concat demuxer copies the encoded streams one after the other, nothing is decoded or re-encoded
+        import subprocess
+        from moviepy.config import get_setting
+        with open(listing:=self.video + ".txt", 'w') as file:
+            for f in [self.video, segment]: file.write(f"file '{os.path.abspath(f)}'\n")
+        joined = self.video[:-len(".mp4")] + "_joined.mp4"
+        subprocess.run(
+            [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listing, "-c", "copy", joined],
+            check=True
+        )
+        os.replace(joined, self.video)
+        for f in [segment, listing]: os.remove(f)
+
+    def _load(self, reset: bool = False) -> dict:
+        fresh = {"version": self.version, "video": self.video, "iterations": [], "tracks": {name: [] for name in self.tracks}}
+        if reset:
+            if os.path.exists(self.video): os.remove(self.video)
+            return fresh
+        saved = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as file: saved = json.load(file)
+            except (OSError, ValueError): saved = {}
+        #the saved state is only any good if it's for this video and has every track
+        if (
+            isinstance(saved, dict) and saved.get("version")==self.version and saved.get("video")==self.video 
+            and os.path.exists(self.video) and all(name in saved.get("tracks", {}) for name in self.tracks)
+        ): return saved
+        #only a video the saved state vouches for was made here, anything else might be someone's finished movie
+        if os.path.exists(self.video): 
+            raise FileExistsError(f"{self.video} wasn't made by this monitor, pass reset=True to replace it or use another outdir")
+        return fresh
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        #the temporary name is unique so monitors saving at once don't move each other's files
+        with open(tmp:=f"{self.state_file}.{uuid4().hex[:8]}.tmp", 'w') as file: json.dump(self.state, file)
+        os.replace(tmp, self.state_file)
+
+def monitor_video(s, outdir="./monitor/", **kwargs) -> Monitor:
+    """bring the monitor video of a simulation up to date, only rendering dumps added since the last call, see Monitor"""
+    monitor = Monitor(s, outdir=outdir, **kwargs)
+    monitor.update(verbose=True)
+    return monitor
 
 # <||-----|-----|-----|-----|-----|-----|-----|-----|------|-----|-----|------|------|-----|-----|-----|-----|-----||>
 #                                                   DECORATORS
@@ -245,6 +647,8 @@ def line_video(
     def line_video_decorator(func):
         @wraps(func)
         def line_video_wrapper(*args, save="default", **kwargs):
+            from moviepy.video.VideoClip import VideoClip
+            from moviepy.video.io.bindings import mplfig_to_npimage
             # Calculate data via func
             xs, ys = func(*args, **kwargs)
             # Setup plot
@@ -305,35 +709,25 @@ def show_video(
         def simple_video_wrapper(
             s, *args, 
             cmap=cmap, norm=norm, figsize=figsize, 
-            savedir=videoDir.path, compress=1, fps=10, **kwargs
+            savedir=videoDir.path, compress=1, fps=10, workers=None, dpi=100, verbose=False, saturate=None, 
+            preview=None, lod='mean', **kwargs
         ):
-            # make a directory to store frames in
-            Folder(
-                fpath := f"{frameDir.path}/{s.name}/{name}/"
-            ).make()
-            Folder(savedir).make()
-            # make the frames and return as a numpy array
+            cmap = default_cmap if cmap is None else cmap
+            # frames go straight into the encoder so only the video needs a directory
+            os.makedirs(savedir, exist_ok=True)
+            # get the frames, either an array or something lazy (e.g. a field) that is read a frame at a time
             frames = func(s, *args, **kwargs)
-            # plot the frames
-            fig,ax = plt.subplots(figsize=figsize)
-            normalization = norm if not isinstance(norm, str) else auto_norm(norm, frames)
-            *_,img = show(
-                frames[0], 
-                fig = fig,
-                ax = ax,
-                cmap=cmap, 
-                norm=normalization, 
-                title=f"{latex}" if isinstance(latex, str) else f"{name}"
+            normalization = norm if not isinstance(norm, str) else auto_norm(norm, frames, saturate=saturate)
+            # previews are made at the resolution of the movie (preview='auto') or shrunk by 2**preview
+            shape = tuple(np.shape(frames)[-2:]) if isinstance(frames, np.ndarray) else tuple(frames.shape)
+            extent = (0, shape[0], 0, shape[1])
+            if preview is not None: 
+                level = lod_level(shape, (0.75*figsize[0]*dpi, 0.75*figsize[1]*dpi)) if preview=='auto' else preview
+                frames = Previews(frames, level, lod)
+            render_movie(
+                frames, f"{savedir}/{s.name}_{name}.mp4", fps=fps, compress=compress, workers=workers, verbose=verbose,
+                cmap=cmap, norm=normalization, title=f"{latex}" if isinstance(latex, str) else f"{name}", figsize=figsize, dpi=dpi, extent=extent
             )
-            def update(t):
-                index = int(t * fps * compress)
-                if index < len(frames) - 1:
-                    img.set_array(frames[index])
-                    return mplfig_to_npimage(fig)
-                img.set_array(frames[-1])
-                return mplfig_to_npimage(fig)
-            animation = VideoClip(update, duration=len(frames) / compress / fps)
-            animation.write_videofile(f"{savedir}/{s.name}_{name}.mp4", fps=fps)
         return simple_video_wrapper
     return simple_video_decorator
 
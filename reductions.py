@@ -0,0 +1,321 @@
+#pysim imports
+from pysim.utils import bin_index, binned_stats
+#nonpysim imports
+import numpy as np
+
+# <||-----|-----|-----|-----|-----|-----|-----|-----|------|-----|-----|------|------|-----|-----|-----|-----|-----||>
+#                                                   REDUCERS
+# <||-----|-----|-----|-----|-----|-----|-----|-----|------|-----|-----|------|------|-----|-----|-----|-----|-----||>
+class Reducer:
+    """
+    a streaming reduction over the frames of a field, update is called once with every frame (in order) and
+    result once at the end, so only one frame ever needs to be in memory
+    """
+    name: str = "reducer"
+    def update(self, frame: np.ndarray) -> None: raise NotImplementedError
+    def result(self): raise NotImplementedError
+    def __repr__(self) -> str: return f"{type(self).__name__}({self.name})"
+
+class PerFrame(Reducer):
+    """
+    reduce every frame to a single value, e.g. PerFrame(np.nanmean) gives the mean of each frame
+    :param func: the function to apply to each frame
+    :param name: what to call the result, defaults to the function's name
+    """
+    def __init__(self, func, name: str|None = None) -> None:
+        self.func = func
+        self.name = func.__name__ if name is None else name
+        self.values = []
+    def update(self, frame: np.ndarray) -> None: self.values.append(self.func(frame))
+    def result(self) -> np.ndarray: return np.array(self.values)
+
+class Percentile(PerFrame):
+    """the q-th percentile (0-100) of every frame, ignoring nans"""
+    def __init__(self, q: float) -> None:
+        PerFrame.__init__(self, lambda frame: np.nanpercentile(frame, q), name=f"p{q:g}")
+
+class TimeMoments(Reducer):
+    """
+    numerically stable (Welford) running mean and variance of every point over time, ignoring nans
+    :param ddof: delta degrees of freedom for the variance
+    :param name: what to call the result
+    :return: result gives a dict with the time averaged 'mean', 'var', and 'std' maps and the 'count' at each point
+    """
+    def __init__(self, ddof: int = 0, name: str = "time_moments") -> None:
+        self.ddof = ddof
+        self.name = name
+        self.count = None
+    def update(self, frame: np.ndarray) -> None:
+        if self.count is None:
+            self.count = np.zeros(frame.shape, dtype=np.int64)
+            self.mean = np.zeros(frame.shape, dtype=np.float64)
+            self.m2 = np.zeros(frame.shape, dtype=np.float64)
+        good = np.isfinite(frame)
+        self.count += good
+        delta = np.where(good, frame - self.mean, 0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += delta * np.where(good, frame - self.mean, 0)
+    def result(self) -> dict:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.where(self.count > self.ddof, self.m2 / (self.count - self.ddof), np.nan)
+            mean = np.where(self.count > 0, self.mean, np.nan)
+        return {'mean': mean, 'var': var, 'std': np.sqrt(var), 'count': self.count}
+
+class TimeMap(TimeMoments):
+    """one of the maps from TimeMoments: 'mean', 'var', or 'std'"""
+    def __init__(self, moment: str, ddof: int = 0) -> None:
+        TimeMoments.__init__(self, ddof=ddof, name=f"time_{moment}")
+        self.moment = moment
+    def result(self) -> np.ndarray: return TimeMoments.result(self)[self.moment]
+
+class TimeExtrema(Reducer):
+    """the minimum or maximum of every point over time, ignoring nans"""
+    def __init__(self, which: str = "max") -> None:
+        assert which in ["min", "max"], f"which: {which} not available, please choose either min or max"
+        self.name = f"time_{which}"
+        self.func = np.fmin if which=="min" else np.fmax
+        self.extreme = None
+    def update(self, frame: np.ndarray) -> None:
+        #fmin/fmax ignore nans unless both sides are nan
+        self.extreme = np.array(frame, dtype=np.float64) if self.extreme is None else self.func(self.extreme, frame)
+    def result(self) -> np.ndarray: return self.extreme
+
+class Moments(Reducer):
+    """
+    numerically stable running mean and variance of every finite value in every frame, frames are combined
+    with Chan's parallel update so each one is only summed once
+    :return: result gives a dict with the 'mean', 'var', 'std', 'min', 'max' and 'count' of all the data
+    """
+    def __init__(self, ddof: int = 0, name: str = "moments") -> None:
+        self.ddof = ddof
+        self.name = name
+        self.count, self.mean, self.m2 = 0, 0., 0.
+        self.min, self.max = np.inf, -np.inf
+    def update(self, frame: np.ndarray) -> None: self._add(frame[np.isfinite(frame)])
+    def _add(self, values: np.ndarray) -> None:
+        if (n:=values.size)==0: return None
+        mean = values.mean(dtype=np.float64)
+        m2 = np.square(values - mean, dtype=np.float64).sum()
+        delta = mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.count * n / total
+        self.count = total
+        self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+    def result(self) -> dict:
+        var = self.m2 / (self.count - self.ddof) if self.count > self.ddof else np.nan
+        return {
+            'mean': self.mean if self.count > 0 else np.nan, 'var': var, 'std': np.sqrt(var),
+            'min': self.min, 'max': self.max, 'count': self.count
+        }
+
+class FrameStats(Moments):
+    """
+    everything a color normalization needs from a stack of frames in one pass with bounded memory: the Moments
+    of all the finite values, the smallest positive value (for LogNorm), and a uniform random sample of the
+    values (reservoir sampling, each value gets a random key and the sample keeps the smallest keys) to read
+    quantiles from. By the Dvoretzky-Kiefer-Wolfowitz inequality, every quantile read off a sample of k values
+    is within rank_error = sqrt(ln(2/alpha)/(2k)) of the true one (in quantile, e.g. 0.99 might really be
+    0.99 +- rank_error) with probability at least 1-alpha, at once for every quantile; k=2**16 gives +-0.0064
+    at alpha=0.01. Once every value fits in the sample the quantiles are exact
+    :param sample: int: how many values to keep for quantiles
+    :param alpha: float: the failure probability rank_error is quoted at
+    :param seed: seed for the sampling so the same frames always give the same result
+    :return: result gives the Moments along with 'positive_min', 'sample' (sorted), and 'rank_error'
+    """
+    def __init__(self, sample: int = 2**16, alpha: float = 0.01, seed: int|None = 0, name: str = "frame_stats") -> None:
+        Moments.__init__(self, name=name)
+        self.size = sample
+        self.alpha = alpha
+        self.rng = np.random.default_rng(seed)
+        self.positive_min = np.inf
+        self.sample, self.keys = np.empty(0), np.empty(0)
+    def update(self, frame: np.ndarray) -> None:
+        values = frame[np.isfinite(frame)]
+        self._add(values)
+        if values.size==0: return None
+        if (positive:=values[values > 0]).size > 0: self.positive_min = min(self.positive_min, positive.min())
+        keys = self.rng.random(values.size)
+        #once the sample is full only values with a smaller key than the largest kept one can get in
+        if self.keys.size==self.size:
+            keep = keys < self.keys.max()
+            values, keys = values[keep], keys[keep]
+        values, keys = np.concatenate([self.sample, values]), np.concatenate([self.keys, keys])
+        if keys.size > self.size:
+            smallest = np.argpartition(keys, self.size-1)[:self.size]
+            values, keys = values[smallest], keys[smallest]
+        self.sample, self.keys = values, keys
+    def result(self) -> dict:
+        exact = self.count <= self.size
+        return Moments.result(self) | {
+            'positive_min': self.positive_min if np.isfinite(self.positive_min) else np.nan,
+            'sample': np.sort(self.sample),
+            'rank_error': 0. if exact else np.sqrt(np.log(2/self.alpha)/(2*self.sample.size))
+        }
+
+def sample_quantile(stats: dict, q):
+    """
+    read quantiles off the sample FrameStats keeps, they're within stats['rank_error'] of the true quantiles
+    :param stats: dict: the result of a FrameStats
+    :param q: float | array-like: the quantiles, between 0 and 1
+    :return: the quantiles, nan if nothing was finite
+    """
+    if stats['sample'].size==0: return np.full(np.shape(q), np.nan) if np.ndim(q) > 0 else np.nan
+    return np.quantile(stats['sample'], q)
+
+def _edges(bins, range, values: np.ndarray) -> np.ndarray:
+    #without a range the first frame sets it, anything outside of it later on is counted as an outlier
+    if not np.isscalar(bins): return np.asarray(bins, dtype=np.float64)
+    if range is None: range = (np.nanmin(values), np.nanmax(values))
+    return np.linspace(*range, int(bins) + 1)
+
+def _joint(frame) -> tuple:
+    #joint reducers get a tuple of frames, one from every field (see pysim.fields.joint_reduce)
+    return tuple(frame) if isinstance(frame, (tuple, list)) else (frame,)
+
+def _weights(weights: list, index: np.ndarray, overflow: int) -> np.ndarray|None:
+    #values with a nan or inf weight go to the overflow bin like nan values do, rather than making their bin nan
+    if len(weights)==0: return None
+    weights = np.ravel(weights[0])
+    index[~np.isfinite(weights)] = overflow
+    return weights
+
+class ConditionalStats(Reducer):
+    """
+    the count, mean, and standard deviation of y in bins of x over every frame, e.g. the mean density as a function
+    of Jz. Frames are (x, y) pairs, each one is binned in a single bincount pass and merged into running totals
+    :param bins: int | array: the number of bins or the bin edges
+    :param range: (low, high) of the bins, taken from the first frame if not given
+    :param name: what to call the result
+    :return: result gives a dict with the bin 'edges' and 'centers' and the 'count', 'mean', 'std', and 'err' (the
+             standard error of the mean) of y in each bin, and how many 'outliers' fell outside of the bins
+    """
+    def __init__(self, bins=50, range: tuple|None = None, name: str = "conditional") -> None:
+        self.bins, self.range = bins, range
+        self.name = name
+        self.edges = None
+        self.outliers = 0
+    def update(self, frame) -> None:
+        x, y = _joint(frame)
+        if self.edges is None:
+            self.edges = _edges(self.bins, self.range, x)
+            n = len(self.edges) - 1
+            self.count, self.mean, self.m2 = np.zeros(n, dtype=np.int64), np.zeros(n), np.zeros(n)
+        index = bin_index(x, self.edges)
+        self.outliers += np.count_nonzero(index==len(self.count))
+        count, mean, m2 = binned_stats(index, y, len(self.count))
+        #Chan's parallel update, bin by bin
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = np.where(count > 0, mean - self.mean, 0)
+            self.mean = np.where(total > 0, self.mean + delta * count / np.maximum(total, 1), 0)
+            self.m2 = self.m2 + np.where(count > 0, m2, 0) + delta**2 * self.count * count / np.maximum(total, 1)
+        self.count = total
+    def result(self) -> dict:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / self.count)
+            return {
+                'edges': self.edges, 'centers': (self.edges[1:] + self.edges[:-1])/2, 'count': self.count,
+                'mean': np.where(self.count > 0, self.mean, np.nan), 'std': std, 'err': std / np.sqrt(self.count),
+                'outliers': self.outliers
+            }
+
+class Histogram(Reducer):
+    """
+    a histogram of every frame's values (optionally weighted, nan weights are skipped) accumulated over time
+    :param bins: int | array: the number of bins or the bin edges
+    :param range: (low, high) of the bins, taken from the first frame if not given
+    :param name: what to call the result
+    :return: result gives a dict with the bin 'edges', the 'counts' in each bin, and the normalized 'pdf'
+    """
+    def __init__(self, bins=100, range: tuple|None = None, name: str = "histogram") -> None:
+        self.bins, self.range = bins, range
+        self.name = name
+        self.edges = None
+    def update(self, frame) -> None:
+        values, *weights = _joint(frame)
+        if self.edges is None:
+            self.edges = _edges(self.bins, self.range, values)
+            self.counts = np.zeros(len(self.edges) - 1)
+        n, index = len(self.counts), bin_index(values, self.edges)
+        weights = _weights(weights, index, n)
+        self.counts += np.bincount(index, weights, minlength=n+1)[:n]
+    def result(self) -> dict:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pdf = self.counts / np.sum(self.counts) / np.diff(self.edges)
+        return {'edges': self.edges, 'counts': self.counts, 'pdf': pdf}
+
+class Histogram2D(Reducer):
+    """
+    the joint histogram of two quantities (optionally weighted by a third, nan weights are skipped) accumulated over
+    time, e.g. |B| and |u|
+    :param bins: int | array | (x bins, y bins): the number of bins or the bin edges, for both or each axis
+    :param range: ((xlow, xhigh), (ylow, yhigh)), taken from the first frame if not given
+    :param name: what to call the result
+    :return: result gives a dict with the 'xedges' and 'yedges', the 'counts' in each bin, and the normalized joint 'pdf'
+    """
+    def __init__(self, bins=100, range: tuple|None = None, name: str = "histogram2d") -> None:
+        self.bins = bins if isinstance(bins, (tuple, list)) and len(bins)==2 else (bins, bins)
+        self.range = (None, None) if range is None else range
+        self.name = name
+        self.xedges = None
+    def update(self, frame) -> None:
+        x, y, *weights = _joint(frame)
+        if self.xedges is None:
+            self.xedges, self.yedges = _edges(self.bins[0], self.range[0], x), _edges(self.bins[1], self.range[1], y)
+            self.counts = np.zeros((len(self.xedges) - 1, len(self.yedges) - 1))
+        nx, ny = self.counts.shape
+        ix, iy = bin_index(x, self.xedges), bin_index(y, self.yedges)
+        #anything out of range on either axis lands in one overflow bin that gets dropped
+        index = np.where((ix < nx) & (iy < ny), ix*ny + iy, nx*ny)
+        weights = _weights(weights, index, nx*ny)
+        self.counts += np.bincount(index, weights, minlength=nx*ny+1)[:nx*ny].reshape(nx, ny)
+    def result(self) -> dict:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pdf = self.counts / np.sum(self.counts) / np.outer(np.diff(self.xedges), np.diff(self.yedges))
+        return {'xedges': self.xedges, 'yedges': self.yedges, 'counts': self.counts, 'pdf': pdf}
+
+def rms(frame: np.ndarray) -> float: return np.sqrt(np.nanmean(np.square(frame)))
+
+# shortcuts so reductions can be asked for by name
+named_reducers: dict = {
+    'mean': lambda: PerFrame(np.nanmean, 'mean'),
+    'std': lambda: PerFrame(np.nanstd, 'std'),
+    'rms': lambda: PerFrame(rms, 'rms'),
+    'min': lambda: PerFrame(np.nanmin, 'min'),
+    'max': lambda: PerFrame(np.nanmax, 'max'),
+    'sum': lambda: PerFrame(np.nansum, 'sum'),
+    'median': lambda: PerFrame(np.nanmedian, 'median'),
+    'time_mean': lambda: TimeMap('mean'),
+    'time_var': lambda: TimeMap('var'),
+    'time_std': lambda: TimeMap('std'),
+    'time_min': lambda: TimeExtrema('min'),
+    'time_max': lambda: TimeExtrema('max'),
+    'moments': lambda: Moments(),
+    'frame_stats': lambda: FrameStats(),
+}
+
+def as_reducer(reducer) -> Reducer:
+    """
+    turn a name, function or reducer into a reducer
+    :param reducer: str | callable | Reducer: a name from named_reducers, a function to apply to every frame, or a Reducer
+    :return: the Reducer
+    """
+    if isinstance(reducer, Reducer): return reducer
+    if isinstance(reducer, str):
+        if reducer not in named_reducers: raise KeyError(f"no reducer named {reducer}, choose from {list(named_reducers)} or pass a Reducer")
+        return named_reducers[reducer]()
+    if callable(reducer): return PerFrame(reducer)
+    raise TypeError(f"can't reduce with a {type(reducer)}-type object")
+
+def reduce_frames(frames, *reducers) -> dict:
+    """
+    run every reducer over a stream of frames in a single pass
+    :param frames: iterable of np.ndarray frames, e.g. field.prefetch()
+    :param reducers: names, functions, or Reducers
+    :return: dict of each reducer's name and result
+    """
+    reducers = [as_reducer(r) for r in reducers]
+    for frame in frames:
+        for r in reducers: r.update(frame)
+    return {r.name: r.result() for r in reducers}
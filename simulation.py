@@ -1,5 +1,6 @@
 from pysim.utils import yesno
 from pysim.parsing import Folder
+from pysim.cache import FrameCache
 from pysim.environment import simulationDir
 
 
@@ -10,13 +11,16 @@ class GenericSimulation:
             template:str|Folder=None,
             caching:bool=False,
             verbose:bool=True,
+            cache_size:int=2**30,
+            cache_policy:str='lru'
         ) -> None:
         self.template = template
         self.verbose = verbose
         #setup cache
         if self.verbose: print("caching is ON..." if caching else "caching is OFF...")
         self.caching = caching 
-        self.cache: dict = {}
+        #one memory budgeted cache shared by every field in the simulation
+        self.cache: FrameCache|None = FrameCache(cache_size, policy=cache_policy) if caching else None
         #make sure the simulation exists
         if verbose: print(f"Finding path: {path}")
         self.path: str = path
@@ -34,5 +38,8 @@ class GenericSimulation:
                     self.create()
                 else: raise FileNotFoundError("Please create simulation and try again")
     
+        #pysim keeps its own files about the simulation here
+        self.cacheDir = Folder(self.path+"/.pysim")
+    
     def create(self):
         self.template.copy(self.path)
@@ -0,0 +1,98 @@
+#pysim imports
+from pysim.utils import verbose_bar
+#nonpysim imports
+import numpy as np
+import h5py
+from h5py import File as h5File
+from glob import glob
+from os import walk
+from os.path import isfile
+import re
+
+def dump_iteration(file_name: str) -> int:
+    """
+    get the iteration number of a dump from its file name, e.g. Bx_00012500.h5 -> 12500
+    :param file_name: str: the name of the dump
+    :return: the iteration number, -1 if it can't be found
+    """
+    match = re.search(r"(\d+)\.h5$", file_name)
+    return int(match.group(1)) if match else -1
+
+def field_folders(output_dir: str) -> list[str]:
+    """
+    find every folder of per dump h5 files under a simulation's output directory
+    :param output_dir: str: the output directory, e.g. sim/Output
+    :return: the folders relative to output_dir, e.g. Fields/Magnetic/Total/x
+    """
+    output_dir = output_dir.rstrip("/")
+    return sorted([
+        root[len(output_dir)+1:].replace("\\", "/")
+        for root, _, files in walk(output_dir) if any(f.endswith(".h5") for f in files)
+    ])
+
+def pack_folder(
+    folder: str,
+    store: h5File,
+    key: str,
+    compression: str|None = "gzip",
+    compression_opts: int|None = 4,
+    chunk: int = 512,
+    verbose: bool = False
+) -> int:
+    """
+    append the dumps in a folder to one chunked, compressed (t, x, y) dataset in a store. dumps already in
+    the store are skipped so this can be rerun as a simulation writes more output
+    :param folder: str: the folder of per dump h5 files
+    :param store: h5py.File: the store to write into
+    :param key: str: the group to hold this field
+    :param compression: the h5py compression filter to use
+    :param compression_opts: the options for the compression filter
+    :param chunk: the largest chunk size along x and y, chunks always hold a single dump
+    :return: the number of dumps added
+    """
+    files = sorted(glob(folder + "/*.h5"))
+    names = [f.replace("\\", "/").split("/")[-1] for f in files]
+    if len(files)==0: return 0
+    if key not in store:
+        group = store.create_group(key)
+        with h5File(files[0], 'r') as first:
+            #GODDMANIT I HATE THAT IT DOES Y,X and not X,Y
+            ny, nx = first["DATA"].shape
+            group.create_dataset(
+                "DATA", shape=(0, nx, ny), maxshape=(None, nx, ny), dtype=first["DATA"].dtype,
+                chunks=(1, min(nx, chunk), min(ny, chunk)), compression=compression,
+                compression_opts=compression_opts if compression=="gzip" else None, shuffle=compression is not None
+            )
+            if "AXIS" in first: first.copy(first["AXIS"], group, name="AXIS")
+            for k, v in first.attrs.items(): group.attrs[k] = v
+        group.create_dataset("iterations", shape=(0,), maxshape=(None,), dtype=np.int64)
+        group.create_dataset("files", shape=(0,), maxshape=(None,), dtype=h5py.string_dtype())
+    group = store[key]
+    packed = list(group["files"].asstr()[:])
+    assert packed==names[:len(packed)], f"{key} in {store.filename} doesn't match the dumps in {folder}, please repack it"
+    new = list(range(len(packed), len(files)))
+    if len(new)==0: return 0
+    for dset in ["DATA", "iterations", "files"]: group[dset].resize(len(files), axis=0)
+    for k in verbose_bar(new, verbose, desc=f"packing {key}"):
+        with h5File(files[k], 'r') as f: group["DATA"][k] = np.array(f["DATA"]).T
+        group["iterations"][k] = dump_iteration(names[k])
+        group["files"][k] = names[k]
+    return len(new)
+
+def compress_output(output_dir: str, store_file: str|None = None, verbose: bool = False, **kwargs) -> str:
+    """
+    pack a simulation's per dump output into a single consolidated store, one (t, x, y) dataset per field.
+    fields read from the store with ScalarField(store_file + "/Fields/Magnetic/Total/x"), or the whole
+    simulation with dHybridR(path, compressed=True)
+    :param output_dir: str: the simulation's output directory, e.g. sim/Output
+    :param store_file: str: where to write the store, defaults to output_dir + ".h5"
+    :param kwargs: passed to pack_folder
+    :return: the path to the store
+    """
+    output_dir = output_dir.replace("\\", "/").rstrip("/")
+    store_file = output_dir + ".h5" if store_file is None else store_file
+    with h5File(store_file, 'a') as store:
+        for key in field_folders(output_dir):
+            added = pack_folder(f"{output_dir}/{key}", store, key, verbose=verbose, **kwargs)
+            if verbose: print(f"{key}: added {added} dumps")
+    return store_file
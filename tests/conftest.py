@@ -0,0 +1,48 @@
+#the repository is the pysim package itself, so register it under that name whatever the checkout is called
+import sys
+import shutil
+import numpy as np
+import h5py
+import pytest
+from os import makedirs
+from os.path import dirname, abspath
+from importlib.util import spec_from_file_location, module_from_spec
+
+root = dirname(dirname(abspath(__file__)))
+
+def load_pysim():
+    if "pysim" in sys.modules: return sys.modules["pysim"]
+    spec = spec_from_file_location("pysim", root + "/__init__.py", submodule_search_locations=[root])
+    sys.modules["pysim"] = module_from_spec(spec)
+    spec.loader.exec_module(sys.modules["pysim"])
+    return sys.modules["pysim"]
+
+load_pysim()
+
+#output folder: file stem of its dumps
+outputs = {
+    "Fields/Magnetic/Total/x": "Bx", "Fields/Magnetic/Total/y": "By", "Fields/Magnetic/Total/z": "Bz",
+    "Fields/Electric/Total/x": "Ex", "Fields/Electric/Total/y": "Ey", "Fields/Electric/Total/z": "Ez",
+    "Phase/x3x2x1/Sp01": "x3x2x1", "Phase/FluidVel/Sp01/x": "Vx", "Phase/FluidVel/Sp01/y": "Vy",
+    "Phase/FluidVel/Sp01/z": "Vz", "Phase/etx1/Sp01": "etx1",
+}
+
+def make_simulation(path: str, n: int = 6, Nx: int = 32, Ny: int = 24, ndump: int = 500) -> str:
+    """a dHybridR simulation folder with n dumps of random output, written (y, x) like dHybridR does"""
+    shutil.copytree(root + "/templates/dHybridR", path, ignore=lambda *_: ["__pycache__", "dHybridR"])
+    rng = np.random.default_rng(0)
+    for folder, stem in outputs.items():
+        full = f"{path}/Output/{folder}"
+        makedirs(full)
+        for t in range(n):
+            with h5py.File(f"{full}/{stem}_{str(t*ndump).zfill(8)}.h5", "w") as file:
+                file["DATA"] = rng.random((16, Nx) if stem=="etx1" else (Ny, Nx)).astype(np.float32)
+                axis = file.create_group("AXIS")
+                axis["X1 AXIS"] = np.array([0., 16.])
+                axis["X2 AXIS"] = np.array([-3., 4.]) if stem=="etx1" else np.array([0., 12.])
+    return path
+
+@pytest.fixture
+def simulation(tmp_path):
+    from pysim.dhybridr.dhybridr import dHybridR
+    return dHybridR(make_simulation(str(tmp_path / "sim")), verbose=False)
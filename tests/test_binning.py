@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from pysim.utils import bin_this
+from pysim.fields import joint_reduce
+from pysim.reductions import reduce_frames, ConditionalStats, Histogram, Histogram2D
+
+def masks(x: np.ndarray, edges: np.ndarray) -> list:
+    """one mask per bin, every bin covers its lower edge and the last one its upper edge too"""
+    last = len(edges) - 2
+    return [(x >= edges[k]) & ((x < edges[k+1]) | ((k==last) & (x==edges[-1]))) for k in range(last + 1)]
+
+def loop_bin_this(x, y, n_bins, func) -> tuple:
+    edges = np.linspace(np.nanmin(x), np.nanmax(x), n_bins)
+    Y, error = [], []
+    for mask in masks(x, edges):
+        yin = y[mask]
+        Y.append(func(yin) if yin.size > 0 or func is not np.nanmean else np.nan)
+        error.append(np.nanstd(yin)/np.sqrt(yin.size) if yin.size > 0 else np.nan)
+    return edges[:-1], np.array(Y), np.array(error)
+
+def loop_conditional(x, y, edges) -> dict:
+    result = {'count': [], 'mean': [], 'std': []}
+    for mask in masks(x, edges):
+        yin = y[mask & np.isfinite(y)]
+        result['count'].append(yin.size)
+        result['mean'].append(yin.mean() if yin.size > 0 else np.nan)
+        result['std'].append(yin.std() if yin.size > 0 else np.nan)
+    result = {k: np.array(v) for k, v in result.items()}
+    result['err'] = result['std'] / np.sqrt(result['count'])
+    result['outliers'] = np.sum(~np.any(masks(x, edges), axis=0))
+    return result
+
+def loop_histogram2d(x, y, w, xedges, yedges) -> np.ndarray:
+    return np.array([[np.sum(w[mx & my]) for my in masks(y, yedges)] for mx in masks(x, xedges)])
+
+@pytest.fixture
+def data():
+    """values piled up on the bin edges with gaps that leave empty bins, and nans in both x and y"""
+    rng = np.random.default_rng(5)
+    x = rng.choice([0., 1., 2., 2.5, 3., 9., 10.], size=(4, 15, 12))
+    x[x==2.5] = rng.uniform(2, 3, size=np.sum(x==2.5))
+    x[0, 0, :3], x[2, 4, 4] = np.nan, np.nan
+    y = 3*x + rng.normal(size=x.shape)
+    y[1, :2, :2], y[3, 7, 1] = np.nan, np.nan
+    return x, y
+
+#empty bins are handed to func as they are, nanmedian warns about them
+@pytest.mark.filterwarnings("ignore:Mean of empty slice")
+@pytest.mark.parametrize("func", [np.nanmean, np.nanmedian, np.nansum, len])
+@pytest.mark.parametrize("n_bins", [11, 4, 2])
+def test_bin_this(data, n_bins, func):
+    x, y = data
+    xbins, Y, error = bin_this(x, y, n_bins=n_bins, func=func)
+    x0, Y0, error0 = loop_bin_this(x.ravel(), y.ravel(), n_bins, func)
+    assert np.array_equal(xbins, x0)
+    assert np.allclose(Y, Y0, equal_nan=True) and np.allclose(error, error0, equal_nan=True)
+    #the largest x is in the last bin
+    assert n_bins!=11 or func is not len or Y[-1]==np.sum((x==9) | (x==10))
+
+def test_bin_this_empty_bins(data):
+    x, y = data
+    #bins from 4 up to 9 have nothing in them
+    _, Y, error = bin_this(x, y, n_bins=11)
+    assert np.all(np.isnan(Y[4:9])) and np.all(np.isnan(error[4:9])) and not np.any(np.isnan(Y[[0, 1, 2, 3, 9]]))
+    _, counts, _ = bin_this(x, y, n_bins=11, func=len)
+    assert np.array_equal(counts, [np.sum(m) for m in masks(x, np.linspace(0, 10, 11))])
+    assert counts.sum()==np.sum(np.isfinite(x))
+
+@pytest.mark.parametrize("edges", [np.array([-1., 0., 1., 2., 4., 8., 10.]), np.array([0.5, 1., 3.]), np.linspace(0, 10, 21)])
+def test_conditional_stats(data, edges):
+    x, y = data
+    result = reduce_frames(zip(x, y), ConditionalStats(edges))['conditional']
+    expected = loop_conditional(x.ravel(), y.ravel(), edges)
+    assert np.array_equal(result['count'], expected['count']) and result['outliers']==expected['outliers']
+    for k in ['mean', 'std', 'err']: assert np.allclose(result[k], expected[k], equal_nan=True)
+    assert np.array_equal(result['edges'], edges) and np.allclose(result['centers'], (edges[1:] + edges[:-1])/2)
+
+def test_conditional_stats_range_from_the_first_frame(data):
+    x, y = data
+    result = reduce_frames(zip(x[1:], y[1:]), ConditionalStats(6))['conditional']
+    #the first frame sets the bins, anything in later frames outside of them is an outlier
+    edges = np.linspace(np.nanmin(x[1]), np.nanmax(x[1]), 7)
+    expected = loop_conditional(x[1:].ravel(), y[1:].ravel(), edges)
+    assert np.allclose(result['edges'], edges)
+    assert np.array_equal(result['count'], expected['count']) and result['outliers']==expected['outliers']
+    assert np.allclose(result['mean'], expected['mean'], equal_nan=True)
+
+def test_histograms(data):
+    x, y = data
+    w = np.abs(y)
+    xedges, yedges = np.array([0., 1., 2., 4., 6., 10.]), np.array([-5., 0., 5., 10., 20., 40.])
+    result = reduce_frames(
+        zip(x, y, w), Histogram2D((xedges, yedges), name="weighted"), Histogram(xedges, name="x"),
+    ) | reduce_frames(zip(x, y), Histogram2D((xedges, yedges)))
+    unweighted = loop_histogram2d(x.ravel(), y.ravel(), np.ones(x.size), xedges, yedges)
+    assert np.array_equal(result['histogram2d']['counts'], unweighted)
+    #the gap between 4 and 6 in x is empty and zero in the pdf, not nan
+    assert np.all(unweighted[3]==0) and np.all(result['histogram2d']['pdf'][3]==0)
+    assert np.isclose(np.sum(result['histogram2d']['pdf'] * np.outer(np.diff(xedges), np.diff(yedges))), 1)
+    assert np.allclose(result['weighted']['counts'], loop_histogram2d(x.ravel(), y.ravel(), w.ravel(), xedges, yedges))
+    #Histogram bins the first of the frames it's handed weighted by the second, nan weights are left out
+    assert np.allclose(result['x']['counts'], [np.nansum(y[m]) for m in masks(x, xedges)])
+    weighted = reduce_frames(zip(x, x, y), Histogram2D((xedges, xedges)))['histogram2d']['counts']
+    assert np.allclose(weighted, loop_histogram2d(x.ravel(), x.ravel(), np.nan_to_num(y.ravel()), xedges, xedges))
+    assert np.array_equal(reduce_frames(iter(x), Histogram(xedges))['histogram']['counts'], [np.sum(m) for m in masks(x, xedges)])
+
+def test_joint_reduce_over_fields(simulation):
+    B = simulation.B
+    x = np.array([B.x[i] for i in range(len(B.x))], dtype=np.float64)
+    y = np.array([B.y[i] for i in range(len(B.y))], dtype=np.float64)
+    edges = np.array([0., 0.1, 0.5, 0.50001, 0.9, 1.])
+    result = joint_reduce([B.x, B.y], ConditionalStats(edges), Histogram2D((edges, 4), range=(None, (0, 1))), depth=2)
+    expected = loop_conditional(x.ravel(), y.ravel(), edges)
+    assert np.array_equal(result['conditional']['count'], expected['count'])
+    assert np.allclose(result['conditional']['mean'], expected['mean'], equal_nan=True)
+    assert np.allclose(result['conditional']['std'], expected['std'], equal_nan=True)
+    counts = loop_histogram2d(x.ravel(), y.ravel(), np.ones(x.size), edges, np.linspace(0, 1, 5))
+    assert np.array_equal(result['histogram2d']['counts'], counts) and counts.sum()==x.size
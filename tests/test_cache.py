@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pysim.cache import FrameCache, resolve_cache
+
+def frame(n: int = 10) -> np.ndarray: return np.zeros(n)
+
+def test_lru_eviction():
+    cache = FrameCache(3*80)
+    for key in "abc": cache.put(key, frame())
+    cache.get("a")
+    cache.put("d", frame())
+    assert "b" not in cache and all(k in cache for k in "acd")
+    assert cache.stats=={'hits': 1, 'misses': 0, 'evictions': 1, 'frames': 3, 'nbytes': 240, 'max_bytes': 240}
+
+def test_lfu_eviction():
+    cache = FrameCache(3*80, policy='lfu')
+    for key in "abc": cache.put(key, frame())
+    for key in "aacc": cache.get(key)
+    cache.put("d", frame())
+    assert "b" not in cache
+    #ties go to the least recently used
+    cache.get("d")
+    cache.put("e", frame())
+    assert "d" not in cache and all(k in cache for k in "ace")
+
+def test_stats_and_budget():
+    cache = FrameCache(100)
+    assert cache.get("missing") is None and cache.get("missing", 0)==0
+    assert cache.stats['misses']==2
+    #too big for the whole budget: handed back but never kept
+    big = cache.put("big", frame(100))
+    assert "big" not in cache and not big.flags.writeable
+    cache.put("a", frame(5))
+    cache.put("a", frame(10))
+    assert cache.nbytes==80 and len(cache)==1
+    cache.resize(40)
+    assert len(cache)==0 and cache.nbytes==0 and cache.evictions==1
+    cache.put("b", frame(5))
+    cache.clear()
+    assert len(cache)==0 and cache.nbytes==0 and not cache
+
+def test_frames_are_read_only():
+    cache = FrameCache()
+    cached = cache.put("a", frame())
+    with pytest.raises(ValueError): cached[0] = 1
+    assert cache.get("a") is cached
+
+def test_threads_stay_in_budget():
+    cache = FrameCache(50*80)
+    def work(k: int) -> None:
+        cache.put(k % 200, frame())
+        cache.get((k*7) % 200)
+    with ThreadPoolExecutor(8) as pool: list(pool.map(work, range(5000)))
+    assert cache.nbytes==len(cache)*80 <= cache.max_bytes
+    assert cache.hits + cache.misses==5000
+
+def test_resolve_cache():
+    shared = FrameCache()
+    parent = type("Parent", (), {'cache': shared})()
+    assert resolve_cache(False, parent) is None
+    assert resolve_cache(True, parent) is shared
+    assert resolve_cache(shared) is shared
+    assert isinstance(resolve_cache(True), FrameCache) and resolve_cache(True) is not shared
+
+def test_simulation_fields_share_one_cache(tmp_path):
+    from conftest import make_simulation
+    from pysim.dhybridr.dhybridr import dHybridR
+    s = dHybridR(make_simulation(str(tmp_path / "sim")), caching=True, verbose=False)
+    assert s.B.x.cache is s.cache and s.E.y.cache is s.cache
+    first = s.B.x[0]
+    assert s.B.x[0] is first
+    assert s.cache.stats['hits']==1 and s.cache.stats['frames']==1
+    assert s.cache.nbytes==first.nbytes
+
+def test_reading_ahead_in_processes_uses_the_cache(tmp_path):
+    from conftest import make_simulation
+    from pysim.dhybridr.dhybridr import dHybridR
+    from pysim.fields import joint_reduce
+    s = dHybridR(make_simulation(str(tmp_path / "sim")), caching=True, verbose=False)
+    cached = [s.B.x[i] for i in [1, 3]]
+    frames = list(s.B.x.prefetch(depth=2, processes=True))
+    assert frames[1] is cached[0] and frames[3] is cached[1]
+    assert s.cache.stats['hits']==2 and len(s.cache)==6
+    #every frame is cached now, so nothing goes to the workers and the order still holds
+    again = list(s.B.x.prefetch(depth=2, processes=True))
+    assert all(a is b for a, b in zip(again, frames))
+    assert s.cache.stats['hits']==8
+    assert np.array_equal(joint_reduce([s.B.x, s.B.y], lambda f: f[0].sum() - f[1].sum(), depth=2, processes=True)['<lambda>'], [s.B.x[i].sum() - s.B.y[i].sum() for i in range(6)])
+
+def test_parallel_batch_reads_fill_the_cache(tmp_path):
+    from conftest import make_simulation
+    from pysim.dhybridr.dhybridr import dHybridR
+    s = dHybridR(make_simulation(str(tmp_path / "sim")), caching=True, verbose=False)
+    s.B.x[2]
+    batch = s.B.x.read_batch(slice(None), workers=3)
+    assert len(s.cache)==6 and s.cache.stats['hits']==1
+    assert all(np.array_equal(s.B.x[i], batch[i]) for i in range(6)) and s.cache.stats['hits']==7
+    #the cache keeps its own copies, editing what was handed back doesn't touch them
+    batch[0] += 1
+    assert not np.array_equal(s.B.x[0], batch[0]) and not s.B.x[0].flags.writeable
+    assert np.allclose(s.B.x.read_batch([4, 0, 5], workers=3), batch[[4, 0, 5]] - np.array([0, 1, 0]).reshape(-1, 1, 1), atol=1e-6)
+    #regions are cached under their own keys
+    part = s.B.x.read_batch([1, 2], region=(slice(0, 8), slice(None)), workers=2)
+    assert np.array_equal(part, batch[1:3, :8]) and len(s.cache)==6
@@ -0,0 +1,94 @@
+import numpy as np
+import json
+import pytest
+from pysim.dhybridr.campaign import Campaign, LocalExecutor, SlurmArrayExecutor, _array_tasks
+from pysim.dhybridr.init_cache import InitCache
+from pysim.dhybridr.input import dHybridRinput
+
+grid = {'mach': [0.5, 1.0], 'num_par': [[1, 1], [2, 2], [3, 3]]}
+constants = {'dB': 1.0, 'ncells': [32, 16], 'boxsize': [16., 8.], 'kinit': [1, 3.]}
+
+def campaign(path, executor=None, **kwargs) -> Campaign:
+    return Campaign(str(path / "sweep"), grid, constants=constants, seed=5, cache=InitCache(str(path / "cache")),
+                    executor=executor or LocalExecutor(workers=2, run_command="test -f input/Bfld_init.unf"), **kwargs)
+
+def test_runs_sharing_fields_build_them_once(tmp_path):
+    with campaign(tmp_path) as c: c.prepare(workers=2)
+    assert c.states=={"prepared": 6}
+    entries = InitCache(str(tmp_path / "cache")).entries
+    #one build per mach, the other two runs of each link it
+    assert sorted(e["uses"] for e in entries.values())==[3, 3]
+    run = dHybridRinput(c[4]["path"] + "/input/input")
+    assert run.ncells==[32, 16] and run.sp01.num_par==[2, 2]
+
+def test_local_arrays_submitted_together_get_their_own_ids(tmp_path):
+    script = tmp_path / "array.sh"
+    script.write_text("exit 0\n")
+    with LocalExecutor(run_command="true") as executor:
+        arrays = [executor.submit(str(script), 2) for _ in range(5)]
+        executor.wait()
+    assert len(set(arrays))==5 and len(executor.futures)==10
+
+def fake(path, name: str, output: str) -> str:
+    #a stand in for a Slurm command that logs how it was called
+    path.joinpath(name).write_text(f"#!/bin/bash\necho \"$@\" >> {path}/{name}.log\n{output}\n")
+    path.joinpath(name).chmod(0o755)
+    return str(path / name)
+
+def test_local_launch_and_status(tmp_path):
+    with campaign(tmp_path) as c:
+        arrays = c.launch(workers=2)
+        assert len(arrays)==1 and c.states=={"PENDING": 6}
+    #closing waits for the local runs
+    assert c.status()=={"COMPLETED": 6}
+    assert all((tmp_path / "sweep" / r["name"] / ".pysim" / "exit_code").read_text().strip()=="0" for r in c.runs)
+
+def test_local_failures_are_reported(tmp_path):
+    with campaign(tmp_path, executor=LocalExecutor(run_command="false")) as c: c.launch(workers=1)
+    assert c.status()=={"FAILED": 6}
+
+def test_local_executor_shuts_its_threads_down(tmp_path):
+    import threading
+    before = threading.active_count()
+    script = tmp_path / "array.sh"
+    script.write_text("exit 0\n")
+    with LocalExecutor(workers=4, run_command="true") as executor: executor.submit(str(script), 8)
+    assert all(f.done() for f in executor.futures.values())
+    assert threading.active_count()==before
+    with pytest.raises(RuntimeError): executor.submit(str(script), 1)
+    #not waiting cancels what hasn't started yet
+    executor = LocalExecutor(workers=1, run_command="true")
+    executor.submit(str(script), 20)
+    executor.close(wait=False)
+    assert any(f.cancelled() for f in executor.futures.values())
+
+def test_slurm_launch_and_status(tmp_path):
+    sbatch = fake(tmp_path, "sbatch", 'echo "4242;anvil"')
+    sacct = fake(tmp_path, "sacct", "\n".join([
+        'echo "4242_0|COMPLETED"', 'echo "4242_1|CANCELLED by 12"', 'echo "4242_[2-4%2]|PENDING"', 'echo "4242_5|RUNNING"'
+    ]))
+    c = campaign(tmp_path, executor=SlurmArrayExecutor(sbatch=sbatch, sacct=sacct, max_parallel=2))
+    assert c.launch(workers=2)==["4242"]
+    assert [r["job"] for r in c.runs]==[f"4242_{i}" for i in range(6)]
+    assert "--parsable" in (tmp_path / "sbatch.log").read_text()
+    script = (tmp_path / "sweep" / "sweep.sh").read_text()
+    assert "#SBATCH --array=0-5%2" in script and "#SBATCH --ntasks=256" in script and "#SBATCH --nodes=2" in script
+    assert c.status()=={"COMPLETED": 1, "CANCELLED": 1, "PENDING": 3, "RUNNING": 1}
+    assert "-j 4242" in (tmp_path / "sacct.log").read_text()
+
+@pytest.mark.parametrize("job, tasks", [
+    ("4242_7", ["4242_7"]),
+    ("4242_[1-3%2]", ["4242_1", "4242_2", "4242_3"]),
+    ("4242_[1,4-5]", ["4242_1", "4242_4", "4242_5"]),
+    ("4242_[0]", ["4242_0"]),
+])
+def test_array_tasks(job, tasks): assert _array_tasks(job)==tasks
+
+def test_reopen(tmp_path):
+    with campaign(tmp_path) as c: c.prepare(workers=1)
+    again = Campaign(str(tmp_path / "sweep"))
+    assert again.runs==json.loads(json.dumps(c.runs)) and again.seed==5 and again.states=={"prepared": 6}
+    #an already prepared campaign doesn't prepare anything again
+    assert again.prepare()==[]
+    with pytest.raises(ValueError, match="different grid"): Campaign(str(tmp_path / "sweep"), {'mach': [2.0]})
+    with pytest.raises(FileNotFoundError): Campaign(str(tmp_path / "elsewhere"))
@@ -0,0 +1,83 @@
+import numpy as np
+import h5py
+import pytest
+from glob import glob
+from pysim.derivatives import Derivatives, derivative_engine
+
+def grid(shape: tuple, spacing: tuple) -> list[np.ndarray]:
+    return np.meshgrid(*[np.arange(n)*h for n, h in zip(shape, spacing)], indexing='ij')
+
+def vector(x, y, Lx: float, Ly: float, phase: float = 0.) -> tuple[np.ndarray, np.ndarray]:
+    """a periodic (Bx, By, Bz) and its analytic curl"""
+    kx, ky = 2*np.pi/Lx, 2*np.pi/Ly
+    B = np.array([np.cos(ky*y + phase), np.sin(2*kx*x + phase), np.sin(kx*x + ky*y + phase)])
+    curl = np.array([
+        ky*np.cos(kx*x + ky*y + phase),
+        -kx*np.cos(kx*x + ky*y + phase),
+        2*kx*np.cos(2*kx*x + phase) + ky*np.sin(ky*y + phase)
+    ])
+    return B, curl
+
+#a box that isn't square, with different spacings, so mixing up the axes shows
+shape, spacing = (48, 20), (0.25, 0.6)
+
+def test_spectral_curl_is_exact():
+    x, y = grid(shape, spacing)
+    engine = Derivatives(shape, spacing)
+    B, curl = vector(x, y, shape[0]*spacing[0], shape[1]*spacing[1])
+    assert np.allclose(engine.curl(B), curl, atol=1e-10)
+    assert np.allclose(engine.curl(B, components=(2,))[0], curl[2], atol=1e-10)
+    assert np.allclose(engine.divergence(engine.curl(B)), 0, atol=1e-10)
+    #a batch of frames is one transform, each frame comes out the same as on its own
+    phases = [0., 0.3, 1.1]
+    batch = np.array([vector(x, y, shape[0]*spacing[0], shape[1]*spacing[1], p)[0] for p in phases])
+    expected = np.array([vector(x, y, shape[0]*spacing[0], shape[1]*spacing[1], p)[1] for p in phases])
+    assert np.allclose(engine.curl(batch), expected, atol=1e-10)
+
+def test_gradient_and_laplacian():
+    x, y = grid(shape, spacing)
+    kx, ky = 2*np.pi/(shape[0]*spacing[0]), 3*2*np.pi/(shape[1]*spacing[1])
+    f = np.sin(kx*x)*np.cos(ky*y)
+    engine = Derivatives(shape, spacing)
+    assert np.allclose(engine.gradient(f), [kx*np.cos(kx*x)*np.cos(ky*y), -ky*np.sin(kx*x)*np.sin(ky*y)], atol=1e-10)
+    assert np.allclose(engine.derivative(f, 1), -ky*np.sin(kx*x)*np.sin(ky*y), atol=1e-10)
+    assert np.allclose(engine.laplacian(f), -(kx**2 + ky**2)*f, atol=1e-9)
+
+@pytest.mark.parametrize("backend, effective", [
+    ("fd2", lambda k, h: np.sin(k*h)/h),
+    ("compact", lambda k, h: 1.5*np.sin(k*h)/(1 + 0.5*np.cos(k*h))/h),
+])
+def test_finite_difference_backends(backend, effective):
+    #a single mode is an eigenfunction of every periodic scheme, with the scheme's modified wavenumber
+    x, y = grid(shape, spacing)
+    #kh = pi/2, far enough from well resolved that every scheme is visibly off
+    k = 12*2*np.pi/(shape[0]*spacing[0])
+    derivative = Derivatives(shape, spacing, backend=backend).derivative(np.sin(k*x), 0)
+    assert np.allclose(derivative, effective(k, spacing[0])*np.cos(k*x), atol=1e-10)
+    assert not np.allclose(derivative, k*np.cos(k*x), atol=1e-3)
+
+def test_3d_curl():
+    shape3, spacing3 = (16, 12, 10), (0.5, 1., 0.7)
+    x, y, z = grid(shape3, spacing3)
+    kz = 2*np.pi/(shape3[2]*spacing3[2])
+    #B = (sin(kz z), 0, 0) has curl (0, kz cos(kz z), 0)
+    B = np.array([np.sin(kz*z), 0*z, 0*z])
+    assert np.allclose(Derivatives(shape3, spacing3).curl(B), [0*z, kz*np.cos(kz*z), 0*z], atol=1e-10)
+
+def test_engines_are_reused():
+    assert derivative_engine(shape, spacing) is derivative_engine(shape, spacing)
+    assert derivative_engine(shape, spacing, 'fd2') is not derivative_engine(shape, spacing)
+
+def test_field_curl(simulation):
+    #write the analytic field over the random dumps, dHybridR writes (y, x)
+    s, (Lx, Ly) = simulation, (simulation.dx*32, simulation.dy*24)
+    x, y = grid((32, 24), (s.dx, s.dy))
+    fields = {"x": "Bx", "y": "By", "z": "Bz"}
+    for c, stem in fields.items():
+        for t, path in enumerate(sorted(glob(f"{s.path}/Output/Fields/Magnetic/Total/{c}/{stem}_*.h5"))):
+            with h5py.File(path, "r+") as file: file["DATA"][...] = vector(x, y, Lx, Ly, 0.1*t)[0]["xyz".index(c)].T
+    expected = np.array([vector(x, y, Lx, Ly, 0.1*t)[1] for t in range(len(s.B))])
+    assert np.allclose(s.B.curl(batch=4), expected, atol=1e-4)
+    assert np.allclose(s.B.curlz(item=[1, 4]), expected[[1, 4], 2], atol=1e-4)
+    assert np.allclose(s.B.curlz_field()[:], expected[:, 2], atol=1e-4)
+    assert np.allclose(s.B.div(), 0, atol=1e-4)
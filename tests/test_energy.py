@@ -0,0 +1,56 @@
+import sys
+import numpy as np
+import h5py
+import multiprocessing
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from conftest import make_simulation
+from pysim.dhybridr.dhybridr import dHybridR
+
+def counting_reads(monkeypatch) -> list:
+    module, read = sys.modules["pysim.dhybridr.dhybridr"], []
+    extract = module.extract_energies
+    monkeypatch.setattr(module, "extract_energies", lambda files, **kwargs: read.append(len(files)) or extract(files, **kwargs))
+    return read
+
+def dumps(s: dHybridR) -> list[str]: return sorted(glob(s.output + "/Phase/etx1/Sp01/*.h5"))
+
+def test_energy(simulation):
+    grid, pdf, dlne = simulation.energy
+    assert grid.shape==pdf.shape==(6, 16) and dlne.shape==(6,)
+    for i, dump in enumerate(dumps(simulation)):
+        with h5py.File(dump, 'r') as file: assert np.allclose(pdf[i], np.mean(file["DATA"], axis=1))
+    assert np.allclose(grid[0], np.exp(np.linspace(-3, 4, 16))) and np.allclose(dlne, 7/15)
+    fresh = dHybridR(simulation.path, verbose=False)
+    assert all(np.allclose(a, b[3]) for a, b in zip(fresh.energy_at(3), simulation.energy))
+    assert "energy" not in fresh.__dict__
+
+def test_energy_is_saved_and_extended(simulation, monkeypatch):
+    read = counting_reads(monkeypatch)
+    first = simulation.energy
+    assert read==[6]
+    #a second open reads the saved spectra
+    again = dHybridR(simulation.path, verbose=False).energy
+    assert read==[6] and all(np.array_equal(a, b) for a, b in zip(first, again))
+    #a new dump only reads that dump
+    with h5py.File(f"{dumps(simulation)[0][:-11]}{str(3000).zfill(8)}.h5", "w") as file:
+        file["DATA"] = np.ones((16, 32), np.float32)
+        file["AXIS/X1 AXIS"], file["AXIS/X2 AXIS"] = np.array([0., 16.]), np.array([-3., 4.])
+    grid, pdf, dlne = dHybridR(simulation.path, verbose=False).energy
+    assert read==[6, 1] and pdf.shape==(7, 16) and np.allclose(pdf[-1], 1) and np.array_equal(pdf[:6], first[1])
+
+def test_rewritten_dump_is_read_again(simulation, monkeypatch):
+    read = counting_reads(monkeypatch)
+    simulation.energy
+    with h5py.File(dumps(simulation)[4], "r+") as file: file["DATA"][...] = 2
+    _, pdf, _ = dHybridR(simulation.path, verbose=False).energy
+    assert read==[6, 2] and np.allclose(pdf[4], 2)
+
+def first_energy(path: str) -> float: return float(np.nansum(dHybridR(path, verbose=False).energy[1]))
+
+def test_many_processes_load_energy_at_once(tmp_path):
+    with ProcessPoolExecutor(16, mp_context=multiprocessing.get_context("fork")) as pool:
+        for trial in range(3):
+            path = make_simulation(str(tmp_path / f"sim{trial}"))
+            totals = list(pool.map(first_energy, [path]*16))
+            assert np.allclose(totals, first_energy(path))
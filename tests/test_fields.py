@@ -0,0 +1,54 @@
+import numpy as np
+from pysim.cache import FrameCache
+from pysim.fields import frame_stats_cache
+from pysim.dhybridr.dhybridr import dHybridR
+
+def test_frame_stats_are_cached(simulation):
+    frame_stats_cache.clear()
+    stats = simulation.B.x.frame_stats()
+    assert simulation.B.x.frame_stats() is stats
+    assert dHybridR(simulation.path, verbose=False).B.x.frame_stats() is stats
+    assert np.isclose(stats['mean'], np.mean([simulation.B.x[i] for i in range(len(simulation.B.x))]))
+    #an expression of the same fields rebuilt reuses them too
+    assert (simulation.B.x + simulation.B.y).frame_stats() is (simulation.B.x + simulation.B.y).frame_stats()
+    assert not stats['sample'].flags.writeable
+
+def test_frame_stats_cache_is_bounded(simulation):
+    frame_stats_cache.clear()
+    frame_stats_cache.resize(2**17)
+    try:
+        for field in [simulation.B.x, simulation.B.y, simulation.B.z, simulation.E.x, simulation.E.y]: field.frame_stats()
+        assert frame_stats_cache.nbytes <= 2**17
+        assert frame_stats_cache.evictions > 0
+    finally:
+        frame_stats_cache.resize(2**26)
+        frame_stats_cache.clear()
+
+def test_frame_stats_go_in_the_simulations_cache(tmp_path):
+    from conftest import make_simulation
+    s = dHybridR(make_simulation(str(tmp_path / "sim")), caching=True, verbose=False)
+    frame_stats_cache.clear()
+    stats = (doubled:=s.B.x * 2).frame_stats()
+    assert len(frame_stats_cache)==0
+    assert any(key[0]=="frame_stats" for key in s.cache._frames)
+    assert doubled.frame_stats() is stats
+    s.cache.clear()
+    assert doubled.frame_stats() is not stats
+
+def test_frame_cache_accounts_for_dicts():
+    cache = FrameCache(100)
+    cache.put("a", {'mean': 1., 'sample': np.zeros(8)})
+    assert cache.nbytes==72
+    cache.put("b", {'sample': np.zeros(8)})
+    assert cache.nbytes==64 and "a" not in cache
+    assert cache.put("c", np.zeros(100)) is not None and "c" not in cache
+
+def test_abs_of_a_vector_field_is_an_array(simulation):
+    B = simulation.B
+    expected = np.sqrt(sum(np.square(np.array([c[i] for i in range(len(B))], dtype=np.float64)) for c in B.components))
+    magnitude = abs(B)
+    assert isinstance(magnitude, np.ndarray) and magnitude.shape==expected.shape
+    assert np.allclose(magnitude, expected, rtol=1e-6)
+    assert np.allclose(np.log(abs(B)), np.log(expected), atol=1e-6)
+    assert np.allclose(B.magnitude_field()[:], expected, rtol=1e-6)
+    assert np.allclose(B.project(B)[:], expected, rtol=1e-5)
@@ -0,0 +1,53 @@
+import sys
+import json
+import numpy as np
+import h5py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from conftest import make_simulation
+from pysim.index import OutputIndex
+from pysim.dhybridr.dhybridr import dHybridR
+
+def counting_scans(monkeypatch) -> list:
+    module, scanned = sys.modules["pysim.index"], []
+    scandir = module.scandir
+    monkeypatch.setattr(module, "scandir", lambda path: scanned.append(path) or scandir(path))
+    return scanned
+
+def test_reused_without_a_rescan(simulation, monkeypatch):
+    first = simulation.B.x.file_names
+    scanned = counting_scans(monkeypatch)
+    again = dHybridR(simulation.path, verbose=False)
+    assert again.B.x.file_names==first and np.array_equal(again.B.x[2], simulation.B.x[2])
+    assert scanned==[]
+
+def test_new_dump_rescans(simulation, monkeypatch):
+    folder = simulation.output + "/Fields/Magnetic/Total/x"
+    before = len(simulation.B.x)
+    scanned = counting_scans(monkeypatch)
+    with h5py.File(f"{folder}/Bx_{str(3000).zfill(8)}.h5", "w") as file: file["DATA"] = np.zeros((24, 32), np.float32)
+    again = dHybridR(simulation.path, verbose=False)
+    assert len(again.B.x)==before+1 and again.B.x.iterations[-1]==3000
+    assert len(scanned)==1
+    #the rescan was saved so the next open doesn't scan again
+    dHybridR(simulation.path, verbose=False).B.x
+    assert len(scanned)==1
+
+def test_unreadable_index_rescans(simulation):
+    simulation.B.x
+    path = simulation.index.path
+    for broken in ['{"version": 1, "fol', '[]', '']:
+        with open(path, 'w') as file: file.write(broken)
+        again = dHybridR(simulation.path, verbose=False)
+        assert again.B.x.file_names==simulation.B.x.file_names
+        with open(path, 'r') as file: assert "Fields/Magnetic/Total/x" in "".join(json.load(file)["folders"])
+
+def open_simulation(path: str) -> int: return len(dHybridR(path, verbose=False).B)
+
+def test_many_processes_open_one_simulation(tmp_path):
+    #every process indexes the same fresh simulation and saves the index at once
+    with ProcessPoolExecutor(24, mp_context=multiprocessing.get_context("fork")) as pool:
+        for trial in range(4):
+            path = make_simulation(str(tmp_path / f"sim{trial}"))
+            assert list(pool.map(open_simulation, [path]*24))==[6]*24
+            assert len(OutputIndex(f"{path}/.pysim/index.json").entries) > 0
@@ -0,0 +1,33 @@
+import numpy as np
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pysim.dhybridr.init_cache import InitCache
+
+def store(path: str, cache: str, key: str) -> None: InitCache(cache).store(key, [path])
+
+def write(path: str, nbytes: int) -> str:
+    with open(path, 'wb') as file: file.write(bytes(nbytes))
+    return path
+
+def test_fetch_links_stored_files(tmp_path):
+    cache = InitCache(str(tmp_path / "cache"))
+    cache.store("a", [write(str(tmp_path / "Bfld_init.unf"), 64)])
+    (tmp_path / "run").mkdir()
+    assert cache.fetch("a", [str(tmp_path / "run" / "Bfld_init.unf")])
+    assert (tmp_path / "run" / "Bfld_init.unf").stat().st_ino==(tmp_path / "Bfld_init.unf").stat().st_ino
+    assert not cache.fetch("b", [str(tmp_path / "run" / "Bfld_init.unf")])
+
+def test_lru_eviction(tmp_path):
+    cache = InitCache(str(tmp_path / "cache"), max_bytes=250)
+    for key in "abc": cache.store(key, [write(str(tmp_path / f"{key}.unf"), 100)])
+    assert "a" not in cache and "b" in cache and "c" in cache
+    assert not (tmp_path / "cache" / "a").exists()
+
+def test_concurrent_stores_keep_every_entry(tmp_path):
+    sources = [write(str(tmp_path / f"{k}.unf"), 16) for k in range(64)]
+    with ProcessPoolExecutor(8, mp_context=multiprocessing.get_context("fork")) as pool:
+        list(pool.map(store, sources, [str(tmp_path / "cache")]*64, [str(k) for k in range(64)]))
+    with open(tmp_path / "cache" / "manifest.json") as file: entries = json.load(file)["entries"]
+    assert len(entries)==64
+    assert InitCache(str(tmp_path / "cache")).nbytes==64*16
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from pysim.dhybridr.initializer import dHybridRinitializer, TurbInit
+
+def turb(ncells, boxsize=None, seed=0, kinit=(1, 3.)):
+    #only what fluctuate needs, without a config or a simulation on disk
+    inputs = SimpleNamespace(ncells=list(ncells), boxsize=[float(n) for n in (boxsize or ncells)])
+    init = TurbInit.__new__(TurbInit)
+    dHybridRinitializer.__init__(init, SimpleNamespace(input=inputs, path=""), seed=seed)
+    init.dB, init.mach, init.kinit = 1., 0.5, kinit
+    init.amplitude, init.kmin = (init.dB, init.mach), 2 * np.pi / max(init.L)
+    return init
+
+def divergence(field, boxsize):
+    k = np.meshgrid(*[2*np.pi*np.fft.fftfreq(n, d=l/n) for n, l in zip(field.shape[1:], boxsize)], indexing='ij')
+    return np.abs(sum(np.fft.fftn(field[c]) * k[c] for c in range(len(k)))).max()
+
+@pytest.mark.parametrize("ncells, boxsize", [
+    ((64, 64), None), ((128, 96), None), ((128, 128), (256, 128)), ((32, 32, 16), None), ((24, 24, 24), None)
+])
+def test_fluctuations_are_divergence_free(ncells, boxsize):
+    init = turb(ncells, boxsize)
+    init.build_B_field()
+    boxsize = boxsize or ncells
+    dB = init.B.astype(np.float64)
+    dB[2] -= 1
+    scale = max(np.abs(np.fft.fftn(dB[c])).max() for c in range(len(ncells)))
+    assert divergence(dB, boxsize) / scale < 1e-5
+    assert np.sqrt(np.mean(np.sum(dB[:len(ncells)]**2, axis=0))) == pytest.approx(1, rel=1e-5)
+    assert np.abs(dB.mean(axis=tuple(range(1, dB.ndim)))).max() < 1e-6
+
+def test_same_seed_same_fields():
+    a, b, c = turb((32, 32), seed=3), turb((32, 32), seed=3), turb((32, 32), seed=4)
+    for init in (a, b, c): init.build_B_field()
+    assert np.array_equal(a.B, b.B) and not np.array_equal(a.B, c.B)
+    assert a.cache_key!=c.cache_key
+
+def test_check_init_files_after_cache_hit(tmp_path):
+    from pysim.dhybridr.init_cache import InitCache
+    cache = InitCache(str(tmp_path / "cache"))
+    for run in ("a", "b"):
+        (tmp_path / run / "input").mkdir(parents=True)
+        init = turb((32, 16), seed=1)
+        init.simulation.path = str(tmp_path / run)
+        init.prepare_simulation(cache=cache)
+    #b was linked out of the cache so its fields were never built
+    assert not hasattr(init, "B")
+    checks = init.check_init_files()
+    assert checks["B"]["finite"] and checks["B"]["mean"][2] == pytest.approx(1)
+    assert np.hypot(*checks["u"]["rms"][:2]) == pytest.approx(0.5, rel=1e-4)
+
+def counting_opens(monkeypatch) -> list:
+    import sys
+    opened = []
+    for name in ["pysim.fields", "pysim.index", "pysim.dhybridr.dhybridr"]:
+        module = sys.modules[name]
+        monkeypatch.setattr(module, "h5File", lambda file, *args, _open=module.h5File, **kwargs: opened.append(file.split("/")[-1]) or _open(file, *args, **kwargs))
+    return opened
+
+def test_snapshots_are_lazy_views(tmp_path, monkeypatch):
+    from conftest import make_simulation
+    from pysim.dhybridr.dhybridr import dHybridR
+    from pysim.dhybridr.initializer import dHybridRSnapshot
+    s = dHybridR(make_simulation(str(tmp_path / "sim")), caching=True, verbose=False)
+    s.time = np.arange(6)*0.25
+    s.tau = s.time*2
+    opened = counting_opens(monkeypatch)
+    snapshots = [dHybridRSnapshot(s, i) for i in [0, 2, np.int64(5), 9]]
+    assert opened==[]
+    #the parent indexing its outputs (the first dump of each, for its shape) isn't reading the snapshot
+    for field in [s.density, s.B, s.u, s.E, s.etx1]: len(field)
+    opened.clear()
+    #anything past the last dump is the last one
+    assert [snap.i for snap in snapshots]==[0, 2, 5, 5] and snapshots[1].tau==1. and snapshots[3].time==1.25
+    assert opened==[]
+    #each field is read the first time it's used, only at the snapshot's dump, and the frames are the parent's
+    snap = snapshots[1]
+    assert np.array_equal(snap.density[:], s.density[2]) and opened==["x3x2x1_00001000.h5"]
+    assert snap.density.array is s.density[2]
+    opened.clear()
+    B = snap.B
+    assert sorted(opened)==["Bx_00001000.h5", "By_00001000.h5", "Bz_00001000.h5"]
+    assert B.x is s.B.x[2] and B.y is s.B.y[2] and B.z is s.B.z[2]
+    assert np.array_equal(snap.B.x[:], s.B.x[2]) and snap.B is B
+    opened.clear()
+    assert np.array_equal(snap.u.z[:], s.u.z[2]) and np.array_equal(snap.E.y[:], s.E.y[2])
+    assert all(f.endswith("_00001000.h5") for f in opened)
+    #the energy distribution only reads this dump's
+    opened.clear()
+    grid, pdf, dlne = s.energy_at(2)
+    opened.clear()
+    assert np.isclose(snap.T, np.nansum(grid*pdf*dlne)) and np.array_equal(snap.energy_pdf, pdf)
+    assert opened==["etx1_00001000.h5"] and "energy" not in s.__dict__
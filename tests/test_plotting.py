@@ -0,0 +1,217 @@
+import os
+import pytest
+from os.path import dirname
+import numpy as np
+from pysim.plotting import rms_current
+
+def test_rms_current_reads_a_batch_at_a_time(simulation, monkeypatch):
+    indices = list(range(len(simulation.B)))
+    expected = np.sqrt(np.mean(np.square(simulation.B.curlz(item=indices)), axis=(-2, -1)))
+    curlz, asked = simulation.B.curlz, []
+    monkeypatch.setattr(simulation.B, "curlz", lambda item, **kwargs: asked.append(len(item)) or curlz(item=item, **kwargs))
+    assert np.allclose(rms_current(simulation, indices, batch=4), expected)
+    assert asked==[4, 2]
+    assert len(rms_current(simulation, [])) == 0
+
+def test_monitor_never_deletes_a_video_it_did_not_make(simulation, tmp_path):
+    import json
+    from pysim.plotting import Monitor
+    outdir = str(tmp_path / "monitor")
+    first = Monitor(simulation, outdir=outdir)
+    #someone's finished movie at the same path
+    with open(first.video, 'wb') as file: file.write(b"finished movie")
+    with pytest.raises(FileExistsError): Monitor(simulation, outdir=outdir)
+    os.makedirs(dirname(first.state_file), exist_ok=True)
+    for broken in ["{", json.dumps({"version": 0, "video": first.video, "iterations": [], "tracks": {"Jz": []}})]:
+        with open(first.state_file, 'w') as file: file.write(broken)
+        with pytest.raises(FileExistsError): Monitor(simulation, outdir=outdir)
+    with open(first.video, 'rb') as file: assert file.read()==b"finished movie"
+    #a state that vouches for the video picks up where it left off
+    first.state["iterations"] = [0, 500]
+    first._save()
+    assert len(Monitor(simulation, outdir=outdir))==2
+    assert not any(f.endswith(".tmp") for f in os.listdir(dirname(first.state_file)))
+    #starting over has to be asked for
+    assert len(Monitor(simulation, outdir=outdir, reset=True))==0 and not os.path.exists(first.video)
+
+def loop_block_reduce(image: np.ndarray, fx: int, fy: int, method: str) -> np.ndarray:
+    out = np.empty((image.shape[0]//fx, image.shape[1]//fy))
+    for i, j in np.ndindex(out.shape):
+        block = image[i*fx:(i+1)*fx, j*fy:(j+1)*fy]
+        mean, low, high = block.mean(), block.min(), block.max()
+        out[i, j] = {'mean': mean, 'max': high, 'min': low, 'minmax': high if high - mean >= mean - low else low}[method]
+    return out
+
+@pytest.mark.parametrize("method", ['mean', 'max', 'min', 'minmax'])
+def test_block_reduce(method):
+    from pysim.utils import block_reduce
+    #sides that don't divide evenly, what's left over is dropped
+    stack = np.random.default_rng(4).lognormal(size=(3, 37, 22))
+    for factor, (fx, fy) in [(1, (1, 1)), (2, (2, 2)), (3, (3, 3)), ((4, 2), (4, 2)), ((1, 5), (1, 5))]:
+        reduced = block_reduce(stack, factor, method)
+        assert reduced.shape==(3, 37//fx, 22//fy)
+        for frame, r in zip(stack, reduced): assert np.allclose(r, loop_block_reduce(frame, fx, fy, method))
+        assert np.allclose(block_reduce(stack[1], factor, method), reduced[1])
+    with pytest.raises(ValueError): block_reduce(stack, 2, 'median')
+
+def test_lod_level():
+    from pysim.utils import lod_level
+    for shape in [(4096, 4096), (4096, 1000), (300, 5000), (800, 600), (12, 7)]:
+        for pixels in [(800, 600), (1, 1), (4096, 4096), (333, 2000)]:
+            level = lod_level(shape, pixels)
+            #the coarsest level that still has a cell for every pixel along both axes
+            assert all(n // 2**level >= p for n, p in zip(shape, pixels)) or level==0
+            assert not all(n / 2**(level+1) >= p for n, p in zip(shape, pixels))
+    assert lod_level((4096, 4096), (800, 600))==2 and lod_level((800, 600), (800, 600))==0 and lod_level((100, 100), (800, 600))==0
+
+def test_previews_are_block_means(simulation):
+    field = simulation.B.x
+    frame = field[3].astype(np.float64)
+    for level in [1, 2, 3]:
+        preview = field.preview(3, level)
+        assert np.allclose(preview, loop_block_reduce(frame, 2**level, 2**level, 'mean'), atol=1e-6)
+        assert field.preview(3, level) is preview and field.pyramid(3).level(level) is preview
+    assert np.allclose(field.preview(3, 1, 'max'), loop_block_reduce(frame, 2, 2, 'max'))
+    assert np.array_equal(field.pyramid(3).level(0), frame)
+
+def drawn(ax, nx: int, ny: int, dx: float = 1., dy: float = 1.) -> np.ndarray:
+    """paint every image on the axes back into one array at the cells its extent covers"""
+    images = ax.get_images()
+    left, bottom = min(i.get_extent()[0] for i in images), min(i.get_extent()[2] for i in images)
+    tiles = {(round((i.get_extent()[0] - left)/(nx*dx)), round((i.get_extent()[2] - bottom)/(ny*dy))): i for i in images}
+    assert len(tiles)==len(images)
+    mx, my = np.asarray(images[0].get_array()).T.shape
+    canvas = np.full((mx*(1 + max(a for a, _ in tiles)), my*(1 + max(b for _, b in tiles))), np.nan)
+    for (a, b), image in tiles.items(): canvas[a*mx:(a+1)*mx, b*my:(b+1)*my] = np.asarray(image.get_array()).T
+    return canvas
+
+def test_periodic_tiling_matches_np_tile():
+    import matplotlib.pyplot as plt
+    from pysim.plotting import show, tile
+    from pysim.utils import block_reduce
+    field = np.random.default_rng(6).normal(size=(40, 24))
+    assert np.array_equal(tile(field), np.tile(field, (3, 3)))
+    fig, ax = plt.subplots(figsize=(10, 10), dpi=100)
+    try:
+        show(field, tile_image=True, fig=fig, ax=ax, colorbar=False, lod=None)
+        assert len(ax.get_images())==9 and np.array_equal(drawn(ax, 40, 24), np.tile(field, (3, 3)))
+        assert ax.get_xlim()==(-0.5, 3*40 - 0.5) and ax.get_ylim()==(-0.5, 3*24 - 0.5)
+    finally: plt.close(fig)
+    #a big tiled field on a small figure is drawn at a coarser level, every tile the same block means
+    big = np.random.default_rng(7).normal(size=(512, 384))
+    fig, ax = plt.subplots(figsize=(2, 2), dpi=100)
+    try:
+        show(big, tile_image=True, fig=fig, ax=ax, colorbar=False, x=np.arange(512)*0.5, y=np.arange(384)*0.5)
+        coarse = np.asarray(ax.get_images()[0].get_array()).T
+        level = round(np.log2(512 / coarse.shape[0]))
+        assert level > 0 and np.allclose(coarse, block_reduce(big, 2**level))
+        assert np.allclose(drawn(ax, 512, 384, 0.5, 0.5), np.tile(block_reduce(big, 2**level), (3, 3)))
+        assert np.allclose(ax.get_images()[4].get_extent(), [-0.25 + 256, -0.25 + 512, -0.25 + 192, -0.25 + 384])
+    finally: plt.close(fig)
+
+class StubWriter:
+    """stands in for moviepy's ffmpeg writer, keeping every frame it's given"""
+    writers: list = []
+    def __init__(self, file: str, size: tuple, fps: int, **kwargs) -> None:
+        self.file, self.size, self.fps, self.frames, self.closed = file, size, fps, [], False
+        StubWriter.writers.append(self)
+    def write_frame(self, image: np.ndarray) -> None:
+        assert image.shape==(self.size[1], self.size[0], 3) and image.dtype==np.uint8
+        self.frames.append(np.array(image))
+    def close(self) -> None: self.closed = True
+
+@pytest.fixture
+def encoder(monkeypatch) -> list:
+    import moviepy.video.io.ffmpeg_writer
+    StubWriter.writers = []
+    monkeypatch.setattr(moviepy.video.io.ffmpeg_writer, "FFMPEG_VideoWriter", StubWriter)
+    return StubWriter.writers
+
+class IndexRenderer:
+    """renders each frame as an image filled with whatever it's given, and notes which process drew it"""
+    def render(self, frame) -> np.ndarray:
+        return np.full((6, 8, 3), np.mean(frame) + 10*(os.getpid()!=parent), dtype=np.uint8)
+parent = os.getpid()
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_movie_frames_are_written_in_order(encoder, workers):
+    from pysim.plotting import write_movie
+    indices = [5, 0, 3, 3, 8, 1, 7, 2, 6]
+    assert write_movie(IndexRenderer, indices, "movie.mp4", fps=7, workers=workers)=="movie.mp4"
+    [writer] = encoder
+    assert writer.closed and writer.size==(8, 6) and writer.fps==7 and writer.file=="movie.mp4"
+    drawn = [int(f[0, 0, 0]) for f in writer.frames]
+    #more than one worker draws in other processes, and still every frame comes out in order
+    assert [d % 10 for d in drawn]==indices and all((d >= 10)==(workers > 1) for d in drawn)
+
+def test_render_movie_streams_frames(encoder, simulation, monkeypatch):
+    from pysim.plotting import render_movie, FrameRenderer
+    from matplotlib.colors import Normalize
+    field = simulation.B.x
+    norm = Normalize(0, 1)
+    expected = [FrameRenderer(field.shape, norm=norm).render(field[i]) for i in range(len(field))]
+    #only the frames that are drawn are read, one at a time (and the first for its shape)
+    read, _read = [], field._read
+    monkeypatch.setattr(field, "_read", lambda i, region=(): read.append(i) or _read(i, region))
+    render_movie(field, "B.mp4", compress=2, workers=1, norm=norm)
+    assert read==[0, 0, 2, 4] and len(encoder[0].frames)==3
+    assert all(np.array_equal(a, expected[i]) for a, i in zip(encoder[0].frames, [0, 2, 4]))
+    render_movie(np.array([field[i] for i in range(len(field))]), "B.mp4", workers=3, norm=norm)
+    assert len(encoder[1].frames)==6 and all(np.array_equal(a, b) for a, b in zip(encoder[1].frames, expected))
+
+def test_field_movies(encoder, simulation, tmp_path):
+    from pysim.plotting import auto_norm, FrameRenderer
+    field = simulation.B.x
+    field.movie(savedir=str(tmp_path), workers=2, preview=1, norm='linear')
+    [writer] = encoder
+    assert writer.file==f"{tmp_path}/{simulation.name}_{field.name}.mp4" and writer.closed
+    #every preview drawn in order on the full frame's axes with one color scale for the whole run
+    renderer = FrameRenderer((16, 12), norm=auto_norm('linear', field), title=field.latex, extent=(0, 32, 0, 24))
+    assert len(writer.frames)==len(field)
+    assert all(np.array_equal(a, renderer.render(field.preview(i, 1))) for i, a in enumerate(writer.frames))
+
+def on_spines(renderer, shape: tuple, width: float = 3.) -> np.ndarray:
+    """which pixels of a rendered image are within width of the edges of the axes"""
+    rows, cols = np.indices(shape[:2])
+    y, near = shape[0] - rows, np.zeros(shape[:2], dtype=bool)
+    for ax in renderer.axes.values():
+        x0, y0, w, h = ax.get_window_extent().bounds
+        inside_x, inside_y = (cols > x0 - width) & (cols < x0 + w + width), (y > y0 - width) & (y < y0 + h + width)
+        near |= inside_y & ((np.abs(cols - x0) < width) | (np.abs(cols - x0 - w) < width))
+        near |= inside_x & ((np.abs(y - y0) < width) | (np.abs(y - y0 - h) < width))
+    return near
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_diagnostic_movies(encoder, simulation, workers):
+    from pysim.plotting import DiagnosticRenderer, render_diagnostics
+    times, track = np.arange(6)*0.3, np.linspace(1, 2, 6)
+    indices = [4, 1, 5, 0]
+    render_diagnostics(simulation, "diag.mp4", indices=indices, tracks=[track], times=times, workers=workers, figsize=(4, 4), dpi=60)
+    [writer] = encoder
+    assert writer.closed and len(writer.frames)==len(indices)
+    assert len({f.tobytes() for f in writer.frames})==len(indices)
+    #the figure is built once and every frame only redraws what changes, which has to look like building the whole
+    #figure for that dump, short of antialiasing where the spines (drawn again every frame) cross what's around them
+    fresh = DiagnosticRenderer(simulation, tracks=[track], times=times, figsize=(4, 4), dpi=60, blit=False)
+    spines = on_spines(fresh, writer.frames[0].shape)
+    for i, frame in zip(indices, writer.frames):
+        different = np.any(frame!=fresh.render(i), axis=-1)
+        assert not np.any(different & ~spines) and np.sum(different) < 40
+
+def test_diagnostic_renderer_follows_the_dump(simulation, tmp_path):
+    from pysim.plotting import DiagnosticRenderer, diagnose_frame
+    times, track = np.arange(6)*0.3, np.linspace(1, 2, 6)
+    renderer = DiagnosticRenderer(simulation, tracks=[track], times=times, figsize=(4, 4), dpi=60)
+    figures = len(renderer.fig.axes)
+    for i in [3, 0, 5]:
+        image = renderer.render(i)
+        assert image.shape==(240, 240, 3)
+        assert np.array_equal(renderer.density.get_array(), simulation.density[i].T)
+        assert np.array_equal(renderer.Bz.get_array(), simulation.B.z[i].T)
+        E, fE, _ = simulation.energy_at(i)
+        assert np.allclose(renderer.eline.get_xdata(), E) and np.allclose(renderer.eline.get_ydata(), E*fE)
+        assert np.allclose(renderer.marker.get_offsets(), [[times[i], track[i]]]) and renderer.title.get_text()==rf"$\tau$ = {times[i]:.2f}"
+    #nothing new is added to the figure frame after frame
+    assert len(renderer.fig.axes)==figures
+    diagnose_frame(simulation, 2, "", full_path=str(tmp_path / "diag.png"), track_params=[track], times=times)
+    assert os.path.getsize(tmp_path / "diag.png") > 0
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from pysim.reductions import (
+    reduce_frames, as_reducer, sample_quantile, Moments, FrameStats, Percentile, Histogram, Histogram2D, ConditionalStats
+)
+
+@pytest.fixture
+def frames():
+    #spread over several orders of magnitude, with nans and infs that everything should skip
+    frames = np.random.default_rng(2).lognormal(0, 2, size=(7, 20, 30)) - 3
+    frames[0, :3, :4] = np.nan
+    frames[3, 5, :] = np.inf
+    frames[6, :, 0] = np.nan
+    return frames
+
+def finite(frames: np.ndarray) -> np.ndarray: return frames[np.isfinite(frames)]
+
+def test_per_frame(frames):
+    clean = np.where(np.isfinite(frames), frames, np.nan)
+    result = reduce_frames(iter(clean), 'mean', 'std', 'rms', 'min', 'max', 'sum', 'median', Percentile(90), np.nanmax)
+    axes = (1, 2)
+    assert np.allclose(result['mean'], np.nanmean(clean, axis=axes))
+    assert np.allclose(result['std'], np.nanstd(clean, axis=axes))
+    assert np.allclose(result['rms'], np.sqrt(np.nanmean(clean**2, axis=axes)))
+    assert np.allclose(result['min'], np.nanmin(clean, axis=axes))
+    assert np.allclose(result['max'], np.nanmax(clean, axis=axes))
+    assert np.allclose(result['sum'], np.nansum(clean, axis=axes))
+    assert np.allclose(result['median'], np.nanmedian(clean, axis=axes))
+    assert np.allclose(result['p90'], np.nanpercentile(clean, 90, axis=axes))
+    assert np.array_equal(result['nanmax'], result['max'])
+
+def test_over_time(frames):
+    clean = np.where(np.isfinite(frames), frames, np.nan)
+    result = reduce_frames(iter(frames), 'time_mean', 'time_var', 'time_std', 'time_min', 'time_max')
+    assert np.allclose(result['time_mean'], np.nanmean(clean, axis=0))
+    assert np.allclose(result['time_var'], np.nanvar(clean, axis=0))
+    assert np.allclose(result['time_std'], np.nanstd(clean, axis=0))
+    #extrema only skip nans, infs are real extremes
+    assert np.array_equal(result['time_min'], np.nanmin(frames, axis=0), equal_nan=True)
+    assert np.array_equal(result['time_max'], np.nanmax(frames, axis=0), equal_nan=True)
+
+def test_moments(frames):
+    values = finite(frames)
+    result = reduce_frames(iter(frames), Moments(ddof=1))['moments']
+    assert result['count']==values.size
+    assert np.isclose(result['mean'], values.mean()) and np.isclose(result['var'], values.var(ddof=1))
+    assert result['min']==values.min() and result['max']==values.max()
+    #summing a large offset frame by frame mustn't lose the variance
+    shifted = reduce_frames(iter(frames + 1e8), 'moments')['moments']
+    assert np.isclose(shifted['var'], values.var(), rtol=1e-6)
+
+def test_frame_stats(frames):
+    values = finite(frames)
+    exact = reduce_frames(iter(frames), FrameStats(sample=values.size))['frame_stats']
+    assert exact['rank_error']==0 and np.array_equal(exact['sample'], np.sort(values))
+    assert np.isclose(sample_quantile(exact, 0.9), np.quantile(values, 0.9))
+    assert exact['positive_min']==values[values > 0].min()
+    sampled = reduce_frames(iter(frames), FrameStats(sample=512))['frame_stats']
+    assert sampled['sample'].size==512 and 0 < sampled['rank_error'] < 0.1
+    #a quantile of the sample is within rank_error (in rank) of the true one
+    for q in [0.01, 0.5, 0.99]: assert abs(np.mean(values <= sample_quantile(sampled, q)) - q) <= sampled['rank_error']
+    assert np.isclose(sampled['mean'], values.mean())
+    again = reduce_frames(iter(frames), FrameStats(sample=512))['frame_stats']
+    assert np.array_equal(again['sample'], sampled['sample'])
+    assert np.isnan(sample_quantile(reduce_frames([], 'frame_stats')['frame_stats'], 0.5))
+
+def test_histograms(frames):
+    values = finite(frames)
+    edges = np.linspace(-3, 20, 24)
+    result = reduce_frames(iter(frames), Histogram(edges), Histogram(10, range=(-3, 20), name="uniform"))
+    inside = values[(values >= -3) & (values <= 20)]
+    assert np.array_equal(result['histogram']['counts'], np.histogram(inside, edges)[0])
+    assert np.array_equal(result['uniform']['counts'], np.histogram(inside, 10, range=(-3, 20))[0])
+    pairs = [(f, np.sin(np.where(np.isfinite(f), f, np.nan))) for f in frames]
+    joint = reduce_frames(pairs, Histogram2D((8, 5), range=((-3, 20), (-1, 1))))['histogram2d']
+    x, y = np.concatenate([np.ravel(p[0]) for p in pairs]), np.concatenate([np.ravel(p[1]) for p in pairs])
+    assert np.array_equal(joint['counts'], np.histogram2d(x[np.isfinite(x)], y[np.isfinite(x)], (8, 5), range=((-3, 20), (-1, 1)))[0])
+
+def test_conditional_stats(frames):
+    x = np.where(np.isfinite(frames), frames, 0)
+    y = 2*x + np.random.default_rng(3).normal(size=x.shape)
+    edges = np.array([-3, -2, 0, 1, 5, 50])
+    result = reduce_frames(zip(x, y), ConditionalStats(edges))['conditional']
+    flat_x, flat_y = x.ravel(), y.ravel()
+    for k in range(len(edges) - 1):
+        inside = (flat_x >= edges[k]) & ((flat_x < edges[k+1]) | ((k==len(edges)-2) & (flat_x==edges[-1])))
+        assert result['count'][k]==inside.sum()
+        assert np.isclose(result['mean'][k], flat_y[inside].mean()) and np.isclose(result['std'][k], flat_y[inside].std())
+    assert result['outliers']==np.sum((flat_x < -3) | (flat_x > 50))
+
+def test_fields_stream_the_same(simulation):
+    B = simulation.B
+    stack = np.array([B.x[i] for i in range(len(B.x))], dtype=np.float64)
+    for batch in [None, 4]:
+        result = B.x.reduce('mean', 'time_mean', 'time_max', 'moments', batch=batch)
+        assert np.allclose(result['mean'], stack.mean(axis=(1, 2)))
+        assert np.allclose(result['time_mean'], stack.mean(axis=0))
+        assert np.array_equal(result['time_max'], stack.max(axis=0))
+        assert np.isclose(result['moments']['std'], stack.std())
+
+def test_as_reducer():
+    with pytest.raises(KeyError): as_reducer("nope")
+    with pytest.raises(TypeError): as_reducer(3)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from pysim.dhybridr.dhybridr import dHybridR
+
+regions = [
+    (slice(None), slice(None)),
+    (3,),
+    (-1, slice(None)),
+    (slice(2, 20, 3), 5),
+    (slice(None, None, -1), slice(4, None)),
+    (slice(-5, None), slice(None, -3)),
+    (slice(25, 3, -4), slice(None, None, -2)),
+    (slice(-2, -20, -3), -7),
+    ([0, 5, -1, 5], slice(1, 9, 2)),
+    (slice(10, 10), slice(None)),
+]
+#regions taken from views, relative to the view
+subregions = [(slice(None),), (2, slice(None, None, -1)), (slice(1, None, 2), [0, -1]), (slice(-3, None), 1)]
+
+@pytest.fixture(params=["dumps", "store"])
+def field(simulation, request):
+    if request.param=="dumps": return simulation.B.y
+    simulation.compress()
+    return dHybridR(simulation.path, compressed=True, verbose=False).B.y
+
+@pytest.mark.parametrize("region", regions)
+def test_region_reads(field, region):
+    full = field[2]
+    assert full.shape==(32, 24)
+    assert np.array_equal(field[(2, *region)], full[region])
+    assert np.array_equal(field[(slice(1, 4), *region)], np.array([field[i][region] for i in range(1, 4)]))
+    assert np.array_equal(field.read_batch([4, 0], region=region, workers=2), np.array([field[4][region], field[0][region]]))
+    #a view only reads its region, indexing it is relative to that region
+    view = field.view(*region)
+    assert np.array_equal(view[2], full[region]) and np.array_equal(view[:], np.array([field[i][region] for i in range(len(field))]))
+    for sub in subregions:
+        if view[2].ndim < len(sub) or (view[2].size==0 and not all(isinstance(s, slice) for s in sub)): continue
+        assert np.array_equal(view[(2, *sub)], full[region][sub])
+        assert np.array_equal(view.view(*sub)[1], field[1][region][sub])
+
+def test_out_of_bounds(field):
+    with pytest.raises(IndexError): field[0, 32]
+    with pytest.raises(IndexError): field[0, 0, -25]
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from conftest import make_simulation
+from pysim.utils import kspec1d, kspec2d
+from pysim.dhybridr.dhybridr import dHybridR
+
+def modes(shape: tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """the full plane fft amplitudes' wavenumbers, in modes per box"""
+    kx, ky = np.meshgrid(np.fft.fftfreq(shape[0])*shape[0], np.fft.fftfreq(shape[1])*shape[1], indexing='ij')
+    return kx, ky, np.hypot(kx, ky)
+
+def in_bins(amplitude: np.ndarray, masks: list) -> tuple[np.ndarray, np.ndarray]:
+    ks = np.array([np.mean(amplitude[m]) if m.any() else np.nan for m in masks])
+    kerr = np.array([np.std(amplitude[m])/np.sqrt(m.sum()) if m.any() else np.nan for m in masks])
+    return ks, kerr
+
+def log_masks(kmag: np.ndarray, bins: int) -> tuple[np.ndarray, list]:
+    """the log spaced |k| bin edges and one mask per bin, k=0 left out and the largest |k| in the last bin"""
+    kgrid = np.logspace(np.log10(np.min(kmag[kmag!=0])), np.log10(np.max(kmag)), bins + 1)
+    return kgrid, [(kmag!=0) & (kgrid[i] <= kmag) & ((kmag < kgrid[i+1]) | (i==bins-1)) for i in range(bins)]
+
+def loop_kspec1d(image: np.ndarray, bins: int) -> tuple:
+    amplitude = np.abs(np.fft.fft2(image)) / image.size
+    kgrid, masks = log_masks(modes(image.shape)[2], bins)
+    return ((kgrid[1:] + kgrid[:-1])/2, *in_bins(amplitude, masks))
+
+def loop_kspec2d(image: np.ndarray, direction: tuple, bins: int) -> tuple:
+    """every mode of the full fft2 put in its linear (k_par, k_perp) bin one at a time"""
+    amplitude = np.abs(np.fft.fft2(image)) / image.size
+    kx, ky, kmag = modes(image.shape)
+    b = np.array([*direction, 0, 0][:3], dtype=float)
+    b /= np.linalg.norm(b)
+    width = np.max(kmag) / bins
+    binned = [[[] for _ in range(bins)] for _ in range(bins)]
+    for i, j in np.ndindex(image.shape):
+        if kmag[i, j]==0: continue
+        kpar = abs(kx[i, j]*b[0] + ky[i, j]*b[1])
+        kperp = np.sqrt((kx[i, j]*b[2])**2 + (ky[i, j]*b[2])**2 + (kx[i, j]*b[1] - ky[i, j]*b[0])**2)
+        binned[min(int(kpar // width), bins - 1)][min(int(kperp // width), bins - 1)].append(amplitude[i, j])
+    ks = np.array([[np.mean(a) if a else np.nan for a in row] for row in binned])
+    kerr = np.array([[np.std(a)/np.sqrt(len(a)) if a else np.nan for a in row] for row in binned])
+    centers = (np.arange(bins) + 0.5)*width
+    return centers, centers, ks, kerr
+
+def waves(shape: tuple, waves: dict) -> np.ndarray:
+    """a sum of amplitude*cos(2 pi (m x/nx + n y/ny) + phase) for every (m, n): (amplitude, phase)"""
+    x, y = np.meshgrid(np.arange(shape[0]), np.arange(shape[1]), indexing='ij')
+    return sum(a*np.cos(2*np.pi*(m*x/shape[0] + n*y/shape[1]) + p) for (m, n), (a, p) in waves.items())
+
+#square, and not square with odd and even sides so the real fft's dropped half and nyquist modes both show
+shapes = [(32, 32), (48, 20), (27, 16), (20, 33)]
+
+@pytest.mark.parametrize("shape", shapes)
+def test_kspec1d_matches_a_loop_over_bins(shape):
+    image = np.random.default_rng(1).normal(size=(3, *shape))
+    for bins in [8, 30]:
+        k, ks, kerr = kspec1d(image, bins=bins)
+        assert ks.shape==kerr.shape==(3, bins)
+        for frame, a, e in zip(image, ks, kerr):
+            k0, a0, e0 = loop_kspec1d(frame, bins)
+            assert np.allclose(k, k0) and np.allclose(a, a0, equal_nan=True) and np.allclose(e, e0, equal_nan=True)
+    #one frame on its own is the same as in a stack
+    assert np.allclose(kspec1d(image[1], bins=8)[1], kspec1d(image, bins=8)[1][1], equal_nan=True)
+
+@pytest.mark.parametrize("shape", shapes)
+def test_kspec1d_of_known_waves(shape):
+    known = {(1, 0): (2., 0.), (3, 2): (0.5, 1.), (0, shape[1]//2 - 1): (1.5, -0.4)}
+    _, ks, _ = kspec1d(waves(shape, known), bins=12)
+    _, masks = log_masks(modes(shape)[2], 12)
+    counts = np.array([np.sum(m) for m in masks])
+    #every wave puts half its amplitude in each of its two modes and nothing anywhere else
+    assert np.isclose(np.nansum(ks*counts), sum(a for a, _ in known.values()))
+    for (m, n), (a, _) in known.items():
+        assert np.isclose(ks[i:=[mask[m, n] for mask in masks].index(True)]*counts[i], a)
+
+@pytest.mark.parametrize("shape", shapes)
+@pytest.mark.parametrize("direction", [(1, 0), (0, 1), (1, 1), (0.3, -2, 0.5)])
+def test_kspec2d_matches_a_loop_over_bins(shape, direction):
+    image = np.random.default_rng(2).normal(size=(2, *shape))
+    kpar, kperp, ks, kerr = kspec2d(image, direction, bins=7)
+    assert ks.shape==kerr.shape==(2, 7, 7)
+    for frame, a, e in zip(image, ks, kerr):
+        kpar0, kperp0, a0, e0 = loop_kspec2d(frame, direction, 7)
+        assert np.allclose(kpar, kpar0) and np.allclose(kperp, kperp0)
+        assert np.allclose(a, a0, equal_nan=True) and np.allclose(e, e0, equal_nan=True)
+
+def test_kspec2d_of_waves_along_and_across_the_field():
+    #|k| goes up to hypot(24, 10) = 26, so each bin is 26/6 wide
+    shape = (48, 20)
+    for wave, along, across in [((12, 0), 2, 0), ((0, 5), 0, 1), ((-9, 9), 2, 2)]:
+        _, _, ks, _ = kspec2d(waves(shape, {wave: (1., 0.3)}), (1, 0), bins=6)
+        assert np.nanargmax(ks)==along*6 + across and np.nansum(ks > 1e-12)==1
+def test_field_spectrum(tmp_path):
+    #a grid that isn't square with dx != dy, the spectrum is in modes per box so neither spacing changes it
+    path = make_simulation(str(tmp_path / "sim"), Nx=32, Ny=20)
+    with open(f"{path}/input/input", 'r') as file: text = file.read()
+    with open(f"{path}/input/input", 'w') as file: file.write(text.replace("boxsize(1:2)=512.,512.", "boxsize(1:2)=512.,160."))
+    s = dHybridR(path, verbose=False)
+    assert s.dx!=s.dy
+    frames = np.array([s.B.x[i] for i in range(len(s.B.x))])
+    assert frames.shape==(6, 32, 20)
+    k, ks, kerr = s.B.x.spectrum(bins=10, batch=4)
+    assert ks.shape==kerr.shape==(6, 10)
+    for frame, a, e in zip(frames, ks, kerr):
+        k0, a0, e0 = loop_kspec1d(frame, 10)
+        assert np.allclose(k, k0) and np.allclose(a, a0, equal_nan=True) and np.allclose(e, e0, equal_nan=True)
+    k, one, err = s.B.x.spectrum(3, bins=10)
+    assert np.allclose(one, ks[3], equal_nan=True) and np.allclose(err, kerr[3], equal_nan=True)
+    #anisotropic spectra relative to a fixed direction or the mean of a vector field
+    kpar, kperp, ks, kerr = s.B.x.spectrum([1, 4], bins=5, direction=(1, 2))
+    assert ks.shape==(2, 5, 5)
+    for i, a in zip([1, 4], ks): assert np.allclose(a, loop_kspec2d(frames[i], (1, 2), 5)[2], equal_nan=True)
+    mean = [np.mean([c[i] for i in range(6)]) for c in s.B.components]
+    _, _, ks, _ = s.B.x.spectrum(bins=5, direction=s.B)
+    for frame, a in zip(frames, ks): assert np.allclose(a, loop_kspec2d(frame, mean, 5)[2], equal_nan=True)
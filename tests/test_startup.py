@@ -0,0 +1,30 @@
+import sys
+import json
+import subprocess
+from os.path import dirname, abspath
+
+#import pysim used to take ~1.2 s, mostly matplotlib, moviepy and scipy
+budget = 1.0
+heavy = ("matplotlib", "moviepy", "scipy")
+
+def fresh_import(after: str = "") -> dict:
+    #a new interpreter so nothing is already imported
+    code = "\n".join([
+        "import sys, time, json",
+        f"sys.path.insert(0, {dirname(abspath(__file__))!r})",
+        "start = time.perf_counter()",
+        "import conftest",
+        "seconds = time.perf_counter() - start",
+        "import pysim",
+        after,
+        f"print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))"
+    ])
+    return json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+
+def test_import_is_light():
+    result = fresh_import()
+    assert result["loaded"]==[]
+    assert result["seconds"] < budget
+
+def test_plotting_loads_on_first_use():
+    assert fresh_import("pysim.show")["loaded"]==["matplotlib"]
@@ -0,0 +1,60 @@
+import numpy as np
+import h5py
+import pytest
+from os.path import basename
+from conftest import outputs
+from pysim.dhybridr.dhybridr import dHybridR
+from pysim.store import compress_output
+
+def scalars(s: dHybridR) -> dict:
+    return {
+        "Bx": s.B.x, "By": s.B.y, "Bz": s.B.z, "Ex": s.E.x, "Ey": s.E.y, "Ez": s.E.z,
+        "ux": s.u.x, "uy": s.u.y, "uz": s.u.z, "density": s.density, "etx1": s.etx1
+    }
+
+@pytest.fixture
+def pair(simulation):
+    simulation.compress()
+    return simulation, dHybridR(simulation.path, compressed=True, verbose=False)
+
+def test_same_frames(pair):
+    s, c = pair
+    for name, (plain, packed) in zip(scalars(s), zip(scalars(s).values(), scalars(c).values())):
+        assert len(packed)==len(plain) and packed.shape==plain.shape, name
+        assert np.array_equal(packed.iterations, plain.iterations), name
+        assert [basename(f) for f in packed.file_names]==[basename(f) for f in plain.file_names], name
+        for i in range(len(plain)): assert np.array_equal(packed[i], plain[i]), name
+    assert np.array_equal(c.B[2], s.B[2])
+
+def test_same_reads(pair):
+    s, c = pair
+    assert np.array_equal(c.B.x[1:5], s.B.x[1:5])
+    assert np.array_equal(c.B.x.read_batch([5, 0, 3], workers=3), s.B.x.read_batch([5, 0, 3]))
+    assert np.array_equal(c.B.x[2, 3:10, ::2], s.B.x[2, 3:10, ::2])
+    assert np.array_equal(c.B.x.view(slice(4, 20), 7)[:], s.B.x.view(slice(4, 20), 7)[:])
+    assert np.array_equal(list(c.E.y.prefetch(processes=True)), list(s.E.y.prefetch()))
+    assert np.allclose(c.B.curlz(), s.B.curlz())
+
+def test_packing_is_incremental(pair):
+    s, c = pair
+    assert compress_output(s.outputDir.path)==s.outputStore.path
+    with h5py.File(s.outputStore.path, 'r') as store: assert store["Fields/Magnetic/Total/x/DATA"].shape[0]==len(c.B.x)
+    #a new dump is appended, not repacked, and a refresh picks it up
+    new = np.arange(32*24, dtype=np.float32).reshape(24, 32)
+    for folder, stem in outputs.items():
+        if stem=="etx1": continue
+        with h5py.File(f"{s.outputDir.path}/{folder}/{stem}_{str(3000).zfill(8)}.h5", "w") as file:
+            file["DATA"] = new
+            file["AXIS/X1 AXIS"], file["AXIS/X2 AXIS"] = np.array([0., 16.]), np.array([0., 12.])
+    s.compress()
+    assert c.refresh()==1
+    assert c.B.x.iterations[-1]==3000
+    assert np.array_equal(c.B.x[-1], new.T)
+
+@pytest.mark.parametrize("kwargs", [{'compression': None}, {'compression': 'lzf', 'chunk': 8}])
+def test_store_options(simulation, tmp_path, kwargs):
+    store = compress_output(simulation.outputDir.path, str(tmp_path / "store.h5"), **kwargs)
+    with h5py.File(store, 'r') as f:
+        assert f["Fields/Magnetic/Total/x/DATA"].compression==kwargs['compression']
+        packed = f["Fields/Magnetic/Total/x/DATA"][:]
+    assert np.array_equal(packed, simulation.B.x[:])
@@ -0,0 +1,42 @@
+import sys
+import numpy as np
+import pytest
+from scipy.io import FortranFile
+from pysim.dhybridr.unformatted import write_unformatted, write_unformatted_fields, read_unformatted, check_init_field, record_segments
+
+@pytest.fixture
+def field():
+    return np.random.default_rng(1).normal(size=(3, 24, 40)).astype(np.float32)
+
+def scipy_written(path: str, field: np.ndarray) -> bytes:
+    with FortranFile(path, 'w') as file: file.write_record(field.T)
+    with open(path, 'rb') as file: return file.read()
+
+@pytest.mark.parametrize("chunk_bytes", [1, 1000, 2**26])
+def test_matches_fortranfile(tmp_path, field, chunk_bytes):
+    expected = scipy_written(str(tmp_path / "scipy"), field)
+    with open(write_unformatted(str(tmp_path / "ours"), field, chunk_bytes=chunk_bytes), 'rb') as file: assert file.read()==expected
+
+def test_round_trip(tmp_path, field):
+    paths = write_unformatted_fields({str(tmp_path / "B"): field, str(tmp_path / "u"): 2*field}, chunk_bytes=1000)
+    assert np.array_equal(read_unformatted(paths[0], field.shape), field)
+    assert np.array_equal(read_unformatted(paths[1], field.shape), 2*field)
+    with FortranFile(paths[0], 'r') as file: assert np.array_equal(file.read_record(np.float32).reshape(field.shape[::-1]).T, field)
+    checks = check_init_field(paths[0], field.shape, chunk=7)
+    assert checks['finite']
+    assert np.allclose(checks['mean'], field.mean(axis=(1, 2)), atol=1e-6)
+    assert np.allclose(checks['rms'], np.sqrt(np.square(field, dtype=np.float64).mean(axis=(1, 2))))
+
+def test_subrecords(tmp_path, field, monkeypatch):
+    #records over max_subrecord are split the way gfortran splits records over 2GiB
+    monkeypatch.setattr(sys.modules["pysim.dhybridr.unformatted"], "max_subrecord", 1000)
+    path = write_unformatted(str(tmp_path / "split"), field, chunk_bytes=300)
+    segments = record_segments(path)
+    assert [n for _, n in segments]==[1000]*(field.nbytes//1000) + [field.nbytes % 1000]
+    assert np.array_equal(read_unformatted(path, field.shape), field)
+    with pytest.raises(ValueError): read_unformatted(path, (3, 24, 39))
+
+def test_truncated(tmp_path, field):
+    path = write_unformatted(str(tmp_path / "B"), field)
+    with open(path, 'rb+') as file: file.truncate(field.nbytes)
+    with pytest.raises(ValueError): read_unformatted(path, field.shape)
@@ -1,18 +1,64 @@
 import numpy as np
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from collections import deque
+from itertools import islice
+from functools import lru_cache
 from tqdm import tqdm
 import inspect
+import multiprocessing
+
+def bin_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    which bin every value falls in, bin i covers edges[i] <= v < edges[i+1] and the last bin includes its upper edge
+    :param values: np.ndarray: the values to bin
+    :param edges: np.ndarray: the (increasing) bin edges
+    :return: np.ndarray: the flattened bin of every value, len(edges)-1 for anything out of range or nan
+    """
+    values, nbins = np.ravel(values), len(edges) - 1
+    index = np.searchsorted(edges, values, side='right') - 1
+    index[values==edges[-1]] = nbins - 1
+    index[(index < 0) | (index >= nbins) | np.isnan(values)] = nbins
+    return index
+
+def binned_stats(index: np.ndarray, y: np.ndarray, nbins: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the count, mean, and sum of squared deviations of the finite y in each bin, in two bincount passes
+    :param index: np.ndarray: the bin of every value (see bin_index), anything >= nbins is dropped
+    :param y: np.ndarray: the values
+    :param nbins: the number of bins
+    :return: count, mean, m2: (nbins,) arrays, the mean of empty bins is nan
+    """
+    y = np.ravel(y)
+    good = np.isfinite(y)
+    index, y = index[good], y[good]
+    count = np.bincount(index, minlength=nbins+1)[:nbins]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(index, y, minlength=nbins+1)[:nbins] / count
+    #deviations from each bin's own mean so the variance doesn't lose precision
+    m2 = np.bincount(index, (y - np.append(mean, 0)[index])**2, minlength=nbins+1)[:nbins]
+    return count, mean, m2
 
 def bin_this(x, y, n_bins=50, func=np.nanmean):
+    """
+    bin y by x, in one pass over the data rather than one mask per bin
+    :param x: array-like: what to bin by
+    :param y: array-like: what to average (or apply func to) in each bin
+    :param n_bins: the number of bin edges, spaced linearly from the smallest to the largest x
+    :param func: what to do to the y in each bin, nanmean uses bincount and anything else groups the values first
+    :return: xbins, Y, error: the lower edge of each bin, func of the y in it, and the standard error of its mean
+    """
+    x, y = np.ravel(x), np.ravel(y)
     xbins = np.linspace(np.nanmin(x),np.nanmax(x),n_bins)
-    Y,error = list(),list()
-    for i,low_edge in enumerate(xbins[:-1]):
-        high_edge = xbins[i+1]
-        mask = (low_edge<x)&(x<high_edge)
-        yin = y[mask]
-        Y.append(func(yin))
-        error.append(np.nanstd(yin)/np.sqrt(len(yin)))
-    return np.array(xbins)[:-1],np.array(Y),np.array(error)
+    index = bin_index(x, xbins)
+    count, mean, m2 = binned_stats(index, y, n_bins-1)
+    total = np.bincount(index, minlength=n_bins)[:n_bins-1]
+    with np.errstate(invalid='ignore', divide='ignore'): error = np.sqrt(m2/count)/np.sqrt(total)
+    if func is np.nanmean: return xbins[:-1], mean, error
+    #sorting by bin puts every bin's values next to each other
+    order = np.argsort(index, kind='stable')
+    groups = np.split(y[order], np.cumsum(total))[:n_bins-1]
+    return xbins[:-1], np.array([func(yin) for yin in groups]), error
 
 
 @contextmanager
@@ -41,6 +87,37 @@ def progress_bar(iterator, **kwargs):
 def verbose_bar(iterator, verbose, **kwargs):
     return progress_bar(iterator, **kwargs) if verbose else iterator
 
+def read_ahead(tasks, depth: int = 4, workers: int|None = None, processes: bool = False, context: str|None = None):
+    """
+    run tasks in a bounded pool, yielding results in order while keeping up to depth tasks running ahead
+    :param tasks: iterable of (func, *args) tuples, func must be picklable if processes is True. A task with func
+                  None is already done (e.g. a frame found in a cache), its one arg is handed back without the pool
+    :param depth: how many tasks to keep in flight, 0 runs everything serially in this thread
+    :param workers: number of workers in the pool, defaults to depth
+    :param processes: use a process pool instead of a thread pool
+    :param context: the multiprocessing start method for the process pool, e.g. 'fork' so workers inherit globals
+    :return: generator of func(*args) for each task
+    """
+    if depth < 1:
+        for func, *args in tasks: yield args[0] if func is None else func(*args)
+        return None
+    tasks = iter(tasks)
+    if processes: pool = ProcessPoolExecutor(max_workers=workers or depth, mp_context=None if context is None else multiprocessing.get_context(context))
+    else: pool = ThreadPoolExecutor(max_workers=workers or depth)
+    def submit(func, *args) -> Future:
+        if func is not None: return pool.submit(func, *args)
+        (done:=Future()).set_result(args[0])
+        return done
+    pending = deque()
+    try:
+        for task in islice(tasks, depth): pending.append(submit(*task))
+        while pending:
+            result = pending.popleft().result()
+            #top the queue back up before handing the result over so the pool stays busy
+            for task in islice(tasks, 1): pending.append(submit(*task))
+            yield result
+    finally: pool.shutdown(wait=True, cancel_futures=True)
+
 def yesno(prompt: str):
     """
     prompt the user to either reply yes or no
@@ -70,21 +147,161 @@ def nan_clip(*args):
     nanless_args = tuple([np.array(a)[mask] for a in args])
     return nanless_args
 
+# Display Functions
+def block_reduce(image: np.ndarray, factor: int|tuple = 2, method: str = 'mean') -> np.ndarray:
+    """
+    shrink an image by combining factor x factor blocks of pixels into one, what's left over on the far edges
+    (less than a block) is dropped
+    :param image: np.ndarray: (..., x, y) one image or a stack of them
+    :param factor: int | tuple[int, int]: the block size, or one along each axis
+    :param method: str: 'mean', 'max', 'min', or 'minmax', which keeps whichever extreme of each block is furthest
+                   from its mean so thin peaks and troughs survive the way they would in the full image
+    :return: np.ndarray: (..., x // factor, y // factor)
+    """
+    fx, fy = (factor, factor) if isinstance(factor, (int, np.integer)) else factor
+    if fx==fy==1: return image
+    nx, ny = image.shape[-2]//fx, image.shape[-1]//fy
+    blocks = image[..., :nx*fx, :ny*fy].reshape(*image.shape[:-2], nx, fx, ny, fy)
+    match method.lower():
+        case 'mean': return blocks.mean(axis=(-3, -1))
+        case 'max': return blocks.max(axis=(-3, -1))
+        case 'min': return blocks.min(axis=(-3, -1))
+        case 'minmax':
+            mean, low, high = blocks.mean(axis=(-3, -1)), blocks.min(axis=(-3, -1)), blocks.max(axis=(-3, -1))
+            return np.where(high - mean >= mean - low, high, low)
+        case _: raise ValueError(f"method: {method} not available, please choose mean, max, min, or minmax")
+
+def lod_level(shape: tuple, pixels: tuple) -> int:
+    """
+    the coarsest power of 2 downsampling (see block_reduce) of an image which still has at least one cell per pixel
+    :param shape: the (x, y) number of cells being shown
+    :param pixels: the (x, y) number of pixels they're shown on
+    :return: int: the level, the image can be shrunk by 2**level
+    """
+    return max(0, int(np.floor(np.log2(max(1e-9, min(n/max(p, 1) for n, p in zip(shape, pixels)))))))
+
 # Spectrum Functions
 def kspec(image: np.ndarray) -> np.ndarray:
     return np.absolute(np.fft.fftshift(np.fft.fft2(image) / (1. * image.shape[0] * image.shape[1])))
 
-def kspec1d(image: np.ndarray, bins: int = 100) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-    k = kspec(image)
-    Ny, Nx = image.shape
-    kmag = np.hypot(*np.mgrid[
-                     -Ny // 2: Ny // 2,
-                     -Nx // 2: Nx // 2
-                     ][::-1])
-    kmin = np.nanmin(kmag[kmag != 0])
-    kmax = np.nanmax(kmag)
-    kgrid = np.logspace(np.log10(kmin), np.log10(kmax), bins + 1)
-    kx = np.array([np.mean([kgrid[i], kgrid[i+1]]) for i in range(len(kgrid)-1)])
-    ks = np.array([np.mean(k[np.where((kgrid[i] < kmag) & (kmag < kgrid[i+1]))]) for i in range(len(kgrid)-1)])
-    kerr = np.array([np.std(in_bin:=k[np.where((kgrid[i] < kmag) & (kmag < kgrid[i+1]))])/np.sqrt(len(in_bin)) for i in range(len(kgrid)-1)])
-    return kx, ks, kerr
+def rfft_modes(shape: tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the wavenumbers (in modes per box) of the real fft of an image and how many full plane modes each one stands for,
+    the real fft only keeps half the plane and every mode it drops has the same amplitude as its conjugate
+    :param shape: the shape of the image
+    :return: kx, ky, weights: kx and ky broadcast against each other, weights is flattened
+    """
+    kx, ky = np.fft.fftfreq(shape[0])[:, None]*shape[0], np.fft.rfftfreq(shape[1])[None, :]*shape[1]
+    weights = np.full(ky.shape, 2.)
+    weights[:, 0] = 1
+    #the nyquist mode is its own conjugate, it's -n/2 in the full plane (like fftfreq) which matters for k_par
+    if shape[1]%2==0: weights[:, -1], ky[:, -1] = 1, -shape[1]//2
+    return kx, ky, np.broadcast_to(weights, (shape[0], ky.shape[1])).ravel()
+
+@lru_cache(maxsize=16)
+def spectrum_bins(shape: tuple, bins: int = 100) -> tuple:
+    """
+    the log spaced |k| bin of every mode in the real fft of an image, cached per image shape
+    :param shape: the shape of the image
+    :param bins: the number of bins
+    :return: index, weights, k, counts: the flattened bin of every mode (bins for the k=0 mode), its weight, the bin
+             centers, and the number of full plane modes in each bin
+    """
+    kx, ky, weights = rfft_modes(shape)
+    kmag = np.hypot(kx, ky)
+    kgrid = np.logspace(np.log10(np.min(kmag[kmag!=0])), np.log10(np.max(kmag)), bins + 1)
+    #bin i covers kgrid[i] <= k < kgrid[i+1], with the largest k in the last bin and k=0 off on its own
+    index = np.minimum(np.digitize(kmag, kgrid) - 1, bins - 1)
+    index[kmag==0] = bins
+    return _frozen(index.ravel(), weights, (kgrid[1:] + kgrid[:-1])/2, np.bincount(index.ravel(), weights, minlength=bins+1)[:bins])
+
+@lru_cache(maxsize=16)
+def anisotropic_bins(shape: tuple, direction: tuple, bins: int = 50) -> tuple:
+    """
+    the (k_par, k_perp) bin of every mode in the real fft of an image relative to a mean field direction, cached per
+    shape and direction. Both axes are linear from 0 to the largest |k|, see spectrum_bins
+    :param shape: the shape of the image
+    :param direction: the (x, y) or (x, y, z) direction of the mean field, only its in plane part gives k_par
+    :param bins: the number of bins along each axis
+    :return: index, weights, mirrored, kpar, kperp, counts: the flattened bin of every mode, its weight, the modes
+             binned a second time for their conjugates (their bins and weights are appended to index and weights),
+             the bin centers along each axis, and the number of full plane modes in each bin
+    """
+    b = np.zeros(3)
+    b[:len(direction)] = direction
+    b = b / np.linalg.norm(b)
+    kx, ky, weights = rfft_modes(shape)
+    kx, ky = np.broadcast_to(kx, (shape[0], ky.shape[1])).ravel(), np.broadcast_to(ky, (shape[0], ky.shape[1])).ravel()
+    #a mode stands for its conjugate at (-kx, -ky), except on the nyquist row where -kx is still -n/2
+    mirrored = np.flatnonzero((weights==2) & (kx==-(shape[0]//2)) & (shape[0]%2==0))
+    kx, ky = np.append(kx, kx[mirrored]), np.append(ky, -ky[mirrored])
+    weights = np.append(weights, weights[mirrored] - 1)
+    weights[mirrored] = 1
+    kmag = np.hypot(kx, ky)
+    kpar = np.abs(kx*b[0] + ky*b[1])
+    #|k x b| rather than sqrt(k^2 - k_par^2) so modes don't get rounded into the wrong bin
+    kperp = np.sqrt((kx*b[2])**2 + (ky*b[2])**2 + (kx*b[1] - ky*b[0])**2)
+    width = np.max(kmag) / bins
+    index = np.minimum(kpar // width, bins - 1).astype(np.int64)*bins + np.minimum(kperp // width, bins - 1).astype(np.int64)
+    index[kmag==0] = bins**2
+    centers = (np.arange(bins) + 0.5)*width
+    return _frozen(index, weights, mirrored, centers, centers, np.bincount(index, weights, minlength=bins**2+1)[:bins**2])
+
+def _frozen(*arrays) -> tuple:
+    #cached arrays are shared between every caller so nobody gets to edit them
+    for a in arrays: a.flags.writeable = False
+    return arrays
+
+def binned_amplitudes(amplitude: np.ndarray, index: np.ndarray, weights: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    the weighted mean and standard error of every row of amplitudes in each bin, one bincount pass for all the rows
+    :param amplitude: np.ndarray: (n, modes) amplitudes
+    :param index: np.ndarray: (modes,) the bin of each mode, anything >= len(counts) is dropped
+    :param weights: np.ndarray: (modes,) how many modes each one stands for
+    :param counts: np.ndarray: the total weight in each bin
+    :return: mean, err: (n, bins)
+    """
+    n, nbins = amplitude.shape[0], len(counts)
+    flat = (index[None, :] + (nbins + 1)*np.arange(n)[:, None]).ravel()
+    def total(values): return np.bincount(flat, (values*weights).ravel(), minlength=n*(nbins+1)).reshape(n, nbins+1)[:, :nbins]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total(amplitude) / counts
+        std = np.sqrt(np.maximum(total(amplitude**2) / counts - mean**2, 0))
+        return mean, std / np.sqrt(counts)
+
+def kspec1d(image: np.ndarray, bins: int = 100, workers: int = -1) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the isotropic spectrum: the mean fourier amplitude of an image in log spaced |k| bins
+    :param image: np.ndarray: (..., x, y) one image or a whole stack of them (e.g. every dump), done in one call
+    :param bins: the number of bins
+    :param workers: threads scipy.fft uses, -1 uses every core
+    :return: kx, ks, kerr: the bin centers, and the mean amplitude and its standard error in each bin, (..., bins)
+    """
+    from scipy import fft
+    image = np.asarray(image)
+    shape, lead = image.shape[-2:], image.shape[:-2]
+    index, weights, kx, counts = spectrum_bins(shape, bins)
+    amplitude = np.abs(fft.rfft2(image, workers=workers)) / (1. * shape[0] * shape[1])
+    ks, kerr = binned_amplitudes(amplitude.reshape(-1, index.size), index, weights, counts)
+    return kx, ks.reshape(*lead, bins), kerr.reshape(*lead, bins)
+
+def kspec2d(image: np.ndarray, direction, bins: int = 50, workers: int = -1) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the anisotropic spectrum: the mean fourier amplitude of an image in (k_par, k_perp) bins relative to a mean field
+    :param image: np.ndarray: (..., x, y) one image or a whole stack of them, done in one call
+    :param direction: the (x, y) or (x, y, z) direction of the mean field
+    :param bins: the number of bins along each axis
+    :param workers: threads scipy.fft uses, -1 uses every core
+    :return: kpar, kperp, ks, kerr: the bin centers along each axis, and the mean amplitude and its standard error
+             in each bin, (..., bins, bins) indexed [k_par, k_perp]
+    """
+    from scipy import fft
+    image = np.asarray(image)
+    shape, lead = image.shape[-2:], image.shape[:-2]
+    #round the direction so tiny differences in a measured mean field still share the cached bins
+    direction = tuple(np.round(np.array(direction, dtype=float) / np.linalg.norm(direction), 6))
+    index, weights, mirrored, kpar, kperp, counts = anisotropic_bins(shape, direction, bins)
+    amplitude = np.abs(fft.rfft2(image, workers=workers)).reshape(-1, index.size - mirrored.size) / (1. * shape[0] * shape[1])
+    if mirrored.size > 0: amplitude = np.concatenate([amplitude, amplitude[:, mirrored]], axis=1)
+    ks, kerr = binned_amplitudes(amplitude, index, weights, counts)
+    return kpar, kperp, ks.reshape(*lead, bins, bins), kerr.reshape(*lead, bins, bins)